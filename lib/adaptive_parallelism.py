@@ -0,0 +1,252 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""Run more or fewer jobs at once depending on how loaded the machine is.
+
+With `litani run-build --engine native --adaptive-parallelism`, the scheduler
+starts with one job slot per processor, kept between --min-parallel and -j.
+Every --adaptive-interval seconds, a Controller samples
+
+- the 1-minute load average, from /proc/loadavg;
+- the share of the last 10 seconds in which some tasks were stalled waiting
+  for a CPU or for memory, from /proc/pressure/cpu and /proc/pressure/memory
+  (pressure stall information, or PSI); and
+- MemAvailable, from /proc/meminfo.
+
+Under memory pressure, or when little memory is available, it halves the
+number of slots. Under CPU pressure it removes one slot, and when every slot
+is taken, jobs are waiting, and the processors have time to spare, it adds
+one. CPU pressure is judged from PSI when the kernel provides it, since the
+load average lags by a minute and also counts tasks that wait for I/O.
+Running jobs are never stopped: fewer slots only hold back jobs that have not
+started yet.
+
+Each change is recorded, with the sample that caused it, in the *adaptive*
+key of the parallelism dict in run.json, and drawn on the parallelism graph.
+"""
+
+
+import asyncio
+import dataclasses
+import datetime
+import os
+import pathlib
+
+from lib import litani
+
+
+_PROC = pathlib.Path("/proc")
+
+
+
+def _read_load(proc):
+    try:
+        return float((proc / "loadavg").read_text().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _read_pressure(proc, resource):
+    """The percentage of the last 10 seconds in which some tasks were stalled
+    on resource, or None if the kernel does not report it"""
+
+    try:
+        for line in (proc / "pressure" / resource).read_text().splitlines():
+            kind, *fields = line.split()
+            if kind == "some":
+                return float(dict(f.split("=") for f in fields)["avg10"])
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _read_memory(proc):
+    """Return MemAvailable and MemTotal in bytes"""
+
+    info = {}
+    try:
+        for line in (proc / "meminfo").read_text().splitlines():
+            key, _, value = line.partition(":")
+            if key in ("MemAvailable", "MemTotal"):
+                info[key] = int(value.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return info.get("MemAvailable"), info.get("MemTotal")
+
+
+
+@dataclasses.dataclass
+class Sample:
+    load: float = None
+    cpu_pressure: float = None
+    memory_pressure: float = None
+    mem_available: int = None
+    mem_total: int = None
+
+
+    @staticmethod
+    def read(proc=_PROC):
+        return Sample(
+            _read_load(proc), _read_pressure(proc, "cpu"),
+            _read_pressure(proc, "memory"), *_read_memory(proc))
+
+
+    def get_available_fraction(self):
+        if not self.mem_available or not self.mem_total:
+            return None
+        return self.mem_available / self.mem_total
+
+
+
+@dataclasses.dataclass
+class Controller:
+    """A job slot whose number of holders can change while jobs run
+
+    Use `async with controller:` around a job, as with an asyncio.Semaphore.
+    """
+
+    min_jobs: int
+    max_jobs: int
+    interval: float = 5.0
+    n_proc: int = dataclasses.field(
+        default_factory=lambda: os.cpu_count() or 1)
+    proc: pathlib.Path = _PROC
+
+    # Thresholds, as percentages of time stalled (PSI), fractions of memory
+    # available, and load averages per processor
+    high_memory_pressure: float = 10.0
+    low_memory: float = 0.1
+    high_cpu_pressure: float = 40.0
+    low_cpu_pressure: float = 10.0
+    high_load: float = 1.5
+    low_load: float = 1.0
+
+    limit: int = None
+    initial_limit: int = None
+    running: int = 0
+    waiting: int = 0
+    adjustments: list = dataclasses.field(default_factory=list)
+    _condition: asyncio.Condition = dataclasses.field(
+        default_factory=asyncio.Condition)
+
+
+    def __post_init__(self):
+        if self.limit is None:
+            self.limit = min(max(self.n_proc, self.min_jobs), self.max_jobs)
+        self.initial_limit = self.limit
+
+
+    async def __aenter__(self):
+        async with self._condition:
+            self.waiting += 1
+            await self._condition.wait_for(
+                lambda: self.running < self.limit)
+            self.waiting -= 1
+            self.running += 1
+
+
+    async def __aexit__(self, *_):
+        async with self._condition:
+            self.running -= 1
+            self._condition.notify()
+
+
+    def decide(self, sample):
+        """Return the number of slots that sample calls for, and the reason
+        for the change"""
+
+        if sample.memory_pressure is not None and \
+                sample.memory_pressure > self.high_memory_pressure:
+            return self.limit // 2, "memory pressure"
+        available = sample.get_available_fraction()
+        if available is not None and available < self.low_memory:
+            return self.limit // 2, "low available memory"
+
+        if sample.cpu_pressure is not None:
+            busy = sample.cpu_pressure > self.high_cpu_pressure
+            idle = sample.cpu_pressure < self.low_cpu_pressure
+            reason = "CPU pressure"
+        elif sample.load is not None:
+            busy = sample.load / self.n_proc > self.high_load
+            idle = sample.load / self.n_proc < self.low_load
+            reason = "high load"
+        else:
+            return self.limit, None
+
+        if busy:
+            return self.limit - 1, reason
+        if idle and self.waiting and self.running >= self.limit:
+            return self.limit + 1, "spare CPU"
+        return self.limit, None
+
+
+    def adjust(self, sample, now=None):
+        """Change the number of slots if sample calls for it, returning True
+        if it did"""
+
+        limit, reason = self.decide(sample)
+        limit = min(max(limit, self.min_jobs), self.max_jobs)
+        if limit == self.limit:
+            return False
+
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        self.adjustments.append({
+            "time": now.strftime(litani.TIME_FORMAT_MS),
+            "limit": limit,
+            "reason": reason,
+            "running": self.running,
+            **dataclasses.asdict(sample),
+        })
+        self.limit = limit
+        return True
+
+
+    async def run(self):
+        """Adjust the number of slots every interval until cancelled"""
+
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.adjust(Sample.read(self.proc)):
+                async with self._condition:
+                    self._condition.notify_all()
+
+
+    def encode(self):
+        """Return a dict that can be serialized to JSON"""
+
+        return {
+            "min": self.min_jobs,
+            "max": self.max_jobs,
+            "interval": self.interval,
+            "initial_limit": self.initial_limit,
+            "adjustments": self.adjustments,
+        }
+
+
+
+def get_limits(encoded, times):
+    """Return the number of slots at each of times (seconds since the epoch)
+    from an encoded Controller"""
+
+    changes = [(
+        datetime.datetime.strptime(a["time"], litani.TIME_FORMAT_MS).replace(
+            tzinfo=datetime.timezone.utc).timestamp(), a["limit"]
+    ) for a in encoded["adjustments"]]
+    ret = []
+    limit = encoded["initial_limit"]
+    for time in times:
+        while changes and changes[0][0] <= time:
+            limit = changes.pop(0)[1]
+        ret.append(limit)
+    return ret
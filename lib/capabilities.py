@@ -33,6 +33,29 @@ _CAPABILITIES = {
     "print_html_dir": "The print-html-dir command is supported",
     "get_jobs": "The get-jobs command is supported",
     "set_jobs": "The set-jobs command is supported",
+    "chart_backend": "The --chart-backend flag to run-build is supported",
+    "sqlite_job_store": "The --job-store sqlite flag to init is supported",
+    "add_jobs": "The add-jobs command is supported",
+    "native_engine": "The --engine native flag to run-build is supported",
+    "job_logs": "Jobs have stdout_log and stderr_log keys, and run-build "
+        "supports --log-compression and --log-excerpts",
+    "resource_usage": "Jobs have a resource_usage key with CPU, memory, "
+        "context switch and I/O usage",
+    "compact_parallelism_trace": "The parallelism trace is stored as "
+        "compact_trace, and run-build supports --parallelism-resolution",
+    "critical_path": "The critical-path command is supported, and the "
+        "dashboard shows the run's critical path",
+    "job_history": "run-build orders jobs by their durations in earlier runs "
+        "and supports --job-history, --no-job-history and --reserve-slots",
+    "result_cache": "run-build supports --result-cache and --result-cache-env, "
+        "and jobs whose result was restored have a cached_result key",
+    "workers": "The worker command is supported, and run-build can run jobs "
+        "on workers with --workers",
+    "memory_budget": "add-job supports --expected-memory, and run-build "
+        "supports --memory-budget",
+    "adaptive_parallelism": "run-build supports --adaptive-parallelism, "
+        "--min-parallel and --adaptive-interval, and records changes to the "
+        "number of parallel jobs in the adaptive key of the parallelism dict",
 }
 
 
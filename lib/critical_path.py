@@ -0,0 +1,273 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""Find the chain of jobs that determined how long a run took.
+
+A job depends on another job if one of its inputs is one of the other job's
+outputs. Weighting each job by how long it ran, the longest path through this
+dependency graph is the critical path: even with unlimited parallelism, the
+run could not have finished sooner than the sum of the durations of the jobs
+on it. A job's slack is how much longer it could have run without making the
+critical path longer; jobs on the critical path have no slack. Speeding up or
+splitting jobs on the critical path is what shortens a run.
+"""
+
+
+import dataclasses
+import datetime
+import json
+import logging
+import sys
+
+import lib.litani
+
+
+def add_subparser(subparsers):
+    critical_path_pars = subparsers.add_parser(
+        "critical-path",
+        help="Print the chain of jobs that determined the run's duration")
+    critical_path_pars.set_defaults(func=print_critical_path)
+    for arg in [{
+            "flags": ["-n", "--top"],
+            "metavar": "N",
+            "type": int,
+            "default": 10,
+            "help": "list the N jobs that contribute most to the run's "
+                    "duration (default: %(default)s)",
+    }, {
+            "flags": ["-r", "--run-file"],
+            "metavar": "F",
+            "help": "analyze run file F rather than the run.json of the last "
+                    "completed run",
+    }, {
+            "flags": ["--json"],
+            "action": "store_true",
+            "help": "print the analysis as JSON",
+    }]:
+        flags = arg.pop("flags")
+        critical_path_pars.add_argument(*flags, **arg)
+
+
+
+@dataclasses.dataclass
+class _Job:
+    job: dict
+    duration: float
+    deps: list = dataclasses.field(default_factory=list)
+    dependents: list = dataclasses.field(default_factory=list)
+    earliest_finish: float = 0
+    latest_finish: float = 0
+
+
+    def get_slack(self):
+        return self.latest_finish - self.earliest_finish
+
+
+    def as_dict(self, makespan):
+        args = self.job["wrapper_arguments"]
+        slack = self.get_slack()
+        contribution = self.duration if _is_zero(slack) else 0
+        return {
+            "job_id": args["job_id"],
+            "description": args["description"],
+            "pipeline_name": args["pipeline_name"],
+            "ci_stage": args["ci_stage"],
+            "duration": self.duration,
+            "slack": slack,
+            "earliest_start": self.earliest_finish - self.duration,
+            "contribution": contribution,
+            "percent_of_critical_path":
+                100 * contribution / makespan if makespan else 0,
+        }
+
+
+
+def _is_zero(seconds):
+    # Durations are parsed from strings with microsecond precision
+    return abs(seconds) < 1e-6
+
+
+def get_duration(job):
+    """How long a job ran for in seconds, or 0 if it did not complete"""
+
+    if not job.get("complete"):
+        return 0
+    duration_ms = job.get("duration_ms")
+    if duration_ms:
+        # Written as seconds, a dot, and microseconds without leading zeros
+        seconds, _, microseconds = duration_ms.partition(".")
+        return int(seconds) + int(microseconds or 0) / 1000000
+    return job.get("duration") or 0
+
+
+def _iter_jobs(run):
+    for pipe in run["pipelines"]:
+        for stage in pipe["ci_stages"]:
+            for job in stage["jobs"]:
+                yield job
+
+
+def get_dependencies(jobs):
+    """Return the indices of the jobs that each job depends on
+
+    jobs is a list of job arguments, as in cache.json or the
+    *wrapper_arguments* of jobs in run.json. Jobs are linked through an index
+    from each output (and status file) to the job that writes it, so this is
+    linear in the total number of inputs and outputs.
+    """
+
+    output_to_idx = {}
+    for idx, args in enumerate(jobs):
+        outputs = lib.litani.expand_args(args.get("outputs"))
+        if args.get("status_file"):
+            outputs.append(args["status_file"])
+        for output in outputs:
+            output_to_idx[output] = idx
+
+    ret = []
+    for idx, args in enumerate(jobs):
+        deps = {
+            output_to_idx[i]
+            for i in lib.litani.expand_args(args.get("inputs"))
+            if i in output_to_idx}
+        deps.discard(idx)
+        ret.append(sorted(deps))
+    return ret
+
+
+def get_topological_order(dependencies):
+    """Return job indices such that each job comes after its dependencies, or
+    None if the dependencies contain a cycle"""
+
+    dependents = [[] for _ in dependencies]
+    for idx, deps in enumerate(dependencies):
+        for dep in deps:
+            dependents[dep].append(idx)
+    in_degree = [len(deps) for deps in dependencies]
+    ordered = [idx for idx, deps in enumerate(dependencies) if not deps]
+    for idx in ordered:
+        for dependent in dependents[idx]:
+            in_degree[dependent] -= 1
+            if not in_degree[dependent]:
+                ordered.append(dependent)
+    if len(ordered) != len(dependencies):
+        return None
+    return ordered
+
+
+def _make_graph(run):
+    """Return a list of _Jobs in dependency order"""
+
+    jobs = list(_iter_jobs(run))
+    nodes = [_Job(job, get_duration(job)) for job in jobs]
+    dependencies = get_dependencies([j["wrapper_arguments"] for j in jobs])
+    for node, deps in zip(nodes, dependencies):
+        node.deps = [nodes[dep] for dep in deps]
+        for dep in node.deps:
+            dep.dependents.append(node)
+
+    order = get_topological_order(dependencies)
+    if order is None:
+        logging.error("The jobs in this run have a dependency cycle")
+        sys.exit(1)
+    return [nodes[idx] for idx in order]
+
+
+def _get_wall_clock_time(run):
+    starts = []
+    ends = []
+    for job in _iter_jobs(run):
+        if job.get("start_time") and job.get("end_time"):
+            starts.append(job["start_time"])
+            ends.append(job["end_time"])
+    if not starts:
+        return None
+    start = datetime.datetime.strptime(min(starts), lib.litani.TIME_FORMAT_R)
+    end = datetime.datetime.strptime(max(ends), lib.litani.TIME_FORMAT_R)
+    return (end - start).total_seconds()
+
+
+def analyze(run, top=10):
+    """Return the critical path of a run and the jobs that contribute most to
+    its length
+
+    The returned dict can be serialized to JSON.
+    """
+
+    nodes = _make_graph(run)
+
+    for node in nodes:
+        node.earliest_finish = node.duration + max(
+            (dep.earliest_finish for dep in node.deps), default=0)
+    makespan = max((node.earliest_finish for node in nodes), default=0)
+
+    for node in reversed(nodes):
+        node.latest_finish = min((
+            dependent.latest_finish - dependent.duration
+            for dependent in node.dependents), default=makespan)
+
+    path = []
+    node = max(nodes, key=lambda n: n.earliest_finish, default=None)
+    while node:
+        path.append(node)
+        node = max(node.deps, key=lambda n: n.earliest_finish, default=None)
+    path.reverse()
+
+    ranked = sorted(nodes, key=lambda n: (
+        -(n.duration if _is_zero(n.get_slack()) else 0),
+        n.get_slack(), -n.duration))
+
+    return {
+        "critical_path_duration": makespan,
+        "wall_clock_duration": _get_wall_clock_time(run),
+        "critical_path": [node.as_dict(makespan) for node in path],
+        "top_jobs": [node.as_dict(makespan) for node in ranked[:top]],
+    }
+
+
+def _print_table(jobs):
+    print("%10s %10s %6s  %s" % ("duration", "slack", "%", "job"))
+    for job in jobs:
+        print("%9.1fs %9.1fs %5.1f%%  %s (%s)" % (
+            job["duration"], job["slack"], job["percent_of_critical_path"],
+            job["description"], job["pipeline_name"]))
+
+
+async def print_critical_path(args):
+    if args.run_file:
+        run_file = args.run_file
+    else:
+        run_file = lib.litani.get_cache_dir() / lib.litani.RUN_FILE
+    try:
+        with open(run_file) as handle:
+            run = json.load(handle)
+    except FileNotFoundError:
+        logging.error(
+            "Could not find run file '%s'; has run-build finished?", run_file)
+        sys.exit(1)
+
+    analysis = analyze(run, args.top)
+    if args.json:
+        print(json.dumps(analysis, indent=2))
+        return
+
+    print("Critical path: %.1fs" % analysis["critical_path_duration"])
+    if analysis["wall_clock_duration"] is not None:
+        print("Wall-clock time of jobs: %.1fs" % (
+            analysis["wall_clock_duration"]))
+    print()
+    _print_table(analysis["critical_path"])
+    print()
+    print("Top %d jobs by contribution to the critical path:" % args.top)
+    _print_table(analysis["top_jobs"])
@@ -13,7 +13,10 @@
 
 import __main__
 
+import argparse
+import contextlib
 import datetime
+import functools
 import json
 import logging
 import os
@@ -23,8 +26,13 @@ import shlex
 import sys
 
 from lib import litani
+import lib.job_log
+import lib.job_outcome
 import lib.jobs
+import lib.memory_budget
 import lib.output_artifact
+import lib.process
+import lib.result_cache
 import lib.util
 
 
@@ -41,6 +49,33 @@ def get_exec_job_args():
             "metavar": "ID",
             "required": True,
             "help": "the globally unique job ID",
+    }, {
+            "flags": ["--log-compression"],
+            "choices": lib.job_log.COMPRESSIONS,
+            "default": "none",
+            "help": "how to compress the job's logs",
+    }, {
+            "flags": ["--log-excerpts"],
+            "action": "store_true",
+            "help": "only keep the last few lines of captured output in the "
+                    "status file",
+    }, {
+            "flags": ["--memory-budget"],
+            "metavar": "SIZE",
+            "type": lib.util.memory_size,
+            "help": "wait until the job's --expected-memory fits in SIZE, "
+                    "together with that of the other jobs that are running",
+    }, {
+            "flags": ["--result-cache"],
+            "metavar": "LOCATION",
+            "help": "restore the job's result from the cache at LOCATION if "
+                    "it ran before with the same command and inputs, and "
+                    "store its result there otherwise",
+    }, {
+            "flags": ["--result-cache-env"],
+            "metavar": "VAR",
+            "nargs": "+",
+            "help": "environment variables that the job's result depends on",
     }]))
     return exec_job_args
 
@@ -55,23 +90,59 @@ def add_subparser(subparsers):
             group.add_argument(*flags, **arg)
 
 
+@functools.lru_cache(maxsize=1)
+def _get_exec_parser():
+    pars = argparse.ArgumentParser(prog="litani exec")
+    for _, args in get_exec_job_args():
+        for arg in args:
+            arg = dict(arg)
+            flags = arg.pop("flags")
+            pars.add_argument(*flags, **arg)
+    return pars
+
+
+def get_exec_args(add_args):
+    """Return the arguments that `litani exec` would be run with for a job
+
+    This is for running a job in-process, without spawning `litani exec`.
+    """
+
+    argv = shlex.split(" ".join(get_exec_argv(add_args)))
+    args = _get_exec_parser().parse_args(argv)
+    return argparse.Namespace(
+        subcommand="exec", verbose=False, very_verbose=False, **vars(args))
+
+
 def make_litani_exec_command(add_args):
     cmd = [os.path.realpath(__main__.__file__), "exec"]
+    cmd.extend(get_exec_argv(add_args))
+    return " ".join(cmd)
+
+
+def get_exec_argv(add_args):
+    cmd = []
     # strings
     for arg in [
             "command", "pipeline_name", "ci_stage", "cwd", "job_id",
             "stdout_file", "stderr_file", "description", "timeout",
             "status_file", "outcome_table", "pool",
-            "profile_memory_interval",
+            "profile_memory_interval", "log_compression", "result_cache",
+            "expected_memory", "memory_budget",
     ]:
         if arg in add_args and add_args[arg]:
             cmd.append("--%s" % arg.replace("_", "-"))
             cmd.append(shlex.quote(str(add_args[arg]).strip()))
 
+    # numbers for which 0 is meaningful
+    for arg in ["max_captured_output"]:
+        if add_args.get(arg) is not None:
+            cmd.append("--%s" % arg.replace("_", "-"))
+            cmd.append(str(add_args[arg]))
+
     # lists
     for arg in [
             "inputs", "outputs", "ignore_returns", "ok_returns",
-            "tags", "phony_outputs",
+            "tags", "phony_outputs", "result_cache_env",
     ]:
         if arg not in add_args or add_args[arg] is None:
             continue
@@ -82,53 +153,141 @@ def make_litani_exec_command(add_args):
     # switches
     for arg in [
             "timeout_ignore", "timeout_ok", "interleave_stdout_stderr",
-            "profile_memory",
+            "profile_memory", "log_excerpts",
     ]:
         if arg in add_args and add_args[arg]:
             cmd.append("--%s" % arg.replace("_", "-"))
 
-    return " ".join(cmd)
+    return cmd
 
 
 async def exec_job(args):
+    sys.exit(await run_job(args))
+
+
+async def run_job(args, copy_artifacts=True, memory_reservation=None):
+    """Run a job and write its status file, returning the wrapper return code
+
+    lib.worker passes copy_artifacts=False, as run-build copies the artifacts
+    of jobs that run on workers once it has received their outputs.
+
+    The native engine reserves the job's memory before it takes a job slot,
+    and passes the *memory_budget* of the job's status as memory_reservation;
+    otherwise the job waits for its memory here.
+    """
+
     args_dict = vars(args)
-    args_dict.pop("func")
+    args_dict.pop("func", None)
+    # These are properties of the run rather than of the job
+    log_compression = args_dict.pop("log_compression", "none")
+    log_excerpts = args_dict.pop("log_excerpts", False)
+    result_cache = args_dict.pop("result_cache", None)
+    result_cache_env = args_dict.pop("result_cache_env", None)
+    memory_budget = args_dict.pop("memory_budget", None)
     out_data = {
         "wrapper_arguments": args_dict,
         "complete": False,
     }
-    start_time = datetime.datetime.now(datetime.timezone.utc)
-    lib.util.timestamp("start_time", out_data)
-    with litani.atomic_write(args.status_file) as handle:
-        print(json.dumps(out_data, indent=2), file=handle)
+    cache_dir = litani.get_cache_dir()
+    store = None
+    if result_cache:
+        store = lib.result_cache.get_store(result_cache)
+        key = lib.result_cache.get_key(
+            args_dict, result_cache_env, {"log_excerpts": log_excerpts},
+            litani.get_status_dir())
+        cached = lib.result_cache.restore(store, key, args_dict, cache_dir)
+        if cached is not None:
+            logging.debug("restored result %s of job %s", key, args.job_id)
+            start_time = datetime.datetime.now(datetime.timezone.utc)
+            lib.util.timestamp("start_time", out_data)
+            out_data.update({
+                **cached,
+                "wrapper_arguments": args_dict,
+                "start_time": out_data["start_time"],
+                "cached_result": {
+                    "key": key,
+                    "start_time": cached["start_time"],
+                    "duration_ms": cached["duration_ms"],
+                },
+            })
+            return _finish_job(args, out_data, start_time, copy_artifacts)
 
-    run = lib.process.Runner(
-        args.command, args.interleave_stdout_stderr, args.cwd,
-        args.timeout, args.profile_memory, args.profile_memory_interval,
-        args_dict["job_id"])
-    await run()
-    end_time = datetime.datetime.now(datetime.timezone.utc)
+    log_paths = [
+        lib.job_log.log_path(args.job_id, stream, log_compression)
+        for stream in ("stdout", "stderr")]
+    if args.interleave_stdout_stderr:
+        log_paths[1] = None
+
+    async with contextlib.AsyncExitStack() as reservation:
+        if memory_reservation:
+            out_data["memory_budget"] = memory_reservation
+        elif memory_budget and args.expected_memory:
+            waited = await reservation.enter_async_context(
+                lib.memory_budget.Ledger().reserve(
+                    args.expected_memory, memory_budget))
+            out_data["memory_budget"] = {
+                "budget": memory_budget,
+                "wait_ms": int(waited * 1000),
+            }
+
+        # The job starts once it has been admitted
+        start_time = datetime.datetime.now(datetime.timezone.utc)
+        lib.util.timestamp("start_time", out_data)
+        with litani.atomic_write(args.status_file) as handle:
+            print(json.dumps(out_data, indent=2), file=handle)
+
+        run = lib.process.Runner(
+            args.command, args.interleave_stdout_stderr, args.cwd,
+            args.timeout, args.profile_memory, args.profile_memory_interval,
+            args_dict["job_id"], stdout_file=args.stdout_file,
+            stderr_file=args.stderr_file,
+            output_limit=args.max_captured_output,
+            log_files=[cache_dir / log if log else None for log in log_paths],
+            log_compression=log_compression)
+        await run()
     lib.job_outcome.fill_in_result(run, out_data, args)
+    out_data["cached_result"] = None
 
-    for out_field, proc_pipe, arg_file in [
-        ("stdout", run.get_stdout(), args.stdout_file),
-        ("stderr", run.get_stderr(), args.stderr_file)
-    ]:
-        if proc_pipe:
-            out_data[out_field] = proc_pipe.splitlines()
-        else:
-            out_data[out_field] = []
+    # The Runner has already written the --stdout-file and --stderr-file, and
+    # the logs
+    tags = args.tags or []
+    for idx, (out_field, proc_pipe, log) in enumerate([
+        ("stdout", run.get_stdout(), log_paths[0]),
+        ("stderr", run.get_stderr(), log_paths[1]),
+    ]):
+        lines = proc_pipe.splitlines() if proc_pipe else []
+        inline = not log_excerpts or (
+            out_field == "stdout" and
+            any(t in tags for t in lib.job_log.INLINE_STDOUT_TAGS))
+        out_data[out_field] = lines if inline else lib.job_log.excerpt(lines)
 
-        if arg_file:
-            out_str = proc_pipe if proc_pipe else ""
-            with litani.atomic_write(arg_file) as handle:
-                print(out_str, file=handle)
+        reference = None
+        if log is not None:
+            size, n_lines = run.get_output_stats(idx)
+            if size:
+                reference = lib.job_log.log_reference(
+                    log, log_compression, size, n_lines)
+            else:
+                os.unlink(cache_dir / log)
+        out_data[f"{out_field}_log"] = reference
 
-    if out_data["stderr"]:
+    stderr = run.get_stderr()
+    if stderr:
         print(
-            "\n".join([l.rstrip() for l in out_data["stderr"]]),
+            "\n".join([l.rstrip() for l in stderr.splitlines()]),
             file=sys.stderr)
 
+    ret = _finish_job(args, out_data, start_time, copy_artifacts)
+    if store and out_data["outcome"] == "success":
+        lib.result_cache.save(store, key, args_dict, out_data, cache_dir)
+    return ret
+
+
+def _finish_job(args, out_data, start_time, copy_artifacts):
+    """Write the status of a completed job and copy its output artifacts,
+    returning the wrapper return code"""
+
+    end_time = datetime.datetime.now(datetime.timezone.utc)
     lib.util.timestamp("end_time", out_data)
 
     duration = end_time - start_time
@@ -140,14 +299,20 @@ async def exec_job(args):
     with litani.atomic_write(args.status_file) as handle:
         print(out_str, file=handle)
 
+    if copy_artifacts:
+        copy_output_artifacts(out_data["wrapper_arguments"])
+    return out_data["wrapper_return_code"]
+
+
+def copy_output_artifacts(job_args):
+    """Copy the outputs of a completed job to the artifacts directory"""
+
     artifacts_dir = (litani.get_artifacts_dir() /
-         out_data["wrapper_arguments"]["pipeline_name"] /
-         out_data["wrapper_arguments"]["ci_stage"])
+         job_args["pipeline_name"] / job_args["ci_stage"])
     artifacts_dir.mkdir(parents=True, exist_ok=True)
 
-    copier = lib.output_artifact.Copier(
-        artifacts_dir, out_data["wrapper_arguments"])
-    for fyle in out_data["wrapper_arguments"]["outputs"] or []:
+    copier = lib.output_artifact.Copier(artifacts_dir, job_args)
+    for fyle in job_args["outputs"] or []:
         try:
             copier.copy_output_artifact(fyle)
         except lib.output_artifact.MissingOutput:
@@ -156,7 +321,7 @@ async def exec_job(args):
                 "completion. Not copying to artifacts directory. "
                 "If this job is not supposed to emit the file, pass "
                 "`--phony-outputs %s` to suppress this warning", fyle,
-                out_data["wrapper_arguments"]["pipeline_name"], fyle)
+                job_args["pipeline_name"], fyle)
         except IsADirectoryError:
             artifact_src = pathlib.Path(fyle)
             try:
@@ -165,5 +330,3 @@ async def exec_job(args):
             except FileExistsError:
                 logging.warning(
                     "Multiple files with same name in artifacts directory")
-
-    sys.exit(out_data["wrapper_return_code"])
@@ -0,0 +1,197 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""Wait for files under a set of directories to change.
+
+The report renderer uses this to re-render soon after a job writes its status
+file or an artifact, rather than re-rendering on a fixed schedule. On Linux,
+InotifyWatcher is notified by the kernel. Elsewhere, or if inotify cannot be
+used (e.g. the watch limit is reached), PollingWatcher periodically compares the
+stat() results of every file.
+"""
+
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+
+# From sys/inotify.h
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO |
+    _IN_CREATE | _IN_DELETE | _IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+
+def make_watcher(dirs, poll_interval=1.0):
+    """Return the best available watcher for the given directories"""
+
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(dirs)
+        except OSError as e:
+            logging.debug(
+                "Cannot use inotify (%s); polling for changes instead", e)
+    return PollingWatcher(dirs, poll_interval)
+
+
+
+class InotifyWatcher:
+    """Watches directory trees using the Linux inotify API"""
+
+    def __init__(self, dirs):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+        fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._fd = fd
+
+        # watch descriptor -> directory
+        self._watches = {}
+        try:
+            for dyr in dirs:
+                self._watch_tree(os.fsencode(dyr))
+        except OSError:
+            self.close()
+            raise
+
+
+    def _watch_tree(self, top):
+        for root, _, _ in os.walk(top):
+            self._watch_dir(root)
+
+
+    def _watch_dir(self, dyr):
+        wd = self._libc.inotify_add_watch(self._fd, dyr, _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                # Directory was removed before we got to it
+                return
+            raise OSError(err, os.strerror(err), os.fsdecode(dyr))
+        self._watches[wd] = dyr
+
+
+    def wait(self, timeout):
+        """Return True iff something changed within timeout seconds"""
+
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+        self._drain()
+        return True
+
+
+    def _drain(self):
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & _IN_Q_OVERFLOW:
+                    continue
+                if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                    # New subdirectories (e.g. of the artifacts directory)
+                    # need their own watch
+                    try:
+                        self._watch_tree(os.path.join(self._watches[wd], name))
+                    except (KeyError, OSError) as e:
+                        logging.debug("Could not watch new directory: %s", e)
+
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+
+class PollingWatcher:
+    """Watches directory trees by comparing stat() results"""
+
+    def __init__(self, dirs, interval=1.0):
+        self.dirs = list(dirs)
+        self.interval = interval
+        self._state = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+
+    def _scan(self):
+        state = {}
+        for top in self.dirs:
+            for root, _, files in os.walk(top):
+                for path in [root] + [os.path.join(root, f) for f in files]:
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    state[path] = (st.st_ino, st.st_size, st.st_mtime_ns)
+        return state
+
+
+    def wait(self, timeout):
+        """Return True iff something changed within timeout seconds
+
+        The directories are scanned at most once per interval, however often
+        this method is called.
+        """
+
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if now >= self._next_scan:
+                self._next_scan = now + self.interval
+                state = self._scan()
+                if state != self._state:
+                    self._state = state
+                    return True
+            if now >= deadline:
+                return False
+            time.sleep(min(self._next_scan, deadline) - now)
+
+
+    def close(self):
+        pass
@@ -13,6 +13,7 @@
 
 
 import dataclasses
+import hashlib
 import os
 import pathlib
 import re
@@ -36,6 +37,18 @@ def add_subparser(subparsers):
 
 
 class Node:
+    @staticmethod
+    def stable_id(string):
+        """Like hash(), but the same in every process
+
+        This keeps the DOT text of a graph the same across runs of Litani, so
+        that rendered graphs can be cached by the hash of their DOT text.
+        """
+
+        digest = hashlib.blake2b(string.encode("utf-8"), digest_size=8)
+        return int.from_bytes(digest.digest(), "big")
+
+
     @staticmethod
     def escape(string):
         for match, repl in [(
@@ -65,7 +78,7 @@ class Node:
 class DependencyNode(Node):
     def __init__(self, fyle, line_width=40, **style):
         self.file = fyle
-        self.id = hash(fyle)
+        self.id = Node.stable_id(fyle)
 
         path = pathlib.Path(fyle)
         name, ext = os.path.splitext(path.name)
@@ -96,7 +109,7 @@ class DependencyNode(Node):
 class CommandNode(Node):
     def __init__(
             self, pipeline_name, description, command, line_width=40, **style):
-        self.id = hash(command)
+        self.id = Node.stable_id(command)
 
         wrapper = get_text_wrapper(line_width)
 
@@ -226,8 +239,9 @@ class SinglePipelineGraph:
     def as_dot(self):
         buf = ["digraph G {"]
         buf.append('bgcolor="transparent"')
-        buf.extend([("  %s" % str(n)) for n in self.nodes])
-        buf.extend([("  %s" % str(e)) for e in self.edges])
+        # Sorted, so that the same graph always has the same DOT text
+        buf.extend(sorted([("  %s" % str(n)) for n in self.nodes]))
+        buf.extend(sorted([("  %s" % str(e)) for e in self.edges]))
         buf.append("}")
         return "\n".join(buf)
 
@@ -21,6 +21,7 @@ import tempfile
 import uuid
 
 from lib import litani
+import lib.job_store
 import lib.util
 
 
@@ -48,6 +49,12 @@ def add_subparser(subparsers):
             "help": "stages that a job can be a member of. Default: %(default)s",
             "metavar": "NAME",
             "nargs": "+",
+        }, {
+            "flags": ["--job-store"],
+            "choices": lib.job_store.JOB_STORES,
+            "default": "files",
+            "help": "how to store jobs until run-build. 'sqlite' is faster "
+                    "when adding very many jobs. Default: %(default)s",
     }]:
         flags = arg.pop("flags")
         init_pars.add_argument(*flags, **arg)
@@ -129,6 +136,8 @@ async def init(args):
             "latest_symlink": str(latest_symlink),
         }, indent=2), file=handle)
 
+    lib.job_store.create_job_store(cache_dir, args.job_store)
+
     logging.info("cache dir is at: %s", cache_dir)
 
     with litani.atomic_write(litani.CACHE_POINTER) as handle:
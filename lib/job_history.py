@@ -0,0 +1,222 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""How long each job took in earlier runs, and the job order that follows.
+
+Job IDs are different in every run, so a job is identified across runs by its
+pipeline, CI stage, and command. run-build records the duration and peak
+memory use of every job that completed into a history file that is shared
+between runs. It uses the durations to start the jobs that are expected to
+take longest, counting the jobs that depend on them, first. When ninja has
+several jobs that it could start, it picks the one that comes first in the
+ninja file; so does the native engine. Starting long chains of jobs early
+keeps them from stretching the tail of the run. The peak memory use is the
+expected memory of jobs that were added without one (see lib.memory_budget).
+"""
+
+
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import re
+import statistics
+import tempfile
+
+import lib.critical_path
+import lib.litani
+
+
+# Weight of the latest duration in a job's expected duration, which is an
+# exponential moving average over runs
+_SMOOTHING = 0.5
+
+# Jobs that are put in this pool leave the reserved slots to long jobs
+UNRESERVED_POOL = "__litani_unreserved"
+
+
+def get_default_path(project):
+    """The current user's history file for project
+
+    Neither other users nor other projects whose jobs have the same pipelines
+    and commands share this file.
+    """
+
+    name = re.sub(r"[^\w.-]", "_", project)
+    digest = hashlib.sha1(project.encode("utf-8")).hexdigest()[:8]
+    return pathlib.Path(tempfile.gettempdir()) / f"litani-{os.getuid()}" / \
+        "job-history" / f"{name}-{digest}.json"
+
+
+def get_job_key(job):
+    """Identity of a job that is the same in every run
+
+    job is a job's arguments, as in cache.json, or the *wrapper_arguments* of
+    a job's status.
+    """
+
+    identity = [job["pipeline_name"], job["ci_stage"], job["command"]]
+    return hashlib.sha1(json.dumps(identity).encode("utf-8")).hexdigest()
+
+
+
+@dataclasses.dataclass
+class JobHistory:
+    path: pathlib.Path
+    jobs: dict = dataclasses.field(default_factory=dict)
+
+
+    @staticmethod
+    def load(path):
+        path = pathlib.Path(path)
+        try:
+            with open(path) as handle:
+                jobs = json.load(handle)["jobs"]
+        except FileNotFoundError:
+            jobs = {}
+        except (json.decoder.JSONDecodeError, KeyError, TypeError) as e:
+            logging.warning(
+                "Ignoring unreadable job history '%s': %s", path, e)
+            jobs = {}
+        return JobHistory(path, jobs)
+
+
+    def get_duration(self, job):
+        """The expected duration of job in seconds, or None if unknown"""
+
+        record = self.jobs.get(get_job_key(job))
+        return record["duration"] if record else None
+
+
+    def get_peak_rss(self, job):
+        """The peak resident set of job in bytes when it last ran, or None if
+        unknown"""
+
+        record = self.jobs.get(get_job_key(job))
+        return record.get("peak_rss") if record else None
+
+
+    def fill_expected_memory(self, jobs):
+        """Expect jobs that were added without --expected-memory to use as
+        much memory as they did when they last ran"""
+
+        for job in jobs:
+            if not job.get("expected_memory"):
+                job["expected_memory"] = self.get_peak_rss(job)
+
+
+    def record(self, job, duration, peak_rss=None):
+        key = get_job_key(job)
+        record = self.jobs.get(key)
+        if record:
+            record["duration"] = (
+                _SMOOTHING * duration + (1 - _SMOOTHING) * record["duration"])
+            record["runs"] += 1
+        else:
+            record = self.jobs[key] = {"duration": duration, "runs": 1}
+        if peak_rss:
+            record["peak_rss"] = peak_rss
+
+
+    def save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with lib.litani.atomic_write(self.path) as handle:
+                print(json.dumps({"jobs": self.jobs}), file=handle)
+        except OSError as e:
+            logging.warning(
+                "Could not write job history '%s': %s", self.path, e)
+
+
+    def get_priorities(self, jobs):
+        """Return the length of the longest chain of jobs that starts with
+        each job, according to the expected durations, or None if the jobs'
+        dependencies contain a cycle
+
+        Jobs that have never run are expected to take the median time of the
+        jobs that have.
+        """
+
+        dependencies = lib.critical_path.get_dependencies(jobs)
+        order = lib.critical_path.get_topological_order(dependencies)
+        if order is None:
+            return None
+
+        durations = [self.get_duration(job) for job in jobs]
+        known = [d for d in durations if d is not None]
+        default = statistics.median(known) if known else 0
+        durations = [default if d is None else d for d in durations]
+
+        priorities = list(durations)
+        for idx in reversed(order):
+            for dep in dependencies[idx]:
+                priorities[dep] = max(
+                    priorities[dep], durations[dep] + priorities[idx])
+        return priorities
+
+
+    def order_jobs(self, jobs):
+        """Return jobs with the longest chains first"""
+
+        priorities = self.get_priorities(jobs)
+        if priorities is None:
+            return list(jobs)
+        order = sorted(range(len(jobs)), key=lambda idx: -priorities[idx])
+        return [jobs[idx] for idx in order]
+
+
+    def get_long_jobs(self, jobs, n_jobs):
+        """Return the job IDs of the n_jobs jobs with the longest expected
+        durations"""
+
+        known = []
+        for job in jobs:
+            duration = self.get_duration(job)
+            if duration is not None:
+                known.append((duration, job["job_id"]))
+        known.sort(reverse=True)
+        return {job_id for _, job_id in known[:n_jobs]}
+
+
+
+def get_peak_rss(status):
+    """The peak resident set of a completed job in bytes, or None
+
+    The memory profile of the job's processes is preferred; the maximum
+    resident set that the kernel reports includes that of the Litani process
+    that forked the job.
+    """
+
+    peak = (status.get("memory_trace") or {}).get("peak")
+    if peak:
+        return peak["rss"]
+    return (status.get("resource_usage") or {}).get("max_rss")
+
+
+def record_jobs(history, statuses):
+    """Add the durations and peak memory use of completed jobs to history
+
+    Jobs whose result was restored from the result cache did not run, so they
+    say nothing about how long the job takes.
+    """
+
+    for status in statuses:
+        if status.get("complete") and not status.get("cached_result"):
+            history.record(
+                status["wrapper_arguments"],
+                lib.critical_path.get_duration(status),
+                get_peak_rss(status))
+
@@ -0,0 +1,115 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""Where the full stdout and stderr of each job are kept.
+
+Status files and run.json used to hold all of every job's output as a list of
+lines, which made run.json huge and slow to write on every render pass. Each
+job's output is now streamed to a log file in the logs directory of the cache
+dir, optionally compressed, while the job runs. The job's status holds a
+reference to each log (see log_reference()). It also keeps the output as a
+list of lines, as before, unless `litani run-build --log-excerpts` is used, in
+which case it only keeps the last few lines of it.
+
+The report directory gets a snapshot of the logs directory, so a log's path is
+valid relative to both the cache dir and the report dir.
+"""
+
+
+import gzip
+import lzma
+
+from lib import litani
+
+
+LOGS_DIR = "logs"
+
+# Number of lines at the end of each output that are kept in the job's status
+EXCERPT_LINES = 20
+
+# Jobs with these tags have their stdout inlined into the report, so their
+# stdout is always kept in full in the status
+INLINE_STDOUT_TAGS = ("literal-stdout", "front-page-text")
+
+_COMPRESSIONS = {
+    "none": (None, ""),
+    "gzip": (lambda handle: gzip.GzipFile(fileobj=handle, mode="wb"), ".gz"),
+    "lzma": (lambda handle: lzma.LZMAFile(handle, mode="wb"), ".xz"),
+}
+
+COMPRESSIONS = list(_COMPRESSIONS)
+
+_OPENERS = {
+    "none": open,
+    "gzip": gzip.open,
+    "lzma": lzma.open,
+}
+
+
+
+def get_logs_dir():
+    return litani.get_cache_dir() / LOGS_DIR
+
+
+def log_path(job_id, stream, compression):
+    """Path of a job's log for stream ("stdout" or "stderr"), relative to the
+    cache dir
+    """
+
+    _, suffix = _COMPRESSIONS[compression]
+    return f"{LOGS_DIR}/{job_id}.{stream}{suffix}"
+
+
+def compressor(handle, compression):
+    """Return a binary file object that writes compressed data to handle
+
+    Closing the returned object does not close handle.
+    """
+
+    wrap, _ = _COMPRESSIONS[compression]
+    return wrap(handle) if wrap else handle
+
+
+def is_partial(file_name):
+    """True iff file_name is a log that is still being written
+
+    Logs are written through litani.atomic_write(), which names the file after
+    the log followed by a tilde and a UUID until the log is complete.
+    """
+
+    return "~" in file_name
+
+
+def log_reference(path, compression, size, lines):
+    """The value of a job's *stdout_log* or *stderr_log* key"""
+
+    return {
+        "path": path,
+        "compression": compression,
+        "size": size,
+        "lines": lines,
+    }
+
+
+def read_log(reference, cache_dir=None):
+    """Return the full text of the log that a job's status refers to"""
+
+    cache_dir = cache_dir or litani.get_cache_dir()
+    with _OPENERS[reference["compression"]](
+            cache_dir / reference["path"], "rb") as handle:
+        return handle.read().decode("utf-8", errors="replace")
+
+
+def excerpt(lines):
+    return lines[-EXCERPT_LINES:]
@@ -192,6 +192,7 @@ def fill_in_result(runner, job_data, args):
     job_data["timeout_reached"] = runner.reached_timeout()
     job_data["command_return_code"] = runner.get_return_code()
     job_data["memory_trace"] = runner.get_memory_trace()
+    job_data["resource_usage"] = runner.get_resource_usage()
 
     # These get set by the deciders
     job_data["loaded_outcome_dict"] = None
@@ -0,0 +1,216 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""Where `litani add-job` keeps jobs until `litani run-build` reads them.
+
+By default, each job is written to its own JSON file in the jobs directory, so
+that many `litani add-job` processes can add jobs at the same time. Listing and
+opening one file per job becomes slow with very many jobs, especially on
+network file systems, so `litani init --job-store sqlite` instead keeps all jobs
+in a single SQLite database. SQLite serializes concurrent writers using file
+locks, and run-build reads every job with a single query.
+
+get_job_store() returns whichever store the current run uses.
+"""
+
+
+import concurrent.futures
+import contextlib
+import json
+import os
+import sqlite3
+
+from lib import litani
+
+
+STORE_FILE = "jobs.sqlite"
+
+# How long a writer waits for another writer to release the database
+_BUSY_TIMEOUT = 600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL UNIQUE,
+    pipeline_name TEXT NOT NULL,
+    ci_stage TEXT NOT NULL,
+    job TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_pipeline_name ON jobs (pipeline_name);
+CREATE INDEX IF NOT EXISTS jobs_ci_stage ON jobs (ci_stage);
+"""
+
+JOB_STORES = ["files", "sqlite"]
+
+_WRITER_THREADS = 8
+
+
+
+def get_job_store(cache_dir=None):
+    cache_dir = cache_dir or litani.get_cache_dir()
+    if (cache_dir / STORE_FILE).exists():
+        return SqliteJobStore(cache_dir)
+    return FileJobStore(cache_dir)
+
+
+def create_job_store(cache_dir, kind):
+    """Called by `litani init` to set up the job store for a new run"""
+
+    if kind == "sqlite":
+        SqliteJobStore.create(cache_dir)
+
+
+
+class FileJobStore:
+    """One JSON file per job in the jobs directory"""
+
+    def __init__(self, cache_dir):
+        self.jobs_dir = cache_dir / litani.JOBS_DIR
+
+
+    def exists(self):
+        return self.jobs_dir.exists()
+
+
+    def add(self, job):
+        self.add_many([job])
+
+
+    def _write(self, jobs):
+        for job in jobs:
+            with litani.atomic_write(
+                    self.jobs_dir / ("%s.json" % job["job_id"])) as handle:
+                print(json.dumps(job, indent=2), file=handle)
+
+
+    def add_many(self, jobs):
+        self.jobs_dir.mkdir(exist_ok=True, parents=True)
+        if len(jobs) < 2:
+            self._write(jobs)
+            return
+        # Most of the time goes on file system round-trips, which are slow on
+        # network file systems, so overlap them. Each thread gets one slice of
+        # the jobs, as a future per job costs more than writing the job.
+        n_threads = min(_WRITER_THREADS, len(jobs))
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=n_threads) as pool:
+            futures = [
+                pool.submit(self._write, jobs[idx::n_threads])
+                for idx in range(n_threads)]
+            for future in futures:
+                future.result()
+
+
+    def get_all(self):
+        jobs = []
+        for job_file in os.listdir(self.jobs_dir):
+            with open(self.jobs_dir / job_file) as handle:
+                jobs.append(json.load(handle))
+        return jobs
+
+
+    def delete_all(self):
+        try:
+            for job_file in self.jobs_dir.iterdir():
+                os.unlink(job_file)
+        except FileNotFoundError:
+            pass
+
+
+
+class SqliteJobStore:
+    """All jobs in a single SQLite database, indexed by ID, pipeline and stage
+
+    Jobs are returned in the order in which they were added.
+    """
+
+    def __init__(self, cache_dir):
+        self.db_file = cache_dir / STORE_FILE
+
+
+    @staticmethod
+    def create(cache_dir):
+        store = SqliteJobStore(cache_dir)
+        with store._connect() as conn:
+            conn.executescript(_SCHEMA)
+        return store
+
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(
+            str(self.db_file), timeout=_BUSY_TIMEOUT, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+    def exists(self):
+        """True iff a job was ever added, like FileJobStore.exists()"""
+
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM sqlite_sequence "
+                "WHERE name = 'jobs')").fetchone()[0] == 1
+
+
+    def add(self, job):
+        self.add_many([job])
+
+
+    def add_many(self, jobs):
+        rows = [(
+            job["job_id"], job["pipeline_name"], job["ci_stage"],
+            json.dumps(job)) for job in jobs]
+        with self._connect() as conn:
+            # Take the write lock up front, so that concurrent writers queue up
+            # on the busy timeout rather than failing to upgrade their lock
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO jobs (job_id, pipeline_name, ci_stage, job) "
+                    "VALUES (?, ?, ?, ?)", rows)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+
+    def get_all(self, pipeline_name=None, ci_stage=None):
+        query = "SELECT job FROM jobs"
+        conditions = []
+        params = []
+        for column, value in (
+                ("pipeline_name", pipeline_name), ("ci_stage", ci_stage)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY seq"
+        with self._connect() as conn:
+            return [json.loads(row[0]) for row in conn.execute(query, params)]
+
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT job FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+    def delete_all(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs")
@@ -12,6 +12,7 @@
 # permissions and limitations under the License
 
 import argparse
+import functools
 import json
 import logging
 import os
@@ -20,10 +21,14 @@ import sys
 import uuid
 
 from lib import litani
+import lib.job_store
+import lib.util
 
 
 _PRIVATE_JOB_FIELDS = ("job_id", "status_file", "subcommand")
 
+DEFAULT_MAX_CAPTURED_OUTPUT = 4 * 1024 * 1024
+
 def get_add_job_args():
     return [(
         "describing the build graph", [{
@@ -119,6 +124,19 @@ def get_add_job_args():
             "default": 10,
             "type": int,
             "help": "seconds between memory profile polls"
+        }, {
+            "flags": ["--max-captured-output"],
+            "metavar": "N",
+            "default": DEFAULT_MAX_CAPTURED_OUTPUT,
+            "type": int,
+            "help": "keep only the first and last N bytes of each of this "
+                    "job's stdout and stderr in its status (0 means no limit)"
+        }, {
+            "flags": ["--expected-memory"],
+            "metavar": "SIZE",
+            "type": lib.util.memory_size,
+            "help": "memory that this job is expected to use, e.g. 512M or "
+                    "30G; see run-build --memory-budget"
         }, {
             "flags": ["--phony-outputs"],
             "metavar": "OUT",
@@ -135,6 +153,7 @@ def get_add_job_args():
 
 def add_subparser(subparsers):
     add_add_jobs_subparser(subparsers)
+    add_bulk_add_jobs_subparser(subparsers)
     add_get_jobs_subparser(subparsers)
     add_set_jobs_subparser(subparsers)
     add_transform_jobs_subparser(subparsers)
@@ -150,6 +169,21 @@ def add_add_jobs_subparser(subparsers):
             group.add_argument(*flags, **arg)
 
 
+def add_bulk_add_jobs_subparser(subparsers):
+    add_jobs_pars = subparsers.add_parser(
+        "add-jobs", help="add jobs from a stream of JSON objects")
+    add_jobs_pars.set_defaults(func=add_jobs_command)
+    for arg in [{
+            "flags": ["-f", "--from-file"],
+            "help": "read one JSON job per line from F, default: stdin",
+            "metavar": "F",
+            "default": sys.stdin,
+            "type": argparse.FileType("r")
+    }]:
+        flags = arg.pop("flags")
+        add_jobs_pars.add_argument(*flags, **arg)
+
+
 def add_get_jobs_subparser(subparsers):
     get_jobs_pars = subparsers.add_parser("get-jobs", help="print jobs")
     for arg in [{
@@ -211,13 +245,19 @@ def configure_args(**kwargs):
     return cmd
 
 
-def fill_job(job):
+@functools.lru_cache(maxsize=None)
+def _get_add_job_parser():
     parser = argparse.ArgumentParser()
     for group_name, args in get_add_job_args():
         group = parser.add_argument_group(title=group_name)
         for arg in args:
             flags = arg.pop("flags")
             group.add_argument(*flags, **arg)
+    return parser
+
+
+def fill_job(job):
+    parser = _get_add_job_parser()
     args = configure_args(**job)
     job_dict = vars(parser.parse_known_args(args)[0])
     for key in job:
@@ -226,19 +266,186 @@ def fill_job(job):
     return job_dict
 
 
-async def add_job(job_dict):
+class JobFiller:
+    """Fills in many jobs, with the same result as calling fill_job() on each
+
+    fill_job() turns a job into a command line and parses it, which is slow
+    when done for tens of thousands of jobs. A JobFiller instead starts from a
+    copy of the defaults and converts each value the way that argparse would.
+    Jobs whose result might depend on argparse's parsing rules (e.g. values
+    that start with a dash, or keys that abbreviate a flag) go through
+    fill_job() instead.
+    """
+
+    def __init__(self):
+        self.args = {}
+        self.defaults = {}
+        for _, args in get_add_job_args():
+            for arg in args:
+                dest = arg["flags"][0].lstrip("-").replace("-", "_")
+                self.args[dest] = arg
+                self.defaults[dest] = arg.get(
+                    "default", False if arg.get("action") else None)
+        self.switches = [f"--{dest.replace('_', '-')}" for dest in self.args]
+        self.switches.append("--help")
+
+
+    class _NeedsParser(Exception):
+        pass
+
+
+    def _check_str(self, value):
+        value = str(value)
+        if value.startswith("-"):
+            raise self._NeedsParser()
+        return value
+
+
+    def _convert(self, value, arg):
+        if arg.get("action") == "store_true":
+            if not isinstance(value, bool):
+                raise self._NeedsParser()
+            return value or arg.get("default", False)
+        if isinstance(value, bool):
+            raise self._NeedsParser()
+        if "nargs" in arg:
+            values = value if isinstance(value, list) else [value]
+            if not values:
+                raise self._NeedsParser()
+            ret = [self._check_str(v) for v in values]
+        elif isinstance(value, list):
+            raise self._NeedsParser()
+        else:
+            ret = self._check_str(value)
+        convert = arg.get("type")
+        if convert:
+            try:
+                return [convert(v) for v in ret] if "nargs" in arg \
+                    else convert(ret)
+            except (ValueError, argparse.ArgumentTypeError) as e:
+                raise self._NeedsParser() from e
+        return ret
+
+
+    def _fill(self, job):
+        ret = dict(self.defaults)
+        extras = {}
+        for key, value in job.items():
+            if key in self.args:
+                if value is not None:
+                    ret[key] = self._convert(value, self.args[key])
+                continue
+            switch = f"--{key.replace('_', '-')}"
+            if any(s.startswith(switch) for s in self.switches):
+                raise self._NeedsParser()
+            if isinstance(value, str):
+                self._check_str(value)
+            elif isinstance(value, list):
+                for item in value:
+                    self._check_str(item)
+            extras[key] = value
+        ret.update(extras)
+        return ret
+
+
+    def __call__(self, job):
+        try:
+            return self._fill(job)
+        except self._NeedsParser:
+            return fill_job(job)
+
+
+class JobValidator:
+    """Checks a job given as a dict against the flags of `litani add-job`
+
+    Calling a JobValidator on a dict whose keys are add-job flag names (with
+    underscores or dashes) returns the dict that `litani add-job` would have
+    built from the equivalent command line, or raises ValueError.
+    """
+
+    def __init__(self):
+        # dest -> argparse keyword arguments
+        self.args = {}
+        for _, args in get_add_job_args():
+            for arg in args:
+                dest = arg["flags"][0].lstrip("-").replace("-", "_")
+                self.args[dest] = arg
+
+
+    @staticmethod
+    def _scalar(key, value, typ):
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(
+                f"'{key}' must be a string or number, not {json.dumps(value)}")
+        if typ is int:
+            try:
+                return int(value)
+            except ValueError as e:
+                raise ValueError(f"'{key}' must be an integer") from e
+        if typ:
+            try:
+                return typ(value)
+            except (ValueError, argparse.ArgumentTypeError) as e:
+                raise ValueError(f"'{key}': {e}") from e
+        return str(value)
+
+
+    def _check(self, key, value, arg):
+        if arg.get("action") == "store_true":
+            if not isinstance(value, bool):
+                raise ValueError(f"'{key}' must be true or false")
+            return value
+        if "nargs" in arg:
+            if not isinstance(value, list):
+                raise ValueError(f"'{key}' must be a list")
+            if arg["nargs"] == "+" and not value:
+                raise ValueError(f"'{key}' must not be empty")
+            return [self._scalar(key, v, arg.get("type")) for v in value]
+        return self._scalar(key, value, arg.get("type"))
+
+
+    def __call__(self, job):
+        if not isinstance(job, dict):
+            raise ValueError("job must be a JSON object")
+        given = {}
+        for key, value in job.items():
+            dest = key.replace("-", "_")
+            if dest not in self.args:
+                raise ValueError(f"unknown field '{key}'")
+            given[dest] = value
+
+        ret = {}
+        for dest, arg in self.args.items():
+            value = given.get(dest)
+            if value is None:
+                if arg.get("required"):
+                    raise ValueError(f"missing required field '{dest}'")
+                value = arg.get(
+                    "default", False if arg.get("action") else None)
+            else:
+                value = self._check(dest, value, arg)
+            ret[dest] = value
+        return ret
+
+
+def _get_stages():
     cache_file = litani.get_cache_dir() / litani.CACHE_FILE
     with open(cache_file) as handle:
         cache_contents = json.load(handle)
-    if job_dict["ci_stage"] not in cache_contents["stages"]:
-        valid_stages = "', '".join(cache_contents["stages"])
+    return cache_contents["stages"]
+
+
+def _check_stage(job_dict, stages):
+    if job_dict["ci_stage"] not in stages:
+        valid_stages = "', '".join(stages)
         logging.error(
             "Invalid stage name '%s' was provided, possible "
             "stage names are: '%s'", job_dict["ci_stage"], valid_stages)
         sys.exit(1)
 
-    jobs_dir = litani.get_cache_dir() / litani.JOBS_DIR
-    jobs_dir.mkdir(exist_ok=True, parents=True)
+
+def _finish_job(job_dict):
+    """Add the fields that Litani adds to every job, ready to be stored"""
 
     if job_dict["phony_outputs"]:
         if not job_dict["outputs"]:
@@ -256,34 +463,72 @@ async def add_job(job_dict):
     job_dict["status_file"] = str(
         litani.get_status_dir() / ("%s.json" % job_id))
 
-    logging.debug("Adding job: %s", json.dumps(job_dict, indent=2))
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Adding job: %s", json.dumps(job_dict, indent=2))
 
     for key in _PRIVATE_JOB_FIELDS:
         if key not in job_dict:
             raise AssertionError(f"Key {key} missing from job definition")
 
-    with litani.atomic_write(jobs_dir / ("%s.json" % job_id)) as handle:
-        print(json.dumps(job_dict, indent=2), file=handle)
+
+async def add_job(job_dict):
+    _check_stage(job_dict, _get_stages())
+    _finish_job(job_dict)
+    lib.job_store.get_job_store().add(job_dict)
 
 
 async def add_job_command(args):
     return await add_job(vars(args))
 
 
+async def add_jobs_command(args):
+    validator = JobValidator()
+    stages = _get_stages()
+    jobs = []
+    errors = 0
+    for line_no, line in enumerate(args.from_file, start=1):
+        if not line.strip():
+            continue
+        try:
+            job = validator(json.loads(line))
+            if job["ci_stage"] not in stages:
+                raise ValueError(
+                    "invalid stage '%s', possible stage names are: '%s'" % (
+                        job["ci_stage"], "', '".join(stages)))
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError
+            logging.error("%s:%d: %s", args.from_file.name, line_no, e)
+            errors += 1
+            continue
+        jobs.append({
+            "subcommand": "add-job",
+            "verbose": args.verbose,
+            "very_verbose": args.very_verbose,
+            **job,
+        })
+
+    if errors:
+        logging.error(
+            "Not adding any jobs: %d line(s) could not be read", errors)
+        sys.exit(1)
+
+    for job in jobs:
+        _finish_job(job)
+    lib.job_store.get_job_store().add_many(jobs)
+
+
 async def get_jobs():
     out = []
-    jobs_dir = litani.get_cache_dir() / litani.JOBS_DIR
+    store = lib.job_store.get_job_store()
 
-    if not jobs_dir.exists():
+    if not store.exists():
         logging.warning("No jobs have been added")
         return out
 
-    for job in jobs_dir.iterdir():
-        with open(job) as handle:
-            job_dict = json.load(handle)
-            for key in _PRIVATE_JOB_FIELDS:
-                job_dict.pop(key)
-            out.append(job_dict)
+    for job_dict in store.get_all():
+        for key in _PRIVATE_JOB_FIELDS:
+            job_dict.pop(key)
+        out.append(job_dict)
     return out
 
 
@@ -304,21 +549,22 @@ async def print_jobs(args=None):
 
 
 def _delete_jobs():
-    jobs_dir = litani.get_cache_dir() / litani.JOBS_DIR
-
-    try:
-        for job_file in jobs_dir.iterdir():
-            os.unlink(job_file)
-    except FileNotFoundError:
-        pass
+    lib.job_store.get_job_store().delete_all()
 
 
 async def set_jobs(job_list):
-    _delete_jobs()
+    filler = JobFiller()
+    stages = _get_stages()
+    filled_jobs = []
     for job in job_list:
-        filled_job = fill_job(job)
+        filled_job = filler(job)
         filled_job["subcommand"] = "add-job"
-        await add_job(filled_job)
+        _check_stage(filled_job, stages)
+        _finish_job(filled_job)
+        filled_jobs.append(filled_job)
+
+    _delete_jobs()
+    lib.job_store.get_job_store().add_many(filled_jobs)
 
 
 async def set_jobs_command(args):
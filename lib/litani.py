@@ -22,6 +22,8 @@ import shutil
 import sys
 import uuid
 
+import lib.job_store
+
 
 CACHE_FILE = "cache.json"
 CACHE_POINTER = ".litani_cache_dir"
@@ -262,17 +264,14 @@ def add_jobs_to_cache():
     been added, this method should be called so that all of the individual JSON
     job files get added to the single cache file, ready to be run.
     """
-    jobs = []
     cache_dir = get_cache_dir()
-    jobs_dir = cache_dir / JOBS_DIR
-    if not jobs_dir.exists():
+    store = lib.job_store.get_job_store(cache_dir)
+    if not store.exists():
         logging.error(
             "Cannot run build: no jobs were added. Run `litani add-job` one or "
             "more times before running `litani run-build`.")
         sys.exit(1)
-    for job_file in os.listdir(jobs_dir):
-        with open(jobs_dir / job_file) as handle:
-            jobs.append(json.load(handle))
+    jobs = store.get_all()
 
     with open(cache_dir / CACHE_FILE) as handle:
         cache = json.load(handle)
@@ -13,10 +13,12 @@
 
 
 import asyncio
+import concurrent.futures
 import dataclasses
 import datetime
 import enum
 import functools
+import hashlib
 import json
 import logging
 import os
@@ -29,7 +31,13 @@ import uuid
 import jinja2
 
 from lib import litani
+import lib.adaptive_parallelism
+import lib.critical_path
 import lib.graph
+import lib.job_log
+import lib.parallelism_trace
+import lib.snapshot
+import lib.svg_chart
 import lib.util
 
 
@@ -112,6 +120,121 @@ class Gnuplot:
         return lines
 
 
+    def plot(self, env, template_name, **context):
+        gnu_file = env.get_template(template_name).render(**context)
+        return self.render(gnu_file)
+
+
+
+class SvgPlotter:
+    """Draws the charts that the gnuplot templates describe, in-process"""
+
+    def __init__(self):
+        self._charts = {
+            "memory-trace.jinja.gnu": self._memory_trace,
+            "memory-peak-box.jinja.gnu": self._memory_peak_box,
+            "runtime-box.jinja.gnu": self._runtime_box,
+            "run-parallelism.jinja.gnu": self._run_parallelism,
+        }
+
+
+    @staticmethod
+    def should_render():
+        return True
+
+
+    def plot(self, _, template_name, **context):
+        return self._charts[template_name](**context)
+
+
+    @staticmethod
+    def _memory_trace(job):
+        trace = job["memory_trace"]["trace"]
+        return lib.svg_chart.time_series(
+            lib.svg_chart.parse_times([s["time"] for s in trace]), [
+                ([s["rss"] for s in trace], "#ab47bc"),
+                ([s["vsz"] for s in trace], "#4caf50"),
+            ], width=565, height=96, log_y=True,
+            y_format=lib.svg_chart.si_bytes, grid=True)
+
+
+    @staticmethod
+    def _memory_peak_box(group_name, jobs):
+        return lib.svg_chart.box_plot(
+            [j["memory_trace"]["peak"]["rss"] for j in jobs],
+            [j["wrapper_arguments"]["pipeline_name"] for j in jobs],
+            title=f"Peak resident memory for {group_name}",
+            y_format=lib.svg_chart.si_bytes)
+
+
+    @staticmethod
+    def _runtime_box(group_name, jobs):
+        return lib.svg_chart.box_plot(
+            [j["duration"] for j in jobs],
+            [j["wrapper_arguments"]["pipeline_name"] for j in jobs],
+            title=f"Runtime for {group_name}", ylabel="seconds")
+
+
+    @staticmethod
+    def _run_parallelism(trace, n_proc, adaptive=None, **_):
+        times = lib.svg_chart.parse_times([s["time"] for s in trace])
+        series = [([s["running"] for s in trace], "#ab47bc")]
+        annotations = []
+        if n_proc:
+            series.append(([n_proc] * len(trace), "#cc0000"))
+            annotations.append(
+                (times[-1], n_proc + 0.5, f"# cores: {n_proc}", "#cc0000"))
+        if adaptive:
+            series.append(([s["limit"] for s in trace], "#1e88e5"))
+            changes = adaptive["adjustments"]
+            for time, change in zip(lib.svg_chart.parse_times(
+                    [c["time"] for c in changes]), changes):
+                annotations.append((
+                    time, change["limit"] + 0.5, change["reason"],
+                    "#1e88e5"))
+        return lib.svg_chart.time_series(
+            times, series, width=720, height=320, ylabel="# parallel jobs",
+            x_ticks=True, annotations=annotations)
+
+
+
+CHART_BACKENDS = {
+    "svg": SvgPlotter,
+    "gnuplot": Gnuplot,
+}
+
+
+class _TemplateBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """Bytecode cache whose entries are keyed by Litani version and mtime
+
+    The cache outlives both the report pass and the process, so a template is
+    only compiled again after it is modified or Litani is upgraded.
+    """
+
+    def get_cache_key(self, name, filename=None):
+        key = super().get_cache_key(name, filename)
+        try:
+            mtime = os.stat(filename).st_mtime_ns if filename else None
+        except OSError:
+            mtime = None
+        return hashlib.sha1(
+            f"{litani.VERSION}:{mtime}:{key}".encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def get_jinja_env():
+    """Return the template environment that is shared by all report passes"""
+
+    template_dir = pathlib.Path(__file__).parent.parent / "templates"
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(template_dir)),
+        autoescape=jinja2.select_autoescape(
+            enabled_extensions=('html'),
+            default_for_string=True),
+        bytecode_cache=_TemplateBytecodeCache(
+            pattern="__litani_template_%s.cache"))
+
+
 # ______________________________________________________________________________
 # Job renderers
 # ``````````````````````````````````````````````````````````````````````````````
@@ -122,45 +245,108 @@ class Gnuplot:
 
 
 class PipelineDepgraphRenderer:
-    def __init__(self, should_render=True):
+    """Renders each pipeline's dependency graph to SVG using Graphviz
+
+    Rendered graphs are kept in the cache directory, named after a hash of the
+    graph's DOT text. A pipeline's graph only changes when jobs are added to it
+    or when a job changes color (i.e. it starts or finishes), so most render
+    passes find every graph in the cache. prerender() runs dot on a pool of
+    worker threads for the pipelines whose graph is not in the cache.
+    """
+
+    def __init__(self, should_render=True, max_workers=None):
         is_graphviz_installed = shutil.which("dot") is not None
         if not is_graphviz_installed:
             logging.info(
                 "Graphviz is not installed; pipeline dependency "
                 "graph cannot be rendered")
         self.should_render = should_render and is_graphviz_installed
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
 
+        # pipeline name -> cached SVG file for the pipeline's current graph
+        self.svg_files = {}
 
-    def render_to_file(self, out_file, pipe):
-        dot_graph = lib.graph.SinglePipelineGraph.render(pipe)
-        out_file.parent.mkdir(exist_ok=True, parents=True)
-        with open(out_file, "w") as handle:
-            with subprocess.Popen(
-                    ["dot", "-Tsvg"], text=True, stdin=subprocess.PIPE,
-                    stdout=handle) as proc:
-                proc.communicate(input=dot_graph)
-            if proc.returncode:
-                logging.error("Failed to run dot. Graph: ")
-                logging.error(dot_graph)
-                sys.exit(1)
-        return True
+        # Pipelines whose svg_files entry is up to date for this render pass
+        self._prerendered = set()
+
+
+    @staticmethod
+    def get_svg_cache_dir():
+        return litani.get_cache_dir() / "depgraphs"
+
+
+    @staticmethod
+    def render_to_file(out_file, dot_graph):
+        with subprocess.Popen(
+                ["dot", "-Tsvg"], text=True, stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE) as proc:
+            svg, _ = proc.communicate(input=dot_graph)
+        if proc.returncode:
+            logging.error("Failed to run dot. Graph: ")
+            logging.error(dot_graph)
+            sys.exit(1)
+        with litani.atomic_write(out_file) as handle:
+            handle.write(svg)
+
+
+    def prerender(self, pipes):
+        """Ensure that the graphs of pipes are in the cache"""
+
+        if not self.should_render:
+            return
+
+        cache_dir = self.get_svg_cache_dir()
+        to_render = {}
+        svg_files = {}
+        for pipe in pipes:
+            dot_graph = lib.graph.SinglePipelineGraph.render(pipe)
+            digest = hashlib.sha256(dot_graph.encode("utf-8")).hexdigest()
+            svg_file = cache_dir / f"{digest}.svg"
+            svg_files[pipe["name"]] = svg_file
+            if not svg_file.exists():
+                to_render[svg_file] = dot_graph
+
+        if to_render:
+            logging.debug(
+                "Running dot for %d of %d pipelines", len(to_render),
+                len(svg_files))
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers) as pool:
+                futures = [
+                    pool.submit(self.render_to_file, svg_file, dot_graph)
+                    for svg_file, dot_graph in to_render.items()]
+                for future in futures:
+                    future.result()
+
+        # Graphs that a pipeline has moved on from will not be needed again.
+        # Report directories that use them have their own hard link.
+        old_files = set(self.svg_files.values())
+        self.svg_files.update(svg_files)
+        for svg_file in old_files - set(self.svg_files.values()):
+            try:
+                os.unlink(svg_file)
+            except FileNotFoundError:
+                pass
+        self._prerendered.update(svg_files)
 
 
     def render(self, render_root, pipe_url, pipe):
         if not self.should_render:
             return
-        out_rel = pipe_url / "dependencies.svg"
-        out_file = render_root / out_rel
-        success = self.render_to_file(out_file=out_file, pipe=pipe)
-        if success:
-            pipe["dependencies_url"] = "dependencies.svg"
+        if pipe["name"] not in self._prerendered:
+            self.prerender([pipe])
+        self._prerendered.discard(pipe["name"])
+        out_file = render_root / pipe_url / "dependencies.svg"
+        out_file.parent.mkdir(exist_ok=True, parents=True)
+        lib.snapshot.link_or_copy(self.svg_files[pipe["name"]], out_file)
+        pipe["dependencies_url"] = "dependencies.svg"
 
 
 
 @dataclasses.dataclass
 class MemoryTraceRenderer:
     jinja_env: jinja2.Environment
-    gnuplot: Gnuplot
+    plotter: object
 
 
     @staticmethod
@@ -172,18 +358,17 @@ class MemoryTraceRenderer:
 
     def render_preview(self, job):
         job["memory_trace_preview"] = []
-        if not self.gnuplot.should_render():
+        if not self.plotter.should_render():
             return
 
-        templ = self.jinja_env.get_template("memory-trace.jinja.gnu")
-        gnu_file = templ.render(job=job)
-        lines = self.gnuplot.render(gnu_file)
+        lines = self.plotter.plot(
+            self.jinja_env, "memory-trace.jinja.gnu", job=job)
         job["memory_trace_preview"] = lines
 
 
     @staticmethod
-    def render(_, jinja_env, job, gnuplot):
-        mtr = MemoryTraceRenderer(jinja_env=jinja_env, gnuplot=gnuplot)
+    def render(_, jinja_env, job, plotter):
+        mtr = MemoryTraceRenderer(jinja_env=jinja_env, plotter=plotter)
         mtr.render_preview(job)
 
 
@@ -227,8 +412,13 @@ class JobOutcomeTableRenderer:
     def render(out_dir, jinja_env, job):
         otr = JobOutcomeTableRenderer(out_dir=out_dir, jinja_env=jinja_env)
         otr.render_table(table=job["loaded_outcome_dict"])
-        job["outcome_table_html_url"] = str(otr.get_html_url())
-        job["outcome_table_json_url"] = str(otr.get_json_url())
+
+        # URLs are relative to the pipeline page, so that they remain valid
+        # when the page is carried over into a later report directory
+        job["outcome_table_html_url"] = str(
+            otr.get_html_url().relative_to(out_dir))
+        job["outcome_table_json_url"] = str(
+            otr.get_json_url().relative_to(out_dir))
 
 
 
@@ -237,52 +427,63 @@ class ParallelismGraphRenderer:
     """Renders parallelism of run over time"""
     run: dict
     env: jinja2.Environment
-    gnuplot: Gnuplot
+    plotter: object
 
 
-    # The parallelism trace includes timestamps with microsecond precision, but
-    # gnuplot can't deal with fractional seconds. So just for the purposes of
-    # the graph, return the maximum parallelism encountered at each second.  We
-    # still leave the microsecond stamps in the JSON file for those who need it.
+    # The parallelism trace has millisecond precision, but gnuplot can't deal
+    # with fractional seconds. So just for the purposes of the graph, return
+    # the maximum parallelism encountered at each second. We still leave the
+    # millisecond offsets in the JSON file for those who need it.
     @staticmethod
-    def process_trace(trace):
-
-        def overwrite(field, op, d1, d2):
-            d1[field] = op(d1[field], d2[field])
-
+    def process_trace(compact_trace, adaptive=None):
         tmp = {}
-        for item in trace:
-            ms_precision = datetime.datetime.strptime(
-                item["time"], lib.litani.TIME_FORMAT_MS)
-            s_precision = ms_precision.strftime(lib.litani.TIME_FORMAT_R)
+        for time, running, finished, total in \
+                lib.parallelism_trace.iter_samples(compact_trace):
+            second = int(time)
             try:
-                tmp[s_precision]
+                item = tmp[second]
             except KeyError:
-                tmp[s_precision] = dict(item)
-                tmp[s_precision].pop("time")
+                tmp[second] = {
+                    "running": running,
+                    "finished": finished,
+                    "total": total,
+                }
             else:
-                overwrite("finished", min, tmp[s_precision], item)
-                overwrite("running", max, tmp[s_precision], item)
-                overwrite("total", max, tmp[s_precision], item)
-        return sorted(
-            [{"time": time, **item} for time, item in tmp.items()],
-            key=lambda x: x["time"])
+                item["finished"] = min(item["finished"], finished)
+                item["running"] = max(item["running"], running)
+                item["total"] = max(item["total"], total)
+        if adaptive:
+            # The number of jobs that were allowed to run at the end of each
+            # second
+            seconds = sorted(tmp)
+            limits = lib.adaptive_parallelism.get_limits(
+                adaptive, [s + 1 for s in seconds])
+            for second, limit in zip(seconds, limits):
+                tmp[second]["limit"] = limit
+        return [{
+            "time": datetime.datetime.fromtimestamp(
+                second, datetime.timezone.utc).strftime(
+                    lib.litani.TIME_FORMAT_R),
+            **item,
+        } for second, item in sorted(tmp.items())]
 
 
     def render(self, template_name):
         if not all((
-                self.gnuplot.should_render(),
-                self.run["parallelism"].get("trace")
+                self.plotter.should_render(),
+                self.run["parallelism"].get("compact_trace", {}).get(
+                    "offsets_ms")
         )):
             return []
 
-        gnu_templ = self.env.get_template(template_name)
-        gnu_file = gnu_templ.render(
+        return [self.plotter.plot(
+            self.env, template_name,
             n_proc=self.run["parallelism"].get("n_proc"),
             max_parallelism=self.run["parallelism"].get("max_parallelism"),
-            trace=self.process_trace(self.run["parallelism"]["trace"]))
-
-        return [self.gnuplot.render(gnu_file)]
+            adaptive=self.run["parallelism"].get("adaptive"),
+            trace=self.process_trace(
+                self.run["parallelism"]["compact_trace"],
+                self.run["parallelism"].get("adaptive")))]
 
 
 
@@ -291,7 +492,7 @@ class StatsGroupRenderer:
     """Renders graphs for jobs that are part of a 'stats group'."""
     run: dict
     env: jinja2.Environment
-    gnuplot: Gnuplot
+    plotter: object
 
 
     def get_stats_groups(self, job_filter):
@@ -326,26 +527,127 @@ class StatsGroupRenderer:
 
 
     def render(self, job_filter, template_name):
-        if not self.gnuplot.should_render():
+        if not self.plotter.should_render():
             return []
         stats_groups = self.get_stats_groups(job_filter)
         svgs = []
-        gnu_templ = self.env.get_template(template_name)
         for group_name, jobs in stats_groups:
             if len(jobs) < 2:
                 continue
-            gnu_file = gnu_templ.render(
-                group_name=group_name, jobs=jobs)
-            svg_lines = self.gnuplot.render(gnu_file)
+            svg_lines = self.plotter.plot(
+                self.env, template_name, group_name=group_name, jobs=jobs)
             svgs.append(svg_lines)
         return svgs
 
 
 
+@dataclasses.dataclass
+class _RenderedPipeline:
+    """Remembers what was rendered for a pipeline during a previous pass"""
+
+    fingerprint: str
+    pipe_fields: dict
+    job_fields: dict
+
+
+    # Keys that the job and pipeline renderers add to the run
+    _PIPE_KEYS = ("dependencies_url",)
+    _JOB_KEYS = (
+        "outcome_table_html_url", "outcome_table_json_url",
+        "memory_trace_preview")
+
+
+    @staticmethod
+    def fingerprint_of(run, pipe):
+        jobs = []
+        for stage in pipe["ci_stages"]:
+            for job in stage["jobs"]:
+                jobs.append((
+                    stage["name"], job["wrapper_arguments"]["job_id"],
+                    job["complete"], job.get("start_time"),
+                    job.get("end_time"), job.get("outcome")))
+        data = json.dumps(
+            [run["run_id"], run["start_time"], pipe["status"], jobs])
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+    @staticmethod
+    def record(fingerprint, pipe):
+        pipe_fields = {
+            k: pipe[k] for k in _RenderedPipeline._PIPE_KEYS if k in pipe}
+        job_fields = {}
+        for stage in pipe["ci_stages"]:
+            for job in stage["jobs"]:
+                job_fields[job["wrapper_arguments"]["job_id"]] = {
+                    k: job[k] for k in _RenderedPipeline._JOB_KEYS
+                    if k in job}
+        return _RenderedPipeline(fingerprint, pipe_fields, job_fields)
+
+
+    def restore(self, pipe):
+        """Add the fields that rendering would have added to the run"""
+
+        pipe.update(self.pipe_fields)
+        for stage in pipe["ci_stages"]:
+            for job in stage["jobs"]:
+                job.update(
+                    self.job_fields.get(job["wrapper_arguments"]["job_id"], {}))
+
+
+
 @dataclasses.dataclass
 class ReportRenderer:
     report_dir: pathlib.Path
     pipeline_depgraph_renderer: PipelineDepgraphRenderer
+    rendered_pipelines: dict = dataclasses.field(default_factory=dict)
+    previous_report_dir: pathlib.Path = None
+    artifact_snapshotter: lib.snapshot.Snapshotter = dataclasses.field(
+        default_factory=lib.snapshot.Snapshotter)
+    log_snapshotter: lib.snapshot.Snapshotter = dataclasses.field(
+        default_factory=lambda: lib.snapshot.Snapshotter(
+            exclude=lib.job_log.is_partial))
+    chart_backend: str = "svg"
+
+
+    def carry_over_pipeline(self, pipe, render_root, fingerprint):
+        """Copy a pipeline's pages from the previous report if unchanged
+
+        Returns True iff the pages were copied, in which case the pipeline does
+        not need to be rendered again.
+        """
+
+        rendered = self.rendered_pipelines.get(pipe["name"])
+        if not rendered or rendered.fingerprint != fingerprint:
+            return False
+        if self.previous_report_dir is None:
+            return False
+        try:
+            lib.snapshot.link_tree(
+                self.previous_report_dir / pipe["url"],
+                render_root / pipe["url"])
+        except (FileNotFoundError, shutil.Error):
+            return False
+        rendered.restore(pipe)
+        return True
+
+
+    def render_pipeline(self, run, pipe, render_root, env, plotter, templ):
+        self.pipeline_depgraph_renderer.render(
+            render_root=render_root,
+            pipe_url=pathlib.Path(pipe["url"]), pipe=pipe)
+        for stage in pipe["ci_stages"]:
+            for job in stage["jobs"]:
+                if JobOutcomeTableRenderer.should_render(job):
+                    JobOutcomeTableRenderer.render(
+                        render_root / pipe["url"], env, job)
+                if MemoryTraceRenderer.should_render(job):
+                    MemoryTraceRenderer.render(
+                        render_root / pipe["url"], env, job, plotter)
+
+        pipe_page = templ.render(run=run, pipe=pipe)
+        with litani.atomic_write(
+                render_root / pipe["url"] / "index.html") as handle:
+            print(pipe_page, file=handle)
 
 
     def __call__(self, run):
@@ -354,20 +656,25 @@ class ReportRenderer:
         old_report_dir_path = litani.get_report_dir().resolve()
         old_report_dir = litani.ExpireableDirectory(old_report_dir_path)
 
+        # On the first render there is no old report. Don't expire through the
+        # report symlink in that case, since by then it points to the new one.
+        has_old_report = old_report_dir_path.exists()
+
         artifact_dir = temporary_report_dir / "artifacts"
-        shutil.copytree(litani.get_artifacts_dir(), artifact_dir)
+        self.artifact_snapshotter.snapshot(
+            litani.get_artifacts_dir(), artifact_dir)
+
+        logs_dir = lib.job_log.get_logs_dir()
+        if logs_dir.exists():
+            self.log_snapshotter.snapshot(
+                logs_dir, temporary_report_dir / lib.job_log.LOGS_DIR)
 
-        template_dir = pathlib.Path(__file__).parent.parent / "templates"
-        env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(str(template_dir)),
-            autoescape=jinja2.select_autoescape(
-                enabled_extensions=('html'),
-                default_for_string=True))
+        env = get_jinja_env()
 
         render_artifact_indexes(artifact_dir, env)
 
-        gnuplot = Gnuplot()
-        svgs = get_dashboard_svgs(run, env, gnuplot)
+        plotter = CHART_BACKENDS[self.chart_backend]()
+        svgs = get_dashboard_svgs(run, env, plotter)
 
         litani_report_archive_path = os.getenv("LITANI_REPORT_ARCHIVE_PATH")
 
@@ -377,31 +684,33 @@ class ReportRenderer:
 
         front_page_outputs = {}
         pipe_templ = env.get_template("pipeline.jinja.html")
+        fingerprints = {}
+        to_render = []
         for pipe in run["pipelines"]:
-            self.pipeline_depgraph_renderer.render(
-                render_root=temporary_report_dir,
-                pipe_url=pathlib.Path(pipe["url"]), pipe=pipe)
+            fingerprint = _RenderedPipeline.fingerprint_of(run, pipe)
+            fingerprints[pipe["name"]] = fingerprint
+            if not self.carry_over_pipeline(
+                    pipe, temporary_report_dir, fingerprint):
+                to_render.append(pipe)
+
+        self.pipeline_depgraph_renderer.prerender(to_render)
+        for pipe in to_render:
+            self.render_pipeline(
+                run, pipe, temporary_report_dir, env, plotter, pipe_templ)
+
+        rendered_pipelines = {}
+        for pipe in run["pipelines"]:
+            rendered_pipelines[pipe["name"]] = _RenderedPipeline.record(
+                fingerprints[pipe["name"]], pipe)
+
             for stage in pipe["ci_stages"]:
                 for job in stage["jobs"]:
-                    if JobOutcomeTableRenderer.should_render(job):
-                        JobOutcomeTableRenderer.render(
-                            temporary_report_dir / pipe["url"], env, job)
-                    if MemoryTraceRenderer.should_render(job):
-                        MemoryTraceRenderer.render(
-                            temporary_report_dir / pipe["url"], env, job,
-                            gnuplot)
-
                     tags = job["wrapper_arguments"]["tags"]
                     description = job["wrapper_arguments"]["description"]
                     if tags and "front-page-text" in tags:
                         if "stdout" in job and job["stdout"]:
                             front_page_outputs[description] = job
 
-            pipe_page = pipe_templ.render(run=run, pipe=pipe)
-            with litani.atomic_write(
-                    temporary_report_dir / pipe["url"] / "index.html") as handle:
-                print(pipe_page, file=handle)
-
         if "end_time" in run:
             s = datetime.datetime.strptime(
                 run["start_time"], litani.TIME_FORMAT_R)
@@ -409,13 +718,17 @@ class ReportRenderer:
                 run["end_time"], litani.TIME_FORMAT_R)
             runtime = (e - s).seconds
             run["__duration_str"] = s_to_hhmmss(runtime)
+            critical_path = lib.critical_path.analyze(run)
+        else:
+            critical_path = None
 
         dash_templ = env.get_template("dashboard.jinja.html")
         page = dash_templ.render(
             run=run, svgs=svgs,
             litani_version=litani.VERSION,
             litani_report_archive_path=litani_report_archive_path,
-            summary=get_summary(run), front_page_outputs=front_page_outputs)
+            summary=get_summary(run), front_page_outputs=front_page_outputs,
+            critical_path=critical_path)
 
         with litani.atomic_write(temporary_report_dir / "index.html") as handle:
             print(page, file=handle)
@@ -428,11 +741,14 @@ class ReportRenderer:
         os.rename(temp_symlink_dir, self.report_dir)
 
         locked_dir.release()
+        self.rendered_pipelines = rendered_pipelines
+        self.previous_report_dir = temporary_report_dir
 
-        try:
-            old_report_dir.expire()
-        except FileNotFoundError:
-            pass
+        if has_old_report:
+            try:
+                old_report_dir.expire()
+            except FileNotFoundError:
+                pass
 
         litani.unlink_expired()
 
@@ -667,9 +983,9 @@ def jobs_of(run):
                 yield job
 
 
-def get_dashboard_svgs(run, env, gnuplot):
-    stats_renderer = StatsGroupRenderer(run, env, gnuplot)
-    p_renderer = ParallelismGraphRenderer(run, env, gnuplot)
+def get_dashboard_svgs(run, env, plotter):
+    stats_renderer = StatsGroupRenderer(run, env, plotter)
+    p_renderer = ParallelismGraphRenderer(run, env, plotter)
 
     return {
         "Runtime": stats_renderer.render(
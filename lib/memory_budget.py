@@ -0,0 +1,164 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""Keep jobs that are expected to use a lot of memory from running together.
+
+Pools limit how many jobs run at once, whatever their size. With `litani
+run-build --memory-budget SIZE`, each job that has an *expected_memory* (given
+to add-job, or filled in by run-build from the job's peak memory use in
+earlier runs) only starts once the expected memory of the jobs that are
+already running, plus its own, fits in SIZE. A job that is larger than the
+whole budget runs once nothing else that has reserved memory is running.
+
+Jobs reserve memory in a ledger file that every `litani exec` on the machine
+shares, under an exclusive lock, so the budget holds across engines and across
+concurrent runs. The ledger records the process that made each reservation,
+and drops reservations of processes that no longer exist. A waiting job does
+not start before a job that has been waiting longer, unless it fits in the
+budget alongside that job as well. If another user owns the shared ledger,
+jobs use a ledger of their own user instead; if there is no ledger that they
+can write, they run without waiting.
+
+The native engine reserves a job's memory before giving it a job slot. With
+ninja, `litani exec` reserves the memory once ninja has started it, so a job
+that is waiting for memory holds one of ninja's -j slots.
+"""
+
+
+import asyncio
+import contextlib
+import dataclasses
+import fcntl
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import time
+import uuid
+
+
+def get_default_path():
+    return pathlib.Path(tempfile.gettempdir()) / "litani" / "memory-budget.json"
+
+
+def get_user_path():
+    return pathlib.Path(tempfile.gettempdir()) / \
+        f"litani-{os.getuid()}" / "memory-budget.json"
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+
+@dataclasses.dataclass
+class Ledger:
+    path: pathlib.Path = dataclasses.field(default_factory=get_default_path)
+    poll_interval: float = 0.25
+
+
+    def _open(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            return open(self.path, "a+")
+        except OSError as e:
+            fallback = get_user_path()
+            if self.path == fallback:
+                raise
+            logging.debug(
+                "Could not open memory ledger '%s' (%s); using '%s'",
+                self.path, e, fallback)
+            self.path = fallback
+            return self._open()
+
+
+    @contextlib.contextmanager
+    def _entries(self):
+        """Yield the ledger's entries, writing them back afterward"""
+
+        with self._open() as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            handle.seek(0)
+            try:
+                entries = json.loads(handle.read() or "{}")
+            except json.decoder.JSONDecodeError:
+                entries = {}
+            entries = {
+                token: entry for token, entry in entries.items()
+                if _is_alive(entry["pid"])}
+            yield entries
+            handle.seek(0)
+            handle.truncate()
+            handle.write(json.dumps(entries))
+
+
+    def try_reserve(self, token, size, budget):
+        """Reserve size bytes for token if they fit in budget; otherwise,
+        record that token is waiting. Returns True if the bytes are reserved.
+        """
+
+        with self._entries() as entries:
+            entry = entries.setdefault(token, {
+                "pid": os.getpid(),
+                "size": size,
+                "since": time.time(),
+                "reserved": False,
+            })
+            used = sum(e["size"] for e in entries.values() if e["reserved"])
+            fits = used + size <= budget or not used
+
+            older = [
+                e for t, e in entries.items()
+                if not e["reserved"] and t != token and
+                e["since"] < entry["since"]]
+            if older:
+                first = min(older, key=lambda e: e["since"])
+                fits = fits and used + size + first["size"] <= budget
+
+            entry["reserved"] = fits
+            return fits
+
+
+    def release(self, token):
+        with self._entries() as entries:
+            entries.pop(token, None)
+
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, size, budget):
+        """Wait until size bytes fit in budget, and yield how many seconds
+        that took"""
+
+        token = str(uuid.uuid4())
+        start = time.monotonic()
+        try:
+            while not self.try_reserve(token, size, budget):
+                await asyncio.sleep(self.poll_interval)
+        except OSError as e:
+            logging.warning(
+                "Could not use memory ledger '%s' (%s); not waiting for "
+                "memory", self.path, e)
+            yield time.monotonic() - start
+            return
+        try:
+            yield time.monotonic() - start
+        finally:
+            self.release(token)
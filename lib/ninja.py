@@ -13,16 +13,129 @@
 
 
 import dataclasses
-import datetime
 import io
 import math
 import os
 import pathlib
 import re
+import shutil
+import signal
 import subprocess
 import threading
+import time
 
-import lib.litani
+import lib.parallelism_trace
+
+
+
+@dataclasses.dataclass
+class _TerminalWidth:
+    """The width of the terminal, looked up again only after a resize
+
+    Progress is printed every time a job finishes, so the width used to be
+    looked up by running `tput cols` thousands of times per run.
+    """
+
+    width: int = None
+    watching: bool = False
+
+
+    def watch(self):
+        """Forget the width whenever the terminal is resized
+
+        Signal handlers can only be installed from the main thread. If this
+        was never called, get() asks the terminal for its width every time,
+        which is an ioctl rather than a subprocess.
+        """
+
+        if self.watching or not hasattr(signal, "SIGWINCH"):
+            return
+        if threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGWINCH, self._on_resize)
+        self.watching = True
+
+
+    def _on_resize(self, *_):
+        self.width = None
+
+
+    def get(self):
+        if os.getenv("TERM") is None:
+            return 80
+        width = self.width
+        if width is None:
+            width = shutil.get_terminal_size().columns
+            if self.watching:
+                self.width = width
+        return width
+
+
+_TERMINAL_WIDTH = _TerminalWidth()
+
+
+def watch_tty_width():
+    _TERMINAL_WIDTH.watch()
+
+
+def get_tty_width():
+    return _TERMINAL_WIDTH.get()
+
+
+def print_progress(finished, total, message):
+    """Overwrite the current terminal line with "[finished/total] message"
+    """
+
+    tty_width = get_tty_width()
+    if not tty_width:
+        message_fmt = message
+    else:
+        f_width = int(math.log10(finished)) + 1 if finished else 1
+        t_width = int(math.log10(total)) + 1 if total else 1
+        progress_width = f_width + t_width + len("[/] ")
+
+        if len(message) + progress_width <= tty_width:
+            message_fmt = "[%d/%d] %s%s" % (
+                finished, total, message,
+                " " * (tty_width - len(message) - progress_width))
+        else:
+            message_width = tty_width - progress_width - len("...")
+            message_fmt = "[%d/%d] %s..." % (
+                finished, total, message[:message_width])
+    print("\r%s" % message_fmt, end="")
+
+
+
+@dataclasses.dataclass
+class ProgressLine:
+    """Prints progress with print_progress() at most once every *interval*
+    seconds
+
+    Updates in between are dropped, except that the latest one is printed by
+    finish(), and an update where all jobs have finished is always printed.
+    """
+
+    interval: float = 0.1
+    last_print: float = None
+    pending: tuple = None
+
+
+    def update(self, finished, total, message):
+        now = time.monotonic()
+        if finished != total and self.last_print is not None and \
+                now - self.last_print < self.interval:
+            self.pending = (finished, total, message)
+            return
+        self.pending = None
+        self.last_print = now
+        print_progress(finished, total, message)
+
+
+    def finish(self):
+        if self.pending:
+            print_progress(*self.pending)
+            self.pending = None
+        print()
 
 
 
@@ -49,47 +162,16 @@ class _StatusParser:
 class _OutputAccumulator:
     out_stream: io.RawIOBase
     status_parser: _StatusParser
-    concurrency_graph: list = dataclasses.field(default_factory=list)
+    trace: lib.parallelism_trace.Trace = dataclasses.field(
+        default_factory=lib.parallelism_trace.Trace)
+    progress: ProgressLine = dataclasses.field(default_factory=ProgressLine)
     finished: int = None
     total: int = None
     thread: threading.Thread = None
 
 
-    @staticmethod
-    def get_tty_width():
-        if os.getenv("TERM") is None:
-            return 80
-        try:
-            proc = subprocess.run(
-                ["tput", "cols"], text=True, stdout=subprocess.PIPE, check=True)
-        except (FileNotFoundError, subprocess.CalledProcessError):
-            return None
-        if proc.returncode:
-            return None
-        try:
-            return int(proc.stdout.strip())
-        except TypeError:
-            return None
-
-
     def print_progress(self, message):
-        tty_width = self.get_tty_width()
-        if not tty_width:
-            message_fmt = message
-        else:
-            f_width = int(math.log10(self.finished)) + 1 if self.finished else 1
-            t_width = int(math.log10(self.total)) + 1 if self.total else 1
-            progress_width = f_width + t_width + len("[/] ")
-
-            if len(message) + progress_width <= tty_width:
-                message_fmt = "[%d/%d] %s%s" % (
-                    self.finished, self.total, message,
-                    " " * (tty_width - len(message) - progress_width))
-            else:
-                message_width = tty_width - progress_width - len("...")
-                message_fmt = "[%d/%d] %s..." % (
-                    self.finished, self.total, message[:message_width])
-        print("\r%s" % message_fmt, end="")
+        self.progress.update(self.finished, self.total, message)
 
 
     def process_output(self):
@@ -105,10 +187,8 @@ class _OutputAccumulator:
                 print(line)
                 continue
 
-            now = datetime.datetime.now(datetime.timezone.utc)
-            now_str = now.strftime(lib.litani.TIME_FORMAT_MS)
-            status["time"] = now_str
-            self.concurrency_graph.append(status)
+            self.trace.record(
+                status["running"], status["finished"], status["total"])
 
             if any((
                     status["finished"] != self.finished,
@@ -120,7 +200,7 @@ class _OutputAccumulator:
 
     def join(self):
         self.thread.join()
-        print()
+        self.progress.finish()
 
 
     def start(self):
@@ -138,6 +218,9 @@ class Runner:
     ci_stage: str
     proc: subprocess.CompletedProcess = None
     status_parser: _StatusParser = dataclasses.field(default_factory=_StatusParser)
+    trace: lib.parallelism_trace.Trace = dataclasses.field(
+        default_factory=lib.parallelism_trace.Trace)
+    progress_interval: float = ProgressLine.interval
     out_acc: _OutputAccumulator = None
 
 
@@ -172,7 +255,10 @@ class Runner:
                 self._get_cmd(), env=env, stdout=subprocess.PIPE, text=True,
                 ) as proc:
             self.proc = proc
-            self.out_acc = _OutputAccumulator(proc.stdout, self.status_parser)
+            watch_tty_width()
+            self.out_acc = _OutputAccumulator(
+                proc.stdout, self.status_parser, self.trace,
+                ProgressLine(self.progress_interval))
             self.out_acc.start()
             self.out_acc.join()
 
@@ -182,15 +268,8 @@ class Runner:
 
 
     def get_parallelism_graph(self):
-        trace = []
-        for item in self.out_acc.concurrency_graph:
-            tmp = dict(item)
-            tmp.pop("message")
-            trace.append(tmp)
-
         return {
-            "trace": trace,
-            "max_parallelism": max(
-                [i["running"] for i in self.out_acc.concurrency_graph]),
+            "compact_trace": self.trace.encode(),
+            "max_parallelism": self.trace.max_running,
             "n_proc": os.cpu_count(),
         }
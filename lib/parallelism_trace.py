@@ -0,0 +1,130 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""A compact record of how many jobs were running over the course of a run.
+
+Each engine records a sample whenever a job starts or finishes. Rather than
+one dict with a formatted timestamp per sample, a Trace keeps four arrays of
+integers: the time of each sample in milliseconds since the first one, and the
+number of running, finished, and total jobs. A sample that is the same as the
+one before it is dropped, since the trace is a step function. If the trace
+has a resolution, samples in the same interval are merged into one that has
+the highest number of running jobs in that interval.
+
+The *compact_trace* key of the parallelism dict in run.json holds the output
+of Trace.encode(). Use decode() to get a list of samples back.
+"""
+
+
+import array
+import dataclasses
+import datetime
+
+from lib import litani
+
+
+_FIELDS = ("running", "finished", "total")
+
+
+
+@dataclasses.dataclass
+class Trace:
+    resolution_ms: int = 0
+    start: datetime.datetime = None
+    max_running: int = 0
+    offsets: array.array = dataclasses.field(
+        default_factory=lambda: array.array("q"))
+    states: dict = dataclasses.field(
+        default_factory=lambda: {f: array.array("q") for f in _FIELDS})
+
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+    def record(self, running, finished, total, now=None):
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        if self.start is None:
+            self.start = now
+        self.max_running = max(self.max_running, running)
+
+        state = (running, finished, total)
+        if self.offsets and self._get_state(-1) == state:
+            return
+
+        offset = (now - self.start) // datetime.timedelta(milliseconds=1)
+        if self.resolution_ms:
+            offset -= offset % self.resolution_ms
+            if self.offsets and self.offsets[-1] == offset:
+                self.states["running"][-1] = max(
+                    self.states["running"][-1], running)
+                self.states["finished"][-1] = finished
+                self.states["total"][-1] = total
+                return
+
+        self.offsets.append(offset)
+        for field, value in zip(_FIELDS, state):
+            self.states[field].append(value)
+
+
+    def _get_state(self, idx):
+        return tuple(self.states[f][idx] for f in _FIELDS)
+
+
+    def encode(self):
+        """Return a dict that can be serialized to JSON"""
+
+        start = self.start or datetime.datetime.now(datetime.timezone.utc)
+        return {
+            "start": start.strftime(litani.TIME_FORMAT_MS),
+            "resolution_ms": self.resolution_ms,
+            "offsets_ms": self.offsets.tolist(),
+            **{f: self.states[f].tolist() for f in _FIELDS},
+        }
+
+
+
+def _get_start(encoded):
+    return datetime.datetime.strptime(
+        encoded["start"], litani.TIME_FORMAT_MS).replace(
+            tzinfo=datetime.timezone.utc)
+
+
+def iter_samples(encoded):
+    """Yield (seconds since the epoch, running, finished, total) for each
+    sample of an encoded trace, without parsing a timestamp per sample"""
+
+    start = _get_start(encoded).timestamp()
+    for offset, *state in zip(
+            encoded["offsets_ms"], *[encoded[f] for f in _FIELDS]):
+        yield (start + offset / 1000, *state)
+
+
+def decode(encoded):
+    """Return the samples of an encoded trace as a list of dicts
+
+    Each dict has the same keys as a sample of the *trace* list that earlier
+    versions of Litani wrote to run.json.
+    """
+
+    start = _get_start(encoded)
+    ret = []
+    for offset, *state in zip(
+            encoded["offsets_ms"], *[encoded[f] for f in _FIELDS]):
+        time = start + datetime.timedelta(milliseconds=offset)
+        ret.append({
+            "time": time.strftime(litani.TIME_FORMAT_MS),
+            **dict(zip(_FIELDS, state)),
+        })
+    return ret
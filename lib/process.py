@@ -14,6 +14,7 @@
 
 import abc
 import asyncio
+import contextlib
 import dataclasses
 import datetime
 import decimal
@@ -23,10 +24,22 @@ import platform
 import signal
 import subprocess
 import sys
+import threading
 
+import lib.job_log
 import lib.litani
 
 
+_CHUNK_SIZE = 64 * 1024
+
+# Lines of /proc/<pid>/status that the Linux memory profiler sums up
+_PROC_STATUS_FIELDS = (
+    (b"VmRSS:", "rss"),
+    (b"VmSize:", "vsz"),
+    (b"VmHWM:", "hwm"),
+)
+
+
 
 class _MemoryProfiler:
     @abc.abstractmethod
@@ -34,6 +47,36 @@ class _MemoryProfiler:
         raise NotImplementedError
 
 
+    @staticmethod
+    def human_readable(memory):
+        units = ["B", "KiB", "MiB", "GiB", "TiB"]
+        idx = 0
+        memory = decimal.Decimal(memory)
+        while memory > 1023:
+            idx += 1
+            memory /= 1024
+        memory_str = memory.quantize(
+            decimal.Decimal("0.1"), rounding=decimal.ROUND_HALF_UP)
+        return f"{memory_str} {units[idx]}"
+
+
+    def compute_peak(self, trace):
+        peak = {}
+        for item in trace:
+            for k, v in item.items():
+                if k in ["time"]:
+                    continue
+                try:
+                    peak[k] = max(peak[k], v)
+                except KeyError:
+                    peak[k] = v
+
+        human_readable = {}
+        for k, v in peak.items():
+            human_readable[f"human_readable_{k}"] = self.human_readable(v)
+        return {**peak, **human_readable}
+
+
 
 class _UnixMemoryProfiler(_MemoryProfiler):
     def __init__(self):
@@ -70,36 +113,6 @@ class _UnixMemoryProfiler(_MemoryProfiler):
         return ret
 
 
-    @staticmethod
-    def human_readable(memory):
-        units = ["B", "KiB", "MiB", "GiB", "TiB"]
-        idx = 0
-        memory = decimal.Decimal(memory)
-        while memory > 1023:
-            idx += 1
-            memory /= 1024
-        memory_str = memory.quantize(
-            decimal.Decimal("0.1"), rounding=decimal.ROUND_HALF_UP)
-        return f"{memory_str} {units[idx]}"
-
-
-    def compute_peak(self, trace):
-        peak = {}
-        for item in trace:
-            for k, v in item.items():
-                if k in ["time"]:
-                    continue
-                try:
-                    peak[k] = max(peak[k], v)
-                except KeyError:
-                    peak[k] = v
-
-        human_readable = {}
-        for k, v in peak.items():
-            human_readable[f"human_readable_{k}"] = self.human_readable(v)
-        return {**peak, **human_readable}
-
-
     async def _get_ps_output(self):
         """ Format: {
             "fields": ["pid", "ppid", "rss", "vsz"],
@@ -163,6 +176,93 @@ class _UnixMemoryProfiler(_MemoryProfiler):
 
 
 
+class _LinuxMemoryProfiler(_MemoryProfiler):
+    """Reads the memory usage of a process tree from /proc
+
+    This reads only the job's processes, rather than running ps(1) and parsing
+    the whole process table for every sample. Besides the current resident set
+    and virtual memory size, it records the sum of each process's resident set
+    high-water mark (VmHWM), so that a peak between two samples is not missed.
+    """
+
+    def __init__(self, proc_dir="/proc"):
+        self.proc_dir = proc_dir
+
+
+    async def snapshot(self, root_pid):
+        """Return a dict containing memory usage of process and children"""
+
+        ret = {
+            "time":
+                datetime.datetime.now(datetime.timezone.utc).strftime(
+                    lib.litani.TIME_FORMAT_R),
+            "rss": 0,
+            "vsz": 0,
+            "hwm": 0,
+        }
+        children = self._get_children_index()
+        to_visit = [root_pid]
+        seen = set()
+        while to_visit:
+            pid = to_visit.pop()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            self._add_usage(pid, ret)
+            to_visit.extend(children.get(pid, ()))
+        return ret
+
+
+    def _get_children_index(self):
+        """Return a dict from each pid to the pids of its children
+
+        A process's parent is the fourth field of /proc/<pid>/stat. The second
+        field is the command name in parentheses, which may itself contain
+        spaces and parentheses, so fields are counted from the last ')'.
+        """
+
+        children = {}
+        try:
+            entries = os.scandir(self.proc_dir)
+        except OSError:
+            return children
+        with entries:
+            for entry in entries:
+                if not entry.name.isdigit():
+                    continue
+                try:
+                    with open(
+                            os.path.join(entry.path, "stat"), "rb") as handle:
+                        stat = handle.read()
+                except OSError:
+                    # Process exited since we listed /proc
+                    continue
+                fields = stat[stat.rfind(b")") + 2:].split(maxsplit=2)
+                try:
+                    ppid = int(fields[1])
+                except (IndexError, ValueError):
+                    continue
+                children.setdefault(ppid, []).append(int(entry.name))
+        return children
+
+
+    def _add_usage(self, pid, datum):
+        try:
+            with open(
+                    os.path.join(self.proc_dir, str(pid), "status"),
+                    "rb") as handle:
+                status = handle.read()
+        except OSError:
+            return
+        for line in status.splitlines():
+            for prefix, field in _PROC_STATUS_FIELDS:
+                if line.startswith(prefix):
+                    # Values are in kB, as in "VmRSS:\t  1234 kB"
+                    datum[field] += int(line.split()[1]) * 1024
+                    break
+
+
+
 @dataclasses.dataclass
 class _MemoryProfileAccumulator:
     profiler: _MemoryProfiler
@@ -195,6 +295,138 @@ class _MemoryProfileAccumulator:
 
 
 
+class _OutputCapture:
+    """Copies a stream to files, keeping only its first and last `limit` bytes
+    in memory
+
+    A limit of 0 keeps the whole stream.
+    """
+
+    def __init__(self, limit, handles=()):
+        self.limit = limit
+        self.handles = list(handles)
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.size = 0
+        self.lines = 0
+        self.log = None
+        self._ends_with_newline = True
+
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        self.lines += chunk.count(b"\n")
+        self._ends_with_newline = chunk.endswith(b"\n")
+        for handle in self.handles:
+            handle.write(chunk)
+        if not self.limit:
+            self.head += chunk
+            return
+        room = self.limit - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            self.tail += chunk
+            # Trim only once the tail has doubled, so that each byte is moved
+            # a bounded number of times
+            if len(self.tail) > 2 * self.limit:
+                del self.tail[:-self.limit]
+
+
+    def get_output(self):
+        """Return the captured bytes, with a note in place of any omitted ones
+
+        Output is cut at line boundaries where possible.
+        """
+
+        tail = self.tail[-self.limit:] if self.limit else self.tail
+        if self.size == len(self.head) + len(tail):
+            return bytes(self.head + tail)
+
+        head = bytes(self.head)
+        added = 0
+        if b"\n" in head:
+            head = head[:head.rfind(b"\n") + 1]
+        else:
+            head += b"\n"
+            added = 1
+        tail = bytes(tail)
+        newline = tail.find(b"\n")
+        if -1 < newline < len(tail) - 1:
+            tail = tail[newline + 1:]
+        omitted = self.size - (len(head) - added) - len(tail)
+        note = "[litani: %d bytes of output omitted]\n" % omitted
+        return head + note.encode("utf-8") + tail
+
+
+    def get_line_count(self):
+        if self._ends_with_newline:
+            return self.lines
+        return self.lines + 1
+
+
+
+def _read_proc_io(pid):
+    """Return the I/O counters of a process, or None if they are unavailable
+
+    The counters of a process include those of its children that it has
+    reaped, so reading them while a job's process is a zombie gives the I/O
+    of the whole job.
+    """
+
+    try:
+        with open(f"/proc/{pid}/io") as handle:
+            lines = handle.read().splitlines()
+    except OSError:
+        return None
+    ret = {}
+    for line in lines:
+        key, _, value = line.partition(":")
+        ret[key] = int(value)
+    return ret
+
+
+def _reap(pid):
+    """Wait for a child to exit, then reap it
+
+    Returns the child's return code (negative if it was killed by a signal),
+    its resource usage (including that of all its descendants that were
+    reaped), and its I/O counters.
+    """
+
+    io_counters = None
+    try:
+        # Wait for the child to exit without reaping it, so that its
+        # /proc/<pid>/io is still there
+        os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+        io_counters = _read_proc_io(pid)
+    except (AttributeError, OSError):
+        pass
+    _, status, rusage = os.wait4(pid, 0)
+    return os.waitstatus_to_exitcode(status), rusage, io_counters
+
+
+def _get_resource_usage(rusage, io_counters):
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    rss_unit = 1 if platform.system() == "Darwin" else 1024
+    io_counters = io_counters or {}
+    return {
+        "user_time": rusage.ru_utime,
+        "system_time": rusage.ru_stime,
+        "max_rss": rusage.ru_maxrss * rss_unit,
+        "voluntary_context_switches": rusage.ru_nvcsw,
+        "involuntary_context_switches": rusage.ru_nivcsw,
+        "block_input_operations": rusage.ru_inblock,
+        "block_output_operations": rusage.ru_oublock,
+        "read_bytes": io_counters.get("read_bytes"),
+        "write_bytes": io_counters.get("write_bytes"),
+        "read_chars": io_counters.get("rchar"),
+        "write_chars": io_counters.get("wchar"),
+    }
+
+
+
 @dataclasses.dataclass
 class _Process:
     command: str
@@ -202,43 +434,131 @@ class _Process:
     timeout: int
     cwd: str
     job_id: str
-    proc: subprocess.CompletedProcess = None
-    stdout: str = None
-    stderr: str = None
+    stdout_file: str = None
+    stderr_file: str = None
+    output_limit: int = 0
+    log_files: tuple = (None, None)
+    log_compression: str = "none"
+    captures: list = None
+    proc: subprocess.Popen = None
+    resource_usage: dict = None
+    stdout: bytes = None
+    stderr: bytes = None
     timeout_reached: bool = None
 
 
+    @staticmethod
+    async def _pump(stream, capture):
+        while True:
+            chunk = await stream.read(_CHUNK_SIZE)
+            if not chunk:
+                return
+            capture.write(chunk)
+
+
+    @staticmethod
+    async def _open_reader(pipe):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        return reader
+
+
+    def _wait(self):
+        """Return a future that is done once the process has been reaped
+
+        asyncio's own child watcher reaps processes with waitpid(), which does
+        not return the child's resource usage, so Litani reaps the job's
+        process itself with wait4() in a separate thread.
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def reap():
+            result = _reap(self.proc.pid)
+            loop.call_soon_threadsafe(future.set_result, result)
+
+        threading.Thread(target=reap, daemon=True).start()
+        return future
+
+
+    async def _communicate(self, captures, reaped):
+        pumps = []
+        for pipe, capture in zip(
+                (self.proc.stdout, self.proc.stderr), captures):
+            if pipe:
+                pumps.append(self._pump(await self._open_reader(pipe), capture))
+        await asyncio.gather(*pumps)
+        return_code, rusage, io_counters = await reaped
+        self.proc.returncode = return_code
+        self.resource_usage = _get_resource_usage(rusage, io_counters)
+
+
     async def __call__(self):
         if self.interleave_stdout_stderr:
-            pipe = asyncio.subprocess.STDOUT
+            pipe = subprocess.STDOUT
         else:
-            pipe = asyncio.subprocess.PIPE
+            pipe = subprocess.PIPE
 
         env = dict(os.environ)
         env[lib.litani.ENV_VAR_JOB_ID] = self.job_id
 
-        proc = await asyncio.create_subprocess_shell(
-            self.command, stdout=asyncio.subprocess.PIPE, stderr=pipe,
-            cwd=self.cwd, env=env, start_new_session=True)
-        self.proc = proc
-
-        timeout_reached = False
-        try:
-            out, err = await asyncio.wait_for(
-                proc.communicate(), timeout=self.timeout)
-        except asyncio.TimeoutError:
-            pgid = os.getpgid(proc.pid)
-            os.killpg(pgid, signal.SIGTERM)
-            await asyncio.sleep(1)
+        with contextlib.ExitStack() as stack:
+            captures = []
+            for out_file, log_file in zip(
+                    (self.stdout_file, self.stderr_file), self.log_files):
+                handles = []
+                if out_file:
+                    handles.append(stack.enter_context(
+                        lib.litani.atomic_write(out_file, "wb")))
+                capture = _OutputCapture(self.output_limit, handles)
+                if log_file:
+                    log_handle = stack.enter_context(
+                        lib.litani.atomic_write(log_file, "wb"))
+                    capture.log = lib.job_log.compressor(
+                        log_handle, self.log_compression)
+                    if capture.log is not log_handle:
+                        # Flush compressed data before the file is closed
+                        stack.enter_context(capture.log)
+                    capture.handles.append(capture.log)
+                captures.append(capture)
+
+            proc = subprocess.Popen(
+                self.command, shell=True, stdout=subprocess.PIPE, stderr=pipe,
+                cwd=self.cwd, env=env, start_new_session=True, bufsize=0)
+            self.proc = proc
+
+            timeout_reached = False
+            communicate = asyncio.ensure_future(
+                self._communicate(captures, self._wait()))
             try:
-                os.killpg(pgid, signal.SIGKILL)
-            except ProcessLookupError:
-                pass
-            out, err = await proc.communicate()
-            timeout_reached = True
-
-        self.stdout = out
-        self.stderr = err
+                await asyncio.wait_for(
+                    asyncio.shield(communicate), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                pgid = os.getpgid(proc.pid)
+                os.killpg(pgid, signal.SIGTERM)
+                await asyncio.sleep(1)
+                try:
+                    os.killpg(pgid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                await communicate
+                timeout_reached = True
+
+            # The output files end with a newline, as they did when they were
+            # written with print() after the job finished
+            for capture in captures:
+                for handle in capture.handles:
+                    if handle is not capture.log:
+                        handle.write(b"\n")
+
+        self.captures = captures
+
+        self.stdout = captures[0].get_output()
+        if not self.interleave_stdout_stderr:
+            self.stderr = captures[1].get_output()
         self.timeout_reached = timeout_reached
 
 
@@ -250,18 +570,22 @@ class Runner:
             return None
 
         return {
-            "Linux": _UnixMemoryProfiler(),
-            "Darwin": _UnixMemoryProfiler(),
-        }.get(system, None)
+            "Linux": _LinuxMemoryProfiler,
+            "Darwin": _UnixMemoryProfiler,
+        }.get(system, lambda: None)()
 
 
     def __init__(
             self, command, interleave_stdout_stderr, cwd, timeout,
-            profile_memory, profile_interval, job_id):
+            profile_memory, profile_interval, job_id, stdout_file=None,
+            stderr_file=None, output_limit=0, log_files=(None, None),
+            log_compression="none"):
         self.tasks = []
         self.runner = _Process(
             command=command, interleave_stdout_stderr=interleave_stdout_stderr,
-            cwd=cwd, timeout=timeout, job_id=job_id)
+            cwd=cwd, timeout=timeout, job_id=job_id, stdout_file=stdout_file,
+            stderr_file=stderr_file, output_limit=output_limit,
+            log_files=log_files, log_compression=log_compression)
         self.tasks.append(self.runner)
 
         self.profiler = None
@@ -295,19 +619,31 @@ class Runner:
 
     def get_stdout(self):
         if self.runner.stdout:
-            return self.runner.stdout.decode("utf-8")
+            return self.runner.stdout.decode("utf-8", errors="replace")
         return None
 
 
     def get_stderr(self):
         if self.runner.stderr:
-            return self.runner.stderr.decode("utf-8")
+            return self.runner.stderr.decode("utf-8", errors="replace")
         return None
 
 
+    def get_output_stats(self, stream):
+        """Return the size in bytes and number of lines of stdout (stream 0) or
+        stderr (stream 1)"""
+
+        capture = self.runner.captures[stream]
+        return capture.size, capture.get_line_count()
+
+
     def reached_timeout(self):
         return self.runner.timeout_reached
 
 
+    def get_resource_usage(self):
+        return self.runner.resource_usage
+
+
     def get_memory_trace(self):
         return self.profiler.trace if self.profiler else {}
@@ -11,20 +11,74 @@
 # express or implied. See the License for the specific language governing
 # permissions and limitations under the License
 
+import dataclasses
 import json
 import logging
 import time
 import traceback
 
 
-from lib import litani_report, litani
+from lib import litani
+import lib.fs_watch
 import lib.validation
 
 
-def continuous_render_report(cache_dir, killer, out_file, render):
+# How often to check whether the run has finished while waiting for changes
+_KILLER_CHECK_INTERVAL = 0.25
+
+
+
+@dataclasses.dataclass
+class RenderSchedule:
+    """When to re-render the report after files change
+
+    debounce: after the first change, wait this many seconds for further
+        changes before rendering, so that a burst is rendered once.
+    min_interval: never start a render less than this many seconds after the
+        previous one started.
+    """
+
+    debounce: float = 0.25
+    min_interval: float = 1.0
+
+
+    def next_render(self, first_change, last_render):
+        return max(first_change + self.debounce, last_render + self.min_interval)
+
+
+
+def wait_for_changes(watcher, killer, schedule, last_render):
+    """Block until the report should next be rendered
+
+    Returns once the files that watcher watches have changed and the schedule
+    allows a render, or as soon as killer is set.
+    """
+
+    while not killer.is_set():
+        if watcher.wait(_KILLER_CHECK_INTERVAL):
+            break
+    else:
+        return
+
+    deadline = schedule.next_render(time.monotonic(), last_render)
+    while not killer.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        # Changes during the wait will be picked up by the coming render
+        watcher.wait(min(remaining, _KILLER_CHECK_INTERVAL))
+
+
+def continuous_render_report(
+        cache_dir, killer, out_file, render, run_model, schedule=None):
+    schedule = schedule or RenderSchedule()
+    watcher = None
     try:
+        watcher = lib.fs_watch.make_watcher([
+            litani.get_status_dir(), litani.get_artifacts_dir()])
         while True:
-            run = litani_report.get_run_data(cache_dir)
+            last_render = time.monotonic()
+            run = run_model.get_run()
             lib.validation.validate_run(run)
             with litani.atomic_write(cache_dir / litani.RUN_FILE) as handle:
                 print(json.dumps(run, indent=2), file=handle)
@@ -34,8 +88,11 @@ def continuous_render_report(cache_dir, killer, out_file, render):
             render(run)
             if killer.is_set():
                 break
-            time.sleep(2)
+            wait_for_changes(watcher, killer, schedule, last_render)
     except BaseException as e:
         logging.error("Continuous render function crashed")
         logging.error(str(e))
         traceback.print_exc()
+    finally:
+        if watcher is not None:
+            watcher.close()
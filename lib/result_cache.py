@@ -0,0 +1,289 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""Reuse the results of jobs that ran before with the same command and inputs.
+
+With `litani run-build --result-cache LOCATION`, `litani exec` computes a key
+for each job from its command, working directory, the environment variables
+named with --result-cache-env, the flags that decide its outcome, and the
+contents of its inputs. If the store at LOCATION has a result for that key,
+litani exec restores the job's outputs, its --stdout-file and --stderr-file,
+its logs, and its status instead of running the command. Otherwise it runs the
+command and, if the job succeeded, stores those files under the key. Failed
+jobs are never stored, so they always run again.
+
+Inputs are hashed by content, so a job whose dependency ran again and wrote
+the same output still gets a hit. The status files of other jobs are different
+in every run, so only their paths are part of the key.
+
+A store is anything that implements the Store interface. get_store() picks the
+store from the scheme of LOCATION; a plain path (or a file:// URL) is a
+directory on the local file system.
+"""
+
+
+import abc
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import uuid
+
+import lib.job_log
+import lib.litani
+
+
+_ENTRY_FILE = "entry.json"
+_FILES_DIR = "files"
+_LOGS_DIR = "logs"
+_STREAMS = ("stdout", "stderr")
+
+# Job arguments that change what the command writes or how its outcome is
+# decided
+_KEY_ARGS = (
+    "command", "outputs", "phony_outputs", "stdout_file", "stderr_file",
+    "interleave_stdout_stderr", "timeout", "timeout_ok", "timeout_ignore",
+    "ignore_returns", "ok_returns", "max_captured_output", "tags",
+)
+
+# Status keys that describe this run, rather than the job's result
+_RUN_KEYS = ("wrapper_arguments", "cached_result", "memory_budget")
+
+
+
+class Store(abc.ABC):
+    """Where results are kept, keyed by the hash of a job's command and
+    inputs
+
+    An entry is a directory tree. Implementations must make an entry visible
+    to get() only once put() has stored all of it.
+    """
+
+    @abc.abstractmethod
+    def get(self, key, dest):
+        """Copy the entry for key into the empty directory dest, returning
+        False if there is no such entry"""
+
+        raise NotImplementedError
+
+
+    @abc.abstractmethod
+    def put(self, key, src):
+        """Store the directory src as the entry for key"""
+
+        raise NotImplementedError
+
+
+
+@dataclasses.dataclass
+class LocalDirectoryStore(Store):
+    root: pathlib.Path
+
+
+    def _get_entry_dir(self, key):
+        return self.root / key[:2] / key
+
+
+    def get(self, key, dest):
+        entry = self._get_entry_dir(key)
+        if not (entry / _ENTRY_FILE).exists():
+            return False
+        try:
+            shutil.copytree(entry, dest, dirs_exist_ok=True)
+        except (OSError, shutil.Error) as e:
+            logging.warning(
+                "Could not read cached result '%s': %s", entry, e)
+            return False
+        return True
+
+
+    def put(self, key, src):
+        entry = self._get_entry_dir(key)
+        if entry.exists():
+            return
+        # Entries appear by renaming a complete copy, so concurrent readers
+        # never see part of one
+        tmp = entry.parent / f"{key}~{uuid.uuid4()}"
+        try:
+            shutil.copytree(src, tmp)
+            os.rename(tmp, entry)
+        except (OSError, shutil.Error) as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            # Another job with the same key may have stored it first
+            if not entry.exists():
+                logging.warning(
+                    "Could not store result in '%s': %s", entry, e)
+
+
+
+STORES = {
+    "file": lambda location: LocalDirectoryStore(pathlib.Path(location)),
+}
+
+
+def get_store(location):
+    scheme, sep, rest = str(location).partition("://")
+    if not sep:
+        return LocalDirectoryStore(pathlib.Path(location))
+    try:
+        return STORES[scheme](rest)
+    except KeyError:
+        logging.error(
+            "Unknown result cache '%s'; supported schemes are %s", location,
+            ", ".join(sorted(STORES)))
+        sys.exit(1)
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hash_input(path, status_dir):
+    if pathlib.Path(path).resolve().parent == status_dir:
+        return "status"
+    if os.path.isfile(path):
+        return _hash_file(path)
+    if os.path.isdir(path):
+        files = {}
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            for name in names:
+                fyle = os.path.join(root, name)
+                files[os.path.relpath(fyle, path)] = _hash_file(fyle)
+        return files
+    return None
+
+
+def get_key(job_args, env_vars, options, status_dir):
+    """Return the key of a job's result
+
+    job_args are the job's *wrapper_arguments*. env_vars are the names of the
+    environment variables that the result depends on. options is a dict of
+    `litani exec` flags that change the job's status. Inputs in status_dir are
+    the status files of other jobs.
+    """
+
+    status_dir = pathlib.Path(status_dir).resolve()
+    inputs = lib.litani.expand_args(job_args.get("inputs"))
+    if job_args.get("outcome_table"):
+        inputs.append(job_args["outcome_table"])
+    material = {
+        "litani_version": lib.litani.VERSION,
+        "cwd": os.path.realpath(job_args.get("cwd") or os.getcwd()),
+        "job": {arg: job_args.get(arg) for arg in _KEY_ARGS},
+        "env": {var: os.environ.get(var) for var in sorted(env_vars or [])},
+        "options": options,
+        "inputs": {i: _hash_input(i, status_dir) for i in inputs},
+    }
+    return hashlib.sha256(
+        json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _get_result_files(job_args):
+    files = lib.litani.expand_args(job_args.get("outputs"))
+    for arg in ("stdout_file", "stderr_file"):
+        if job_args.get(arg):
+            files.append(job_args[arg])
+    return files
+
+
+def _copy(src, dst):
+    src = pathlib.Path(src)
+    dst = pathlib.Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if src.is_dir():
+        shutil.copytree(src, dst, dirs_exist_ok=True)
+    else:
+        shutil.copy(src, dst)
+
+
+def pack(dest, job_args, status, cache_dir):
+    """Copy the files and logs that a completed job wrote into the directory
+    dest, along with status
+
+    lib.worker also uses this to send the result of a job that it ran back to
+    run-build.
+    """
+
+    dest = pathlib.Path(dest)
+    dest.mkdir(parents=True, exist_ok=True)
+    files = []
+    for fyle in _get_result_files(job_args):
+        if os.path.exists(fyle):
+            _copy(fyle, dest / _FILES_DIR / str(len(files)))
+            files.append(fyle)
+    for stream in _STREAMS:
+        reference = status.get(f"{stream}_log")
+        if reference:
+            _copy(cache_dir / reference["path"], dest / _LOGS_DIR / stream)
+    with open(dest / _ENTRY_FILE, "w") as handle:
+        json.dump({"files": files, "status": status}, handle)
+
+
+def unpack(src, job_args, cache_dir):
+    """Put the files that pack() copied into the directory src back in place
+
+    Returns the packed status, with references to logs that are named after
+    the job ID in job_args.
+    """
+
+    src = pathlib.Path(src)
+    with open(src / _ENTRY_FILE) as handle:
+        entry = json.load(handle)
+
+    for idx, fyle in enumerate(entry["files"]):
+        _copy(src / _FILES_DIR / str(idx), fyle)
+
+    status = entry["status"]
+    for stream in _STREAMS:
+        reference = status.get(f"{stream}_log")
+        if not reference:
+            continue
+        path = lib.job_log.log_path(
+            job_args["job_id"], stream, reference["compression"])
+        _copy(src / _LOGS_DIR / stream, cache_dir / path)
+        status[f"{stream}_log"] = {**reference, "path": path}
+    return status
+
+
+def save(store, key, job_args, status, cache_dir):
+    """Store the result of a completed job under key"""
+
+    with tempfile.TemporaryDirectory(prefix="litani-result-") as tmp:
+        pack(tmp, job_args, {
+            k: v for k, v in status.items() if k not in _RUN_KEYS
+        }, cache_dir)
+        store.put(key, tmp)
+
+
+def restore(store, key, job_args, cache_dir):
+    """Restore the result stored under key
+
+    Returns the status that the job had when its result was stored, with
+    references to the restored logs, or None if there is no result for key.
+    """
+
+    with tempfile.TemporaryDirectory(prefix="litani-result-") as tmp:
+        if not store.get(key, tmp):
+            return None
+        return unpack(tmp, job_args, cache_dir)
@@ -21,9 +21,23 @@ import sys
 import threading
 
 from lib import litani, ninja_syntax, litani_report
+import lib.adaptive_parallelism
 import lib.exec
+import lib.job_history
+import lib.job_log
+import lib.ninja
+import lib.parallelism_trace
+import lib.pid_file
 import lib.render
+import lib.run_model
 import lib.run_printer
+import lib.scheduler
+import lib.util
+import lib.validation
+import lib.worker
+
+
+ENGINES = ["native", "ninja"]
 
 
 def add_subparser(subparsers):
@@ -50,6 +64,127 @@ def add_subparser(subparsers):
             "flags": ["--no-pipeline-dep-graph"],
             "action": "store_true",
             "help": "do not attempt to generate pipeline dependency graph"
+    }, {
+            "flags": ["--engine"],
+            "choices": ENGINES,
+            "default": "ninja",
+            "help": "run jobs by generating a ninja file and running ninja, "
+                    "or schedule them natively within this process "
+                    "(default: ninja)"
+    }, {
+            "flags": ["--workers"],
+            "metavar": "ADDR",
+            "nargs": "+",
+            "help": "with the native engine, run jobs on the `litani worker` "
+                    "processes listening on each ADDR (HOST:PORT or "
+                    "unix:PATH) rather than on this machine"
+    }, {
+            "flags": ["--adaptive-parallelism"],
+            "action": "store_true",
+            "help": "with the native engine, run fewer jobs at once when "
+                    "the machine is short of CPU or memory, and more when "
+                    "it has CPU to spare, between --min-parallel and -j"
+    }, {
+            "flags": ["--min-parallel"],
+            "metavar": "N",
+            "type": lib.util.non_negative_int,
+            "default": 1,
+            "help": "with --adaptive-parallelism, always allow at least N "
+                    "jobs to run at once (default: %(default)s)"
+    }, {
+            "flags": ["--adaptive-interval"],
+            "metavar": "S",
+            "type": lib.util.positive_float,
+            "default": lib.adaptive_parallelism.Controller.interval,
+            "help": "with --adaptive-parallelism, sample the load on the "
+                    "machine every S seconds (default: %(default)s)"
+    }, {
+            "flags": ["--log-compression"],
+            "choices": lib.job_log.COMPRESSIONS,
+            "default": "none",
+            "help": "compress the log of each job's stdout and stderr "
+                    "(default: none)"
+    }, {
+            "flags": ["--log-excerpts"],
+            "action": "store_true",
+            "help": "only keep the last few lines of each job's captured "
+                    "stdout and stderr in run.json"
+    }, {
+            "flags": ["--memory-budget"],
+            "metavar": "SIZE",
+            "type": lib.util.memory_size,
+            "help": "only start a job once its expected memory fits in SIZE "
+                    "(e.g. 64G) together with that of the running jobs. A "
+                    "job's expected memory is its --expected-memory, or its "
+                    "peak memory use in the job history"
+    }, {
+            "flags": ["--result-cache"],
+            "metavar": "LOCATION",
+            "help": "restore the results of jobs whose command and inputs "
+                    "are the same as in an earlier run from the cache at "
+                    "LOCATION, rather than running them, and store the "
+                    "results of other jobs that succeed there. LOCATION is a "
+                    "directory"
+    }, {
+            "flags": ["--result-cache-env"],
+            "metavar": "VAR",
+            "nargs": "+",
+            "default": ["PATH"],
+            "help": "only reuse a job's result if these environment variables "
+                    "have the same values as when it was stored "
+                    "(default: PATH)"
+    }, {
+            "flags": ["--job-history"],
+            "metavar": "F",
+            "help": "start the jobs that took longest in earlier runs first, "
+                    "reading their durations from F and adding this run's "
+                    "durations to it (default: a file for this project in "
+                    "the litani-UID directory of the temporary directory)"
+    }, {
+            "flags": ["--no-job-history"],
+            "action": "store_true",
+            "help": "neither read nor update the job history"
+    }, {
+            "flags": ["--reserve-slots"],
+            "metavar": "N",
+            "type": lib.util.non_negative_int,
+            "default": 0,
+            "help": "with the ninja engine, keep N of the parallel job slots "
+                    "free for the N jobs that took longest in earlier runs"
+    }, {
+            "flags": ["--parallelism-resolution"],
+            "metavar": "MS",
+            "type": lib.util.non_negative_int,
+            "default": 0,
+            "help": "record the number of running jobs at most once every MS "
+                    "milliseconds, keeping the highest number in each "
+                    "interval. 0 records every change (default: 0)"
+    }, {
+            "flags": ["--progress-interval"],
+            "metavar": "S",
+            "type": lib.util.non_negative_float,
+            "default": lib.ninja.ProgressLine.interval,
+            "help": "update the progress line at most once every S seconds "
+                    "(default: %(default)s)"
+    }, {
+            "flags": ["--chart-backend"],
+            "choices": sorted(litani_report.CHART_BACKENDS),
+            "default": "svg",
+            "help": "program to draw the report's charts with (default: svg)"
+    }, {
+            "flags": ["--report-debounce"],
+            "metavar": "S",
+            "type": lib.util.non_negative_float,
+            "default": lib.render.RenderSchedule.debounce,
+            "help": "after a job writes a file, wait S seconds for further "
+                    "changes before updating the report (default: %(default)s)"
+    }, {
+            "flags": ["--report-min-interval"],
+            "metavar": "S",
+            "type": lib.util.non_negative_float,
+            "default": lib.render.RenderSchedule.min_interval,
+            "help": "update the report at most once every S seconds "
+                    "(default: %(default)s)"
     }]:
         flags = arg.pop("flags")
         run_build_pars.add_argument(*flags, **arg)
@@ -70,7 +205,79 @@ def add_subparser(subparsers):
         mutex.add_argument(*flags, **arg)
 
 
-def fill_out_ninja(cache, rules, builds, pools):
+def get_exec_options(args):
+    """Flags that `litani exec` gets for every job, whatever the engine"""
+
+    ret = {
+        "log_compression": args.log_compression,
+        "log_excerpts": args.log_excerpts,
+    }
+    if args.memory_budget:
+        ret["memory_budget"] = args.memory_budget
+    if args.result_cache:
+        # Jobs run in their own working directories
+        location = args.result_cache
+        if "://" not in location:
+            location = os.path.abspath(location)
+        ret["result_cache"] = location
+        ret["result_cache_env"] = args.result_cache_env
+    return ret
+
+
+def get_parallelism_trace(args):
+    return lib.parallelism_trace.Trace(
+        resolution_ms=args.parallelism_resolution)
+
+
+def get_adaptive_controller(args):
+    if not args.adaptive_parallelism:
+        return None
+    if args.engine != "native" or args.workers:
+        logging.error(
+            "--adaptive-parallelism requires --engine native, and cannot be "
+            "used with --workers")
+        sys.exit(1)
+    max_jobs = lib.scheduler.get_default_parallelism() \
+        if args.parallel is None else int(args.parallel)
+    if not 0 < args.min_parallel <= max_jobs:
+        logging.error(
+            "--min-parallel must be between 1 and the maximum parallelism "
+            "(%d); -j 0 cannot be used with --adaptive-parallelism",
+            max_jobs)
+        sys.exit(1)
+    return lib.adaptive_parallelism.Controller(
+        args.min_parallel, max_jobs, interval=args.adaptive_interval)
+
+
+def get_reserved_slots(args):
+    """Return the number of ninja job slots that jobs outside the pool of
+    unreserved jobs may use, or 0 if no slots should be reserved"""
+
+    if not args.reserve_slots:
+        return 0
+    if args.engine != "ninja":
+        logging.warning("--reserve-slots only applies to the ninja engine")
+        return 0
+    if args.no_job_history:
+        logging.warning("--reserve-slots has no effect without a job history")
+        return 0
+    parallelism = lib.scheduler.get_default_parallelism() \
+        if args.parallel is None else int(args.parallel)
+    if args.reserve_slots >= parallelism:
+        logging.warning(
+            "Not reserving %d job slots out of %s", args.reserve_slots,
+            parallelism or "unlimited")
+        return 0
+    return parallelism
+
+
+def fill_out_ninja(
+        cache, rules, builds, pools, exec_options, long_jobs=None,
+        parallelism=0):
+    """long_jobs are the IDs of jobs that may use all parallelism job slots.
+    Other jobs that are not in a pool are put in a pool that leaves
+    len(long_jobs) slots free for them."""
+
     phonies = {
         "pipeline_name": {},
         "ci_stage": {},
@@ -78,6 +285,8 @@ def fill_out_ninja(cache, rules, builds, pools):
 
     for name, depth in cache["pools"].items():
         pools[name] = depth
+    if long_jobs is not None:
+        pools[lib.job_history.UNRESERVED_POOL] = parallelism - len(long_jobs)
 
     for entry in cache["jobs"]:
         outs = lib.litani.expand_args(entry["outputs"])
@@ -96,6 +305,8 @@ def fill_out_ninja(cache, rules, builds, pools):
                     "specified to `litani init`", description, pool_name)
                 sys.exit(1)
             pool = {"pool": pool_name}
+        elif long_jobs is not None and entry["job_id"] not in long_jobs:
+            pool = {"pool": lib.job_history.UNRESERVED_POOL}
         else:
             pool = {}
 
@@ -103,7 +314,8 @@ def fill_out_ninja(cache, rules, builds, pools):
         rules.append({
             "name": rule_name,
             "description": description,
-            "command": lib.exec.make_litani_exec_command(entry),
+            "command": lib.exec.make_litani_exec_command(
+                {**entry, **exec_options}),
             **pool,
         })
         builds.append({
@@ -129,20 +341,17 @@ def fill_out_ninja(cache, rules, builds, pools):
             })
 
 
-async def run_build(args):
-    artifacts_dir = litani.get_artifacts_dir()
-    artifacts_dir.mkdir(parents=True, exist_ok=True)
-
-    cache_dir = litani.get_cache_dir()
-    litani.add_jobs_to_cache()
-
-    with open(cache_dir / litani.CACHE_FILE) as handle:
-        cache = json.load(handle)
-
+def make_ninja_runner(cache, cache_dir, args, history):
     rules = []
     builds = []
     pools = {}
-    fill_out_ninja(cache, rules, builds, pools)
+    long_jobs = None
+    parallelism = get_reserved_slots(args)
+    if parallelism:
+        long_jobs = history.get_long_jobs(cache["jobs"], args.reserve_slots)
+    fill_out_ninja(
+        cache, rules, builds, pools, get_exec_options(args), long_jobs,
+        parallelism)
 
     ninja_file = cache_dir / "litani.ninja"
     with litani.atomic_write(ninja_file) as handle:
@@ -156,28 +365,89 @@ async def run_build(args):
         for build in builds:
             logging.debug(build)
             ninja.build(**build)
-    run = litani_report.get_run_data(cache_dir)
+
+    return lib.ninja.Runner(
+        ninja_file, args.dry_run, args.parallel, args.pipelines,
+        args.ci_stage, trace=get_parallelism_trace(args),
+        progress_interval=args.progress_interval)
+
+
+async def run_build(args):
+    if args.workers and args.engine != "native":
+        logging.error("--workers requires --engine native")
+        sys.exit(1)
+    adaptive = get_adaptive_controller(args)
+
+    artifacts_dir = litani.get_artifacts_dir()
+    artifacts_dir.mkdir(parents=True, exist_ok=True)
+    litani.get_status_dir().mkdir(parents=True, exist_ok=True)
+
+    cache_dir = litani.get_cache_dir()
+    litani.add_jobs_to_cache()
+
+    with open(cache_dir / litani.CACHE_FILE) as handle:
+        cache = json.load(handle)
+
+    history = None
+    if not args.no_job_history:
+        history = lib.job_history.JobHistory.load(
+            args.job_history or
+            lib.job_history.get_default_path(cache["project"]))
+        cache["jobs"] = history.order_jobs(cache["jobs"])
+        if args.memory_budget:
+            history.fill_expected_memory(cache["jobs"])
+
+    workers = None
+    if args.workers:
+        workers = await lib.worker.WorkerPool.connect(args.workers)
+
+    if args.engine == "native":
+        runner = lib.scheduler.Runner(
+            cache["jobs"], cache["pools"], args.dry_run, args.parallel,
+            args.pipelines, args.ci_stage, get_exec_options(args),
+            trace=get_parallelism_trace(args),
+            progress=lib.ninja.ProgressLine(args.progress_interval),
+            workers=workers, adaptive=adaptive)
+        # Exit on a bad job graph before the render thread starts
+        runner.prepare()
+    else:
+        runner = make_ninja_runner(cache, cache_dir, args, history)
+
+    run_model = lib.run_model.RunModel(cache_dir)
+    run = run_model.get_run()
     lib.validation.validate_run(run)
     report_dir = lib.litani.get_report_dir()
     pipeline_depgraph_renderer = litani_report.PipelineDepgraphRenderer(
         should_render=not args.no_pipeline_dep_graph)
     render = litani_report.ReportRenderer(
-        report_dir, pipeline_depgraph_renderer)
+        report_dir, pipeline_depgraph_renderer,
+        chart_backend=args.chart_backend)
     render(run)
     killer = threading.Event()
+    schedule = lib.render.RenderSchedule(
+        debounce=args.report_debounce,
+        min_interval=args.report_min_interval)
     render_thread = threading.Thread(
         group=None, target=lib.render.continuous_render_report,
-        args=(cache_dir, killer, args.out_file, render))
+        args=(cache_dir, killer, args.out_file, render, run_model, schedule))
     render_thread.start()
 
-    runner = lib.ninja.Runner(
-        ninja_file, args.dry_run, args.parallel, args.pipelines,
-        args.ci_stage)
-
     lib.pid_file.write()
-    sig_handler = lib.run_printer.DumpRunSignalHandler(cache_dir)
+    run_index = lib.run_printer.RunIndex.from_jobs(cache["jobs"])
+    sig_handler = lib.run_printer.DumpRunSignalHandler(cache_dir, run_index)
     signal.signal(lib.run_printer.DUMP_SIGNAL, sig_handler)
-    runner.run()
+    try:
+        if args.engine == "native":
+            await runner.run()
+        else:
+            runner.run()
+    finally:
+        # The render thread is not a daemon, so the process would not exit
+        # while it is running
+        killer.set()
+        render_thread.join()
+        if workers:
+            await workers.close()
 
     now = datetime.datetime.now(datetime.timezone.utc).strftime(
         litani.TIME_FORMAT_W)
@@ -188,27 +458,34 @@ async def run_build(args):
     run_info["parallelism"] = runner.get_parallelism_graph()
 
     success = True
+    statuses = []
     for root, _, files in os.walk(litani.get_status_dir()):
         for fyle in files:
             if not fyle.endswith(".json"):
                 continue
             with open(os.path.join(root, fyle)) as handle:
                 job_status = json.load(handle)
-            if job_status["outcome"] != "success":
+            # Jobs that could not be run have no outcome
+            if job_status.get("outcome") != "success":
                 success = False
+            statuses.append(job_status)
     run_info["status"] = "success" if success else "failure"
 
+    if history and not args.dry_run:
+        lib.job_history.record_jobs(history, statuses)
+        history.save()
+
     with litani.atomic_write(cache_dir / litani.CACHE_FILE) as handle:
         print(json.dumps(run_info, indent=2), file=handle)
 
-    killer.set()
-    render_thread.join()
-    run = litani_report.get_run_data(cache_dir)
+    run = run_model.get_run()
     lib.validation.validate_run(run)
     render(run)
 
     with litani.atomic_write(cache_dir / litani.RUN_FILE) as handle:
         print(json.dumps(run, indent=2), file=handle)
+    run_index.write(
+        run, lib.run_printer.get_index_path(cache_dir / litani.RUN_FILE))
     if args.out_file:
         with litani.atomic_write(args.out_file) as handle:
             print(json.dumps(run, indent=2), file=handle)
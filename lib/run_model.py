@@ -0,0 +1,200 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""Keep an in-memory model of the run that is updated incrementally.
+
+litani_report.get_run_data() re-reads the cache file and every status file each
+time it is called. This module provides a RunModel that run-build keeps for the
+whole run: each call to refresh() only re-parses the status files that changed
+since the previous call, and only re-sorts the stages that those jobs belong
+to. get_run() then returns a dict that is identical to what get_run_data()
+would have returned.
+"""
+
+
+import dataclasses
+import functools
+import json
+import logging
+import os
+import pathlib
+
+from lib import litani, litani_report
+
+
+
+def _file_stamp(stat):
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns)
+
+
+
+@dataclasses.dataclass
+class _Stage:
+    """The jobs of a single pipeline in a single ci_stage"""
+
+    name: str
+    pipeline_name: str
+    job_ids: list = dataclasses.field(default_factory=list)
+    sorted_ids: list = dataclasses.field(default_factory=list)
+    stats: dict = dataclasses.field(default_factory=dict)
+    dirty: bool = True
+
+
+
+class RunModel:
+    def __init__(self, cache_dir: pathlib.Path):
+        self.cache_dir = cache_dir
+        self._cache_stamp = None
+        self._cache = {}
+
+        # job ID -> job dict from the cache file
+        self._jobs = {}
+
+        # job ID -> file stamp of the status file when it was last parsed
+        self._stamps = {}
+
+        # job ID -> job dict as it appears in the run, without the fields that
+        # get added to copies of it by report renderers
+        self._statuses = {}
+
+        # pipeline name -> stage name -> _Stage
+        self._pipelines = {}
+
+
+    def refresh(self):
+        """Re-read the cache file if needed, and any status file that changed"""
+
+        self._refresh_cache()
+        self._refresh_statuses()
+
+
+    def get_run(self):
+        """Return a run dict identical to litani_report.get_run_data()"""
+
+        self.refresh()
+
+        run = {k: v for k, v in self._cache.items() if k != "jobs"}
+        pipelines = []
+        for pipe_name, stages in self._pipelines.items():
+            pipe = {"name": pipe_name, "ci_stages": []}
+            for stage_name in self._cache["stages"]:
+                try:
+                    stage = stages[stage_name]
+                except KeyError:
+                    stage = _Stage(stage_name, pipe_name)
+                    stages[stage_name] = stage
+                if stage.dirty:
+                    self._update_stage(stage)
+                pipe["ci_stages"].append({
+                    "jobs": [dict(self._statuses[j]) for j in stage.sorted_ids],
+                    **stage.stats,
+                })
+            litani_report.add_pipe_stats(pipe)
+            pipelines.append(pipe)
+
+        run["pipelines"] = sorted(
+            pipelines, key=lambda p: (p["status"], p["name"]))
+        litani_report.add_run_stats(run)
+        return run
+
+
+    def _refresh_cache(self):
+        cache_file = self.cache_dir / litani.CACHE_FILE
+        stamp = _file_stamp(os.stat(cache_file))
+        if stamp == self._cache_stamp:
+            return
+
+        with open(cache_file) as handle:
+            cache = json.load(handle)
+        self._cache_stamp = stamp
+        self._cache = cache
+
+        job_ids = [job["job_id"] for job in cache["jobs"]]
+        if job_ids == list(self._jobs):
+            # Only run-level fields changed (e.g. at the end of the run); the
+            # jobs and their placement in stages are the same as before.
+            return
+
+        logging.debug("Rebuilding run model from %d jobs", len(job_ids))
+        self._jobs = {job["job_id"]: job for job in cache["jobs"]}
+        self._stamps = {}
+        self._statuses = {}
+        self._pipelines = {}
+        for job_id, job in self._jobs.items():
+            self._statuses[job_id] = self._placeholder(job)
+            stages = self._pipelines.setdefault(job["pipeline_name"], {})
+            try:
+                stage = stages[job["ci_stage"]]
+            except KeyError:
+                stage = _Stage(job["ci_stage"], job["pipeline_name"])
+                stages[job["ci_stage"]] = stage
+            stage.job_ids.append(job_id)
+
+
+    def _refresh_statuses(self):
+        seen = set()
+        try:
+            entries = list(os.scandir(litani.get_status_dir()))
+        except FileNotFoundError:
+            entries = []
+
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            job_id = entry.name[:-len(".json")]
+            if job_id not in self._jobs:
+                continue
+            seen.add(job_id)
+
+            stamp = _file_stamp(entry.stat())
+            if self._stamps.get(job_id) == stamp:
+                continue
+            with open(entry.path) as handle:
+                status = json.load(handle)
+            litani_report.add_job_stats([status])
+            self._set_status(job_id, status)
+            self._stamps[job_id] = stamp
+
+        for job_id in set(self._stamps) - seen:
+            self._stamps.pop(job_id)
+            self._set_status(job_id, self._placeholder(self._jobs[job_id]))
+
+
+    def _set_status(self, job_id, status):
+        self._statuses[job_id] = status
+        job = self._jobs[job_id]
+        self._pipelines[job["pipeline_name"]][job["ci_stage"]].dirty = True
+
+
+    def _update_stage(self, stage):
+        stage.sorted_ids = sorted(
+            stage.job_ids, key=functools.cmp_to_key(
+                lambda j1, j2: litani_report.job_sorter(
+                    self._statuses[j1], self._statuses[j2])))
+
+        tmp = {"jobs": [self._statuses[j] for j in stage.sorted_ids]}
+        litani_report.add_stage_stats(tmp, stage.name, stage.pipeline_name)
+        tmp.pop("jobs")
+        stage.stats = tmp
+        stage.dirty = False
+
+
+    @staticmethod
+    def _placeholder(job):
+        status = {
+            "complete": False,
+            "wrapper_arguments": job,
+        }
+        litani_report.add_job_stats([status])
+        return status
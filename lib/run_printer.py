@@ -26,6 +26,7 @@ import signal
 import sys
 import time
 
+import lib.critical_path
 import lib.litani
 import lib.litani_report
 import lib.pid_file
@@ -35,6 +36,8 @@ import lib.util
 """When run-build receives this Unix signal, it will write the run file"""
 DUMP_SIGNAL = signal.SIGUSR1
 _DUMPED_RUN = "dumped-run.json"
+_DUMPED_RUN_INDEX = "dumped-run-index.json"
+_RUN_INDEX = "run-index.json"
 
 _SIGNAL_HANDLER_RUNNING = False
 
@@ -81,8 +84,107 @@ class InconsistentRunError(RuntimeError):
 
 
 
-def run_consistent_to_job(run, job_id):
-    """True iff the reverse-dependencies of job_id are marked as complete"""
+@dataclasses.dataclass
+class RunIndex:
+    """Which job writes each output, and which jobs each job depends on
+
+    run-build builds this once from the jobs in cache.json, and writes it
+    next to each run file that it dumps, along with where each job is in that
+    run. dump-run can then check that a job's reverse-dependencies are
+    complete by looking only at those jobs, rather than by mapping the
+    outputs of every job in the run on each attempt.
+    """
+
+    outputs: dict
+    dependencies: dict
+
+
+    @staticmethod
+    def from_jobs(jobs):
+        ids = [job["job_id"] for job in jobs]
+        outputs = {}
+        for job in jobs:
+            for out in lib.litani.expand_args(job.get("outputs")):
+                outputs[out] = job["job_id"]
+        return RunIndex(outputs, {
+            ids[idx]: [ids[dep] for dep in deps]
+            for idx, deps in enumerate(
+                lib.critical_path.get_dependencies(jobs))})
+
+
+    def write(self, run, path):
+        """Write the index to path, with the position of each job in run"""
+
+        positions = {}
+        for pipe_idx, pipe in enumerate(run["pipelines"]):
+            for stage_idx, stage in enumerate(pipe["ci_stages"]):
+                for job_idx, job in enumerate(stage["jobs"]):
+                    positions[job["wrapper_arguments"]["job_id"]] = [
+                        pipe_idx, stage_idx, job_idx]
+        with lib.litani.atomic_write(path) as handle:
+            print(json.dumps({
+                "outputs": self.outputs,
+                "jobs": {
+                    job_id: {
+                        "position": positions.get(job_id),
+                        "dependencies": deps,
+                    } for job_id, deps in self.dependencies.items()},
+            }), file=handle)
+
+
+
+def get_index_path(run_file):
+    """The file that RunIndex.write() writes next to run_file"""
+
+    run_file = pathlib.Path(run_file)
+    if run_file.name == _DUMPED_RUN:
+        return run_file.with_name(_DUMPED_RUN_INDEX)
+    return run_file.with_name(_RUN_INDEX)
+
+
+def _load_index(run_file):
+    try:
+        with open(get_index_path(run_file)) as handle:
+            return json.load(handle)
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        return None
+
+
+def _get_indexed_job(run, index, job_id):
+    """Return the job in run that index places job_id at, or None if the
+    index was written for a different run file"""
+
+    try:
+        pipe, stage, job = index["jobs"][job_id]["position"]
+        ret = run["pipelines"][pipe]["ci_stages"][stage]["jobs"][job]
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+    if ret["wrapper_arguments"]["job_id"] != job_id:
+        return None
+    return ret
+
+
+def run_consistent_to_job(run, job_id, index=None):
+    """True iff the reverse-dependencies of job_id are marked as complete
+
+    If index was loaded from the file that RunIndex.write() wrote next to
+    run, only job_id and its reverse-dependencies are looked at.
+    """
+
+    if index and job_id in index["jobs"]:
+        jobs = {
+            dep: _get_indexed_job(run, index, dep)
+            for dep in [job_id, *index["jobs"][job_id]["dependencies"]]}
+        if all(jobs.values()):
+            for dep, job in jobs.items():
+                if dep != job_id and not job["complete"]:
+                    logging.debug(
+                        "Run inconsistent: job '%s' is a reverse-dependency "
+                        "of job '%s', but the reverse-dependency job is not "
+                        "marked as complete.", dep, job_id)
+                    raise InconsistentRunError()
+            return True
+        logging.debug("Run index does not match run; checking every job")
 
     out_to_status = {}
     job_ins = []
@@ -131,7 +233,7 @@ def get_run_checker():
     parent_job_id = os.getenv(lib.litani.ENV_VAR_JOB_ID)
     if parent_job_id:
         return functools.partial(run_consistent_to_job, job_id=parent_job_id)
-    return lambda run: True
+    return lambda run, index=None: True
 
 
 
@@ -158,7 +260,7 @@ def _try_dump_run(cache_dir, pid, sleeper, check_run, out_file):
         try:
             with open(latest_run_file) as handle:
                 latest_run = json.load(handle)
-            check_run(latest_run)
+            check_run(latest_run, index=_load_index(latest_run_file))
             _exit_success(latest_run, out_file)
         except (
             FileNotFoundError, json.decoder.JSONDecodeError,
@@ -168,7 +270,7 @@ def _try_dump_run(cache_dir, pid, sleeper, check_run, out_file):
     try:
         with open(cache_dir / _DUMPED_RUN) as handle:
             run = json.load(handle)
-        check_run(run)
+        check_run(run, index=_load_index(cache_dir / _DUMPED_RUN))
         _exit_success(run, out_file)
     except (
             FileNotFoundError, json.decoder.JSONDecodeError,
@@ -205,6 +307,7 @@ class DumpRunSignalHandler:
     """Signal handler matching the API of the argument to signal.signal()"""
 
     cache_dir: pathlib.Path
+    index: RunIndex = None
 
 
     def __call__(self, _signum, _frame):
@@ -218,4 +321,6 @@ class DumpRunSignalHandler:
         with lib.litani.atomic_write(
                 self.cache_dir / _DUMPED_RUN) as handle:
             print(json.dumps(run, indent=2), file=handle)
+        if self.index:
+            self.index.write(run, get_index_path(self.cache_dir / _DUMPED_RUN))
         _SIGNAL_HANDLER_RUNNING = False
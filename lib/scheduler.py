@@ -0,0 +1,306 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""Run the jobs in cache.json in-process, without ninja.
+
+This is the engine behind `litani run-build --engine native`. lib.ninja.Runner
+writes a ninja file in which every job is a separate `litani exec` process;
+this Runner instead schedules the dependency graph on the event loop of
+run-build itself, and runs each job with lib.exec.run_job(), which writes the
+same status file that `litani exec` would. The parallelism trace is recorded
+when jobs start and finish, rather than parsed out of ninja's output.
+
+Like ninja invoked by Litani, the scheduler keeps going after a job fails, but
+does not run jobs that depend on the outputs of a failed job.
+
+If run-build was given --workers, the Runner sends each job to a worker (see
+lib.worker) instead of running it; the workers' slots take the place of
+--parallel. If it was given --adaptive-parallelism, the number of job slots
+changes with the load on the machine (see lib.adaptive_parallelism).
+"""
+
+
+import asyncio
+import contextlib
+import dataclasses
+import logging
+import os
+import sys
+
+import lib.exec
+import lib.litani
+import lib.memory_budget
+import lib.ninja
+import lib.parallelism_trace
+
+
+
+def get_default_parallelism():
+    """The number of jobs that ninja runs in parallel if not given -j"""
+
+    n_proc = os.cpu_count() or 1
+    if n_proc <= 1:
+        return 2
+    if n_proc == 2:
+        return 3
+    return n_proc + 2
+
+
+
+@dataclasses.dataclass
+class _Job:
+    entry: dict
+    description: str
+    deps: list = dataclasses.field(default_factory=list)
+    done: asyncio.Event = dataclasses.field(default_factory=asyncio.Event)
+    failed: bool = False
+
+
+
+@dataclasses.dataclass
+class Runner:
+    jobs: list
+    pools: dict
+    dry_run: bool
+    parallelism: str
+    pipelines: list
+    ci_stage: str
+    exec_options: dict = dataclasses.field(default_factory=dict)
+    trace: lib.parallelism_trace.Trace = dataclasses.field(
+        default_factory=lib.parallelism_trace.Trace)
+    progress: lib.ninja.ProgressLine = dataclasses.field(
+        default_factory=lib.ninja.ProgressLine)
+    workers: "lib.worker.WorkerPool" = None
+    adaptive: "lib.adaptive_parallelism.Controller" = None
+    running: int = 0
+    finished: int = 0
+    total: int = 0
+    n_failed: int = 0
+    job_slots: asyncio.Semaphore = None
+    pool_slots: dict = dataclasses.field(default_factory=dict)
+    _nodes: list = None
+
+
+    def _make_graph(self):
+        """Return the jobs that were selected to run, with dependencies filled in
+
+        A job depends on every job that outputs one of its inputs. Selecting a
+        pipeline or CI stage also selects every job it depends on.
+        """
+
+        producers = {}
+        nodes = []
+        for entry in self.jobs:
+            node = _Job(
+                entry=entry, description=entry.get("description") or
+                f"Running {entry['command']}...")
+            nodes.append(node)
+            pool = entry.get("pool")
+            if pool and pool not in self.pools:
+                logging.error(
+                    "Job '%s' was added to a pool '%s' that was not "
+                    "specified to `litani init`", node.description, pool)
+                sys.exit(1)
+            outputs = lib.litani.expand_args(entry["outputs"])
+            for out in outputs + [entry["status_file"]]:
+                if out in producers:
+                    logging.error(
+                        "Jobs '%s' and '%s' both output '%s'",
+                        producers[out].description, node.description, out)
+                    sys.exit(1)
+                producers[out] = node
+
+        if self.pipelines:
+            selected = [
+                n for n in nodes
+                if n.entry["pipeline_name"] in self.pipelines]
+        elif self.ci_stage:
+            selected = [n for n in nodes if n.entry["ci_stage"] == self.ci_stage]
+        else:
+            selected = nodes
+
+        seen = {id(n) for n in selected}
+        to_visit = list(selected)
+        while to_visit:
+            node = to_visit.pop()
+            deps = {}
+            for inp in lib.litani.expand_args(node.entry["inputs"]):
+                try:
+                    dep = producers[inp]
+                except KeyError:
+                    if not os.path.exists(inp):
+                        logging.error(
+                            "'%s', needed by job '%s', is missing and no job "
+                            "outputs it", inp, node.description)
+                        sys.exit(1)
+                    continue
+                deps[id(dep)] = dep
+                if id(dep) not in seen:
+                    seen.add(id(dep))
+                    selected.append(dep)
+                    to_visit.append(dep)
+            node.deps = list(deps.values())
+
+        self._check_for_cycles(selected)
+        return selected
+
+
+    @staticmethod
+    def _check_for_cycles(nodes):
+        n_deps = {id(n): len(n.deps) for n in nodes}
+        dependents = {id(n): [] for n in nodes}
+        for node in nodes:
+            for dep in node.deps:
+                dependents[id(dep)].append(node)
+        ready = [n for n in nodes if not n.deps]
+        n_ordered = 0
+        while ready:
+            node = ready.pop()
+            n_ordered += 1
+            for dependent in dependents[id(node)]:
+                n_deps[id(dependent)] -= 1
+                if not n_deps[id(dependent)]:
+                    ready.append(dependent)
+        if n_ordered != len(nodes):
+            cycle = [n.description for n in nodes if n_deps[id(n)]]
+            logging.error(
+                "Dependency cycle between jobs: %s", ", ".join(cycle))
+            sys.exit(1)
+
+
+    def _make_slots(self):
+        if self.adaptive:
+            self.job_slots = self.adaptive
+        else:
+            parallelism = get_default_parallelism() \
+                if self.parallelism is None else int(self.parallelism)
+            # As with ninja, 0 means no limit
+            self.job_slots = asyncio.Semaphore(parallelism) \
+                if parallelism > 0 and not self.workers else None
+        self.pool_slots = {
+            name: asyncio.Semaphore(depth)
+            for name, depth in self.pools.items()}
+
+
+    def _record(self, message):
+        self.trace.record(self.running, self.finished, self.total)
+        self.progress.update(self.finished, self.total, message)
+
+
+    async def _reserve_memory(self, job, slots):
+        """Wait until the job's expected memory fits in the memory budget,
+        so that jobs that are waiting for memory do not hold job slots"""
+
+        budget = self.exec_options.get("memory_budget")
+        size = job.entry.get("expected_memory")
+        if not budget or not size or self.workers or self.dry_run:
+            return None
+        waited = await slots.enter_async_context(
+            lib.memory_budget.Ledger().reserve(size, budget))
+        return {"budget": budget, "wait_ms": int(waited * 1000)}
+
+
+    async def _exec(self, job, worker, memory_reservation):
+        """Run a job, returning its wrapper return code"""
+
+        if self.workers:
+            return await self.workers.run_job(
+                worker, job.entry, self.exec_options)
+        return await lib.exec.run_job(
+            lib.exec.get_exec_args({**job.entry, **self.exec_options}),
+            memory_reservation=memory_reservation)
+
+
+    async def _run_job(self, job):
+        for dep in job.deps:
+            await dep.done.wait()
+        if any(dep.failed for dep in job.deps):
+            job.failed = True
+            job.done.set()
+            return
+
+        try:
+            async with contextlib.AsyncExitStack() as slots:
+                pool = job.entry.get("pool")
+                if pool:
+                    await slots.enter_async_context(self.pool_slots[pool])
+                memory_reservation = await self._reserve_memory(job, slots)
+                if self.job_slots:
+                    await slots.enter_async_context(self.job_slots)
+                worker = None
+                if self.workers:
+                    worker = await slots.enter_async_context(
+                        self.workers.slot())
+
+                self.running += 1
+                self._record(job.description)
+                try:
+                    if not self.dry_run:
+                        job.failed = bool(await self._exec(
+                            job, worker, memory_reservation))
+                except Exception as e: # pylint: disable=broad-except
+                    logging.error(
+                        "Could not run job '%s': %s", job.description, e)
+                    job.failed = True
+                self.running -= 1
+                self.finished += 1
+                self._record(job.description)
+        except Exception as e: # pylint: disable=broad-except
+            # Jobs that depend on this one must not wait for it forever
+            logging.error(
+                "Could not start job '%s': %s", job.description, e)
+            job.failed = True
+        finally:
+            if job.failed:
+                self.n_failed += 1
+            job.done.set()
+
+
+    def prepare(self):
+        """Check the job graph and set up the job slots, exiting if the graph
+        cannot be run. run() calls this if it has not been called yet."""
+
+        self._nodes = self._make_graph()
+        self.total = len(self._nodes)
+        self._make_slots()
+
+
+    async def run(self):
+        if self._nodes is None:
+            self.prepare()
+        lib.ninja.watch_tty_width()
+        adjuster = asyncio.create_task(self.adaptive.run()) \
+            if self.adaptive else None
+        try:
+            await asyncio.gather(
+                *[self._run_job(node) for node in self._nodes])
+        finally:
+            if adjuster:
+                adjuster.cancel()
+        self.progress.finish()
+
+
+    def was_successful(self):
+        return not self.n_failed
+
+
+    def get_parallelism_graph(self):
+        ret = {
+            "compact_trace": self.trace.encode(),
+            "max_parallelism": self.trace.max_running,
+            "n_proc": os.cpu_count(),
+        }
+        if self.adaptive:
+            ret["adaptive"] = self.adaptive.encode()
+        return ret
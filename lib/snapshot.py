@@ -0,0 +1,162 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""Take cheap, repeated snapshots of a directory tree that changes over time.
+
+Each report directory needs its own copy of the artifacts directory, so that a
+report that a user has locked does not change underneath them. Most artifacts
+do not change between two renders, so rather than copying every file each time,
+a Snapshotter hard-links files that are unchanged since the previous snapshot to
+that snapshot's copy. Files that are new or changed are reflinked where the
+file system supports it, and copied otherwise.
+
+Snapshots never link to the source directory itself, since jobs may rewrite
+artifact files in place.
+"""
+
+
+import dataclasses
+import errno
+import fcntl
+import logging
+import os
+import pathlib
+import shutil
+import sys
+
+
+# From linux/fs.h: _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+_REFLINK_SUPPORTED = sys.platform.startswith("linux")
+
+
+
+def _reflink(src, dst):
+    """Return True iff dst was created as a copy-on-write clone of src"""
+
+    global _REFLINK_SUPPORTED
+
+    if not _REFLINK_SUPPORTED:
+        return False
+    with open(src, "rb") as in_handle, open(dst, "wb") as out_handle:
+        try:
+            fcntl.ioctl(out_handle.fileno(), _FICLONE, in_handle.fileno())
+        except OSError as e:
+            if e.errno in (errno.ENOTTY, errno.ENOSYS):
+                _REFLINK_SUPPORTED = False
+            elif e.errno not in (
+                    errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL,
+                    errno.EBADF, errno.EPERM):
+                raise
+            return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def copy_file(src, dst):
+    """Copy src to dst, sharing storage with src if possible"""
+
+    try:
+        if _reflink(src, dst):
+            return
+    except OSError:
+        pass
+    shutil.copy2(src, dst)
+
+
+def link_or_copy(src, dst):
+    """Hard-link dst to src, falling back to copying"""
+
+    try:
+        os.link(src, dst)
+    except OSError:
+        copy_file(src, dst)
+
+
+def link_tree(src, dst):
+    """Like shutil.copytree, but hard-link the files where possible"""
+
+    shutil.copytree(src, dst, copy_function=link_or_copy)
+
+
+
+@dataclasses.dataclass
+class Snapshotter:
+    """Repeatedly snapshot a source directory into fresh directories"""
+
+    previous: pathlib.Path = None
+
+    # Relative path -> (inode, size, mtime, ctime) of the source file when it
+    # was snapshotted into `previous`
+    stamps: dict = dataclasses.field(default_factory=dict)
+
+    # File names for which this returns True are left out of snapshots
+    exclude: object = None
+
+
+    def snapshot(self, src, dst):
+        """Make dst a copy of src, reusing the previous snapshot if possible"""
+
+        src = pathlib.Path(src)
+        dst = pathlib.Path(dst)
+        stamps = {}
+        linked = copied = 0
+        dst.mkdir(parents=True, exist_ok=True)
+
+        for root, _, files in os.walk(src, followlinks=True):
+            rel_root = pathlib.Path(root).relative_to(src)
+            (dst / rel_root).mkdir(parents=True, exist_ok=True)
+            for fyle in files:
+                if self.exclude and self.exclude(fyle):
+                    continue
+                rel = rel_root / fyle
+                try:
+                    # Stat before copying: if the file changes while we copy
+                    # it, the next snapshot will notice and copy it again.
+                    stat = os.stat(src / rel)
+                except FileNotFoundError:
+                    logging.debug(
+                        "Not snapshotting %s: dangling symlink or deleted",
+                        src / rel)
+                    continue
+                stamp = (
+                    stat.st_ino, stat.st_size, stat.st_mtime_ns,
+                    stat.st_ctime_ns)
+                stamps[rel] = stamp
+
+                if self._link_from_previous(rel, stamp, dst / rel):
+                    linked += 1
+                    continue
+                try:
+                    copy_file(src / rel, dst / rel)
+                except FileNotFoundError:
+                    stamps.pop(rel)
+                    continue
+                copied += 1
+
+        logging.debug(
+            "Snapshot of %s: %d files linked, %d copied", src, linked, copied)
+        self.previous = dst
+        self.stamps = stamps
+
+
+    def _link_from_previous(self, rel, stamp, dst):
+        if self.previous is None or self.stamps.get(rel) != stamp:
+            return False
+        try:
+            os.link(self.previous / rel, dst)
+        except OSError:
+            return False
+        return True
@@ -0,0 +1,326 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""Draw the charts on Litani's HTML report as SVG, without gnuplot.
+
+The report used to render every chart by piping a gnuplot script into a new
+gnuplot process. This module draws the same kinds of chart in-process: box plots
+with labelled points (for stats groups), and time series (for the parallelism
+graph and job memory traces). Each function returns the SVG document as a list
+of lines, in the same form as litani_report.Gnuplot.render().
+
+Coordinates are computed for a whole series at once, so the cost of a chart is a
+handful of list comprehensions rather than a process spawn.
+"""
+
+
+import datetime
+import html
+import math
+
+
+FOREGROUND = "#263238"
+FONT = "Helvetica"
+
+_SI_PREFIXES = ["", "k", "M", "G", "T", "P", "E"]
+
+# Candidate spacings between ticks on a time axis, in seconds
+_TIME_STEPS = [
+    1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800,
+    21600, 43200, 86400]
+
+
+
+def si_bytes(value):
+    """Format a number of bytes like gnuplot's '%.1s%cB'"""
+
+    exponent = 0
+    if value:
+        exponent = int(math.floor(math.log10(abs(value)) / 3))
+        exponent = max(0, min(exponent, len(_SI_PREFIXES) - 1))
+    return "%.1f%sB" % (value / 1000 ** exponent, _SI_PREFIXES[exponent])
+
+
+def plain_number(value):
+    return "%g" % value
+
+
+def parse_times(stamps):
+    """Return seconds since the epoch for a list of Litani timestamps
+
+    Timestamps are written in a fixed-width format, so this slices the fields
+    out rather than calling strptime once per sample. Fractional seconds are
+    kept.
+    """
+
+    ret = []
+    for stamp in stamps:
+        try:
+            moment = datetime.datetime(
+                int(stamp[0:4]), int(stamp[5:7]), int(stamp[8:10]),
+                int(stamp[11:13]), int(stamp[14:16]), int(stamp[17:19]),
+                tzinfo=datetime.timezone.utc)
+        except (ValueError, IndexError):
+            moment = datetime.datetime.strptime(
+                stamp, "%Y-%m-%dT%H:%M:%SZ").replace(
+                    tzinfo=datetime.timezone.utc)
+        fraction = 0.0
+        if len(stamp) > 20 and stamp[19] == ".":
+            fraction = float("0" + stamp[19:].rstrip("Z"))
+        ret.append(moment.timestamp() + fraction)
+    return ret
+
+
+def nice_ticks(lo, hi, target=8):
+    """Return evenly-spaced round values that cover [lo, hi]"""
+
+    if hi <= lo:
+        hi = lo + 1
+    raw_step = (hi - lo) / target
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    for multiple in (1, 2, 5, 10):
+        step = multiple * magnitude
+        if step >= raw_step:
+            break
+    first = math.floor(lo / step)
+    last = math.ceil(hi / step)
+    return [round(i * step, 10) for i in range(first, last + 1)]
+
+
+def log_ticks(lo, hi):
+    """Return powers of ten that cover [lo, hi], with lo > 0"""
+
+    first = math.floor(math.log10(lo))
+    last = math.ceil(math.log10(hi))
+    if first == last:
+        last += 1
+    return [10 ** i for i in range(first, last + 1)]
+
+
+def time_ticks(lo, hi, target=6):
+    span = max(hi - lo, 1)
+    for step in _TIME_STEPS:
+        if span / step <= target:
+            break
+    first = math.ceil(lo / step) * step
+    return [first + i * step for i in range(int((hi - first) // step) + 1)]
+
+
+
+class _Canvas:
+    """An SVG document with a plotting area and linear or log axes"""
+
+    def __init__(self, width, height, margins):
+        self.width = width
+        self.height = height
+        self.left, self.right, self.top, self.bottom = margins
+        self.elements = []
+        self._x = self._y = None
+
+
+    def set_x_range(self, lo, hi):
+        self._x = self._linear(lo, hi, self.left, self.width - self.right)
+
+
+    def set_y_range(self, lo, hi, log=False):
+        start, end = self.height - self.bottom, self.top
+        if log:
+            to_linear = self._linear(
+                math.log10(lo), math.log10(hi), start, end)
+            self._y = lambda v: to_linear(math.log10(max(v, lo)))
+        else:
+            self._y = self._linear(lo, hi, start, end)
+
+
+    @staticmethod
+    def _linear(lo, hi, start, end):
+        scale = (end - start) / ((hi - lo) or 1)
+        return lambda v: start + (v - lo) * scale
+
+
+    def xs(self, values):
+        x = self._x
+        return [x(v) for v in values]
+
+
+    def ys(self, values):
+        y = self._y
+        return [y(v) for v in values]
+
+
+    def add(self, element):
+        self.elements.append(element)
+
+
+    def polyline(self, xs, ys, color, width=1):
+        points = " ".join("%.2f,%.2f" % p for p in zip(xs, ys))
+        self.add(
+            f'<polyline fill="none" stroke="{color}" stroke-width="{width}" '
+            f'points="{points}"/>')
+
+
+    def line(self, x1, y1, x2, y2, color, width=1, dash=None):
+        dash = f' stroke-dasharray="{dash}"' if dash else ""
+        self.add(
+            f'<line x1="{x1:.2f}" y1="{y1:.2f}" x2="{x2:.2f}" y2="{y2:.2f}" '
+            f'stroke="{color}" stroke-width="{width}"{dash}/>')
+
+
+    def rect(self, x, y, width, height, color):
+        self.add(
+            f'<rect x="{x:.2f}" y="{y:.2f}" width="{width:.2f}" '
+            f'height="{height:.2f}" fill="none" stroke="{color}"/>')
+
+
+    def circle(self, x, y, radius, color):
+        self.add(
+            f'<circle cx="{x:.2f}" cy="{y:.2f}" r="{radius}" fill="none" '
+            f'stroke="{color}"/>')
+
+
+    def text(
+            self, x, y, text, size, color=FOREGROUND, anchor="start",
+            rotate=False):
+        transform = f' transform="rotate(-90 {x:.2f} {y:.2f})"' \
+            if rotate else ""
+        self.add(
+            f'<text x="{x:.2f}" y="{y:.2f}" font-family="{FONT}" '
+            f'font-size="{size}" fill="{color}" text-anchor="{anchor}" '
+            f'dominant-baseline="middle"{transform}>'
+            f'{html.escape(str(text))}</text>')
+
+
+    def left_axis(self, ticks, fmt, font_size, grid_color=None):
+        x = self.left
+        self.line(x, self.top, x, self.height - self.bottom, FOREGROUND)
+        for tick, y in zip(ticks, self.ys(ticks)):
+            self.line(x, y, x - 5, y, FOREGROUND)
+            self.text(x - 8, y, fmt(tick), font_size, anchor="end")
+            if grid_color:
+                self.line(
+                    x, y, self.width - self.right, y, grid_color, dash="2,3")
+
+
+    def bottom_axis(self, ticks, fmt, font_size):
+        y = self.height - self.bottom
+        self.line(self.left, y, self.width - self.right, y, FOREGROUND)
+        for tick, x in zip(ticks, self.xs(ticks)):
+            self.line(x, y, x, y + 5, FOREGROUND)
+            self.text(x, y + 14, fmt(tick), font_size, anchor="middle")
+
+
+    def lines(self):
+        return [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" '
+            f'height="{self.height}" viewBox="0 0 {self.width} {self.height}">',
+            *self.elements,
+            "</svg>",
+        ]
+
+
+
+def _quantile(ordered, fraction):
+    pos = (len(ordered) - 1) * fraction
+    lower = math.floor(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def box_plot(
+        values, labels, title, ylabel=None, y_format=plain_number,
+        width=400, height=800):
+    """A box-and-whiskers plot of values, with each value labelled
+
+    Whiskers extend to the furthest values within 1.5 times the interquartile
+    range of the box, as in gnuplot; values beyond that are drawn as points.
+    """
+
+    canvas = _Canvas(width, height, (90, 10, 40, 20))
+    ordered = sorted(values)
+    q1, median, q3 = (_quantile(ordered, f) for f in (0.25, 0.5, 0.75))
+    reach = 1.5 * (q3 - q1)
+    low_whisker = min(v for v in ordered if v >= q1 - reach)
+    high_whisker = max(v for v in ordered if v <= q3 + reach)
+
+    ticks = nice_ticks(ordered[0], ordered[-1])
+    canvas.set_x_range(0, 1)
+    canvas.set_y_range(ticks[0], ticks[-1])
+
+    canvas.text(width / 2, 20, title, 14, anchor="middle")
+    canvas.left_axis(ticks, y_format, 14)
+    if ylabel:
+        canvas.text(18, height / 2, ylabel, 14, anchor="middle", rotate=True)
+
+    box_left, box_center, box_right = canvas.xs([0.1, 0.2, 0.3])
+    y_q1, y_median, y_q3, y_low, y_high = canvas.ys(
+        [q1, median, q3, low_whisker, high_whisker])
+    canvas.rect(box_left, y_q3, box_right - box_left, y_q1 - y_q3, FOREGROUND)
+    canvas.line(box_left, y_median, box_right, y_median, FOREGROUND)
+    for end, edge in ((y_low, y_q1), (y_high, y_q3)):
+        canvas.line(box_center, edge, box_center, end, FOREGROUND)
+        canvas.line(
+            box_center - 10, end, box_center + 10, end, FOREGROUND)
+    for value, y in zip(ordered, canvas.ys(ordered)):
+        if value < low_whisker or value > high_whisker:
+            canvas.circle(box_center, y, 3, FOREGROUND)
+
+    label_x = canvas.xs([0.4])[0]
+    for label, y in zip(labels, canvas.ys(values)):
+        canvas.text(label_x, y, label, 10)
+    return canvas.lines()
+
+
+def time_series(
+        times, series, width, height, log_y=False, y_format=plain_number,
+        y_font_size=9, ylabel=None, x_ticks=False, annotations=(),
+        grid=False):
+    """Lines plotted against time
+
+    times is a list of seconds since the epoch. series is a list of (values,
+    color) pairs, with one value per time. annotations is a list of (time,
+    value, text, color) tuples.
+    """
+
+    left = 70 if ylabel else 60
+    bottom = 25 if x_ticks else 8
+    canvas = _Canvas(width, height, (left, 15, 8, bottom))
+
+    all_values = [v for values, _ in series for v in values]
+    all_values.extend(a[1] for a in annotations)
+    if log_y:
+        positive = [v for v in all_values if v > 0] or [1]
+        ticks = log_ticks(min(positive), max(positive))
+    else:
+        ticks = nice_ticks(min(0, *all_values), max(all_values))
+    canvas.set_x_range(times[0], times[-1])
+    canvas.set_y_range(ticks[0], ticks[-1], log=log_y)
+
+    canvas.left_axis(
+        ticks, y_format, y_font_size, grid_color="#e0e0e0" if grid else None)
+    if ylabel:
+        canvas.text(14, height / 2, ylabel, 12, anchor="middle", rotate=True)
+    if x_ticks:
+        canvas.bottom_axis(
+            time_ticks(times[0], times[-1]),
+            lambda t: datetime.datetime.fromtimestamp(
+                t, datetime.timezone.utc).strftime("%H:%M:%S"), 9)
+
+    xs = canvas.xs(times)
+    for values, color in series:
+        canvas.polyline(xs, canvas.ys(values), color)
+    for time, value, text, color in annotations:
+        canvas.text(
+            canvas.xs([time])[0], canvas.ys([value])[0], text, 12, color,
+            anchor="end")
+    return canvas.lines()
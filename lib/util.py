@@ -15,6 +15,7 @@ import argparse
 import datetime
 import logging
 import pathlib
+import re
 import sys
 
 from lib import litani
@@ -68,9 +69,43 @@ def non_negative_int(arg):
     return ret
 
 
+def non_negative_float(arg):
+    try:
+        ret = float(arg)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(
+            "'%s' must be a number" % arg) from e
+    if ret < 0:
+        raise argparse.ArgumentTypeError("'%s' must be >= 0" % arg)
+    return ret
+
+
+def positive_float(arg):
+    ret = non_negative_float(arg)
+    if not ret:
+        raise argparse.ArgumentTypeError("'%s' must be > 0" % arg)
+    return ret
+
+
 def _non_directory_path(arg):
     path = pathlib.Path(arg)
     if path.exists() and path.is_dir():
         raise ValueError(
           f"--out-file flag expects a file and not a directory: {arg}")
     return path
+
+
+_MEMORY_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def memory_size(arg):
+    """Parse a number of bytes, optionally followed by K, M, G or T (powers of
+    1024) and an optional "B" or "iB", e.g. 512M or 30GiB"""
+
+    match = re.fullmatch(
+        r"(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?", str(arg).strip().upper())
+    if not match:
+        raise argparse.ArgumentTypeError(
+            "'%s' is not a memory size like 512M or 30G" % arg)
+    number, unit = match.groups()
+    return int(float(number) * _MEMORY_UNITS[unit])
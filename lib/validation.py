@@ -87,6 +87,17 @@ def _single_job_schema():
         # How frequently (in seconds) litani will profile the command's memory
         # use, if *profile_memory* is true.
 
+        "expected_memory": voluptuous.Any(int, None),
+        # How many bytes of memory this job is expected to use, from
+        # --expected-memory. If run-build was passed *--memory-budget*, jobs
+        # that were added without --expected-memory get the peak memory that
+        # they used in the most recent earlier run, if any.
+
+        "max_captured_output": int,
+        # Litani keeps at most this many bytes from the start and from the end
+        # of the command's stdout and stderr in the *stdout* and *stderr* keys
+        # of the job; 0 means that all of the output is kept.
+
         "cwd": voluptuous.Any(str, None),
         # The directory that litani will run the command in.
 
@@ -212,6 +223,93 @@ def _status():
     return voluptuous.Any("success", "fail", "in_progress")
 # end-doc-gen
 
+# doc-gen
+# {
+#   "page": "litani-run.json",
+#   "order": 4,
+#   "title": "Schema for a reference to a job's log"
+# }
+def _log_reference():
+    import voluptuous
+
+    # The full stdout and stderr of each job are saved to files, whose paths
+    # are relative to both Litani's cache directory and the HTML report
+    # directory.
+
+    return {
+        "path": str,
+        # The log's path, e.g. "logs/<job_id>.stdout.gz".
+
+        "compression": voluptuous.Any("none", "gzip", "lzma"),
+        # How the log is compressed (see *--log-compression* in
+        # *litani-run-build(1)*).
+
+        "size": int,
+        # The size of the uncompressed output in bytes.
+
+        "lines": int,
+        # The number of lines of output.
+    }
+# end-doc-gen
+
+
+
+# doc-gen
+# {
+#   "page": "litani-run.json",
+#   "order": 5,
+#   "title": "Schema for a job's resource usage"
+# }
+def _resource_usage():
+    import voluptuous
+
+    # Litani records the resources used by every job's command, including all
+    # of the processes that the command started. These come from wait4(2), and
+    # from /proc/<pid>/io on Linux.
+
+    return {
+        "user_time": voluptuous.Any(float, int),
+        # CPU time spent in user mode, in seconds.
+
+        "system_time": voluptuous.Any(float, int),
+        # CPU time spent in the kernel, in seconds.
+
+        "max_rss": int,
+        # Largest resident set of any single process, in bytes. The kernel
+        # counts the memory of the forked Litani process until it starts the
+        # command, so this is never smaller than that; use *memory_trace* to
+        # measure jobs that use little memory.
+
+        "voluntary_context_switches": int,
+        # Number of times a process gave up the CPU, typically to wait for I/O.
+
+        "involuntary_context_switches": int,
+        # Number of times a process was preempted, typically because there
+        # were more runnable processes than CPUs.
+
+        "block_input_operations": int,
+        # Number of times the file system had to read from disk.
+
+        "block_output_operations": int,
+        # Number of times the file system had to write to disk.
+
+        "read_bytes": voluptuous.Any(int, None),
+        # Bytes fetched from storage, or null if not known.
+
+        "write_bytes": voluptuous.Any(int, None),
+        # Bytes sent to storage, or null if not known.
+
+        "read_chars": voluptuous.Any(int, None),
+        # Bytes passed to read(2) and similar system calls, including those
+        # served from the page cache, or null if not known.
+
+        "write_chars": voluptuous.Any(int, None),
+        # Bytes passed to write(2) and similar system calls, or null if not
+        # known.
+    }
+# end-doc-gen
+
+
 
 # doc-gen
 # {
@@ -280,22 +378,39 @@ def _run_schema():
         # that litani runs. This is to measure whether the run is using as many
         # processor cores as possible over the duration of the run.
 
-            voluptuous.Optional("trace"): [{
-            # A list of samples of the run's concurrency level.
+            voluptuous.Optional("compact_trace"): {
+            # Samples of the run's concurrency level, taken whenever a job
+            # starts or finishes. The samples are stored as parallel lists,
+            # so the Nth sample is made of the Nth item of *offsets_ms*,
+            # *running*, *finished*, and *total*. Consecutive samples with
+            # the same numbers of jobs are stored once. Python code can call
+            # lib.parallelism_trace.decode() to turn this dict into a list
+            # of samples, each of which is a dict with a *time*, *running*,
+            # *finished* and *total* key.
+
+                "start": _ms_time_str,
+                # The time at which the first sample was taken.
+
+                "resolution_ms": int,
+                # If this is not zero, the samples in each interval of this
+                # many milliseconds were merged into one sample, which has the
+                # highest number of running jobs in the interval (see
+                # *--parallelism-resolution* in *litani-run-build(1)*).
 
-                "time": _ms_time_str,
-                # The time at which the sample was taken.
+                "offsets_ms": [int],
+                # The time at which each sample was taken, in milliseconds
+                # after *start*.
 
-                "finished": int,
-                # How many jobs have finished
+                "running": [int],
+                # How many jobs were running
 
-                "running": int,
-                # How many jobs are running
+                "finished": [int],
+                # How many jobs had finished
 
-                "total": int,
+                "total": [int],
                 # The total number of jobs
 
-            }],
+            },
 
             voluptuous.Optional("max_parallelism"): int,
             # The maximum parallelism attained over the run
@@ -303,6 +418,54 @@ def _run_schema():
             voluptuous.Optional("n_proc"): voluptuous.Any(None, int),
             # The number of processors detected on this machine
 
+            voluptuous.Optional("adaptive"): {
+            # If run-build was passed *--adaptive-parallelism*, how the
+            # number of jobs that may run at once changed over the run.
+
+                "min": int,
+                # The value of *--min-parallel*.
+
+                "max": int,
+                # The value of *-j*, or the default parallelism.
+
+                "interval": voluptuous.Any(float, int),
+                # How often the load on the machine was sampled, in seconds.
+
+                "initial_limit": int,
+                # The number of jobs that could run at once at the start.
+
+                "adjustments": [{
+                # Each change to the number of jobs that may run at once.
+
+                    "time": _ms_time_str,
+                    # When the change was made.
+
+                    "limit": int,
+                    # The number of jobs that could run at once afterward.
+
+                    "reason": str,
+                    # Why the number changed, e.g. "memory pressure".
+
+                    "running": int,
+                    # The number of jobs running at the time.
+
+                    "load": voluptuous.Any(float, int, None),
+                    # The 1-minute load average.
+
+                    "cpu_pressure": voluptuous.Any(float, int, None),
+                    "memory_pressure": voluptuous.Any(float, int, None),
+                    # The percentage of the last 10 seconds in which some
+                    # tasks were stalled waiting for a CPU or for memory
+                    # (Linux pressure stall information), or null if the
+                    # kernel does not report it.
+
+                    "mem_available": voluptuous.Any(int, None),
+                    "mem_total": voluptuous.Any(int, None),
+                    # MemAvailable and MemTotal in bytes.
+
+                }],
+            },
+
         }),
 
         "pipelines": [{
@@ -356,6 +519,12 @@ def _run_schema():
                     "start_time": _time_str,
                     # The time at which the job started running.
 
+                    voluptuous.Optional("memory_budget"): {
+                        "budget": int,
+                        "wait_ms": int,
+                    },
+                    # As for completed jobs, see below.
+
                     "duration_str": None,
 
                     "wrapper_arguments": _single_job_schema(),
@@ -388,9 +557,25 @@ def _run_schema():
 
                     "stderr": voluptuous.Any([str], None),
                     # A list of strings that the command printed to its stderr.
+                    # If run-build was passed *--log-excerpts*, this is only
+                    # the last few lines; the full output is in the log that
+                    # *stderr_log* refers to.
+
+                    "stderr_log": voluptuous.Any(_log_reference(), None),
+                    # The file that the command's stderr was saved to, or null
+                    # if the command printed nothing to stderr.
 
                     "stdout": voluptuous.Any([str], None),
                     # A list of strings that the command printed to its stdout.
+                    # If run-build was passed *--log-excerpts* and the job
+                    # has neither the *literal-stdout* nor the
+                    # *front-page-text* tag, this is only the last few lines;
+                    # the full output is in the log that *stdout_log* refers
+                    # to.
+
+                    "stdout_log": voluptuous.Any(_log_reference(), None),
+                    # The file that the command's stdout was saved to, or null
+                    # if the command printed nothing to stdout.
 
                     "duration_ms": voluptuous.Any(str, None),
                     # Duration of this job S.MS
@@ -407,6 +592,52 @@ def _run_schema():
                     # value of this key will be the deserialized data loaded
                     # from the outcome table file.
 
+                    "resource_usage": _resource_usage(),
+                    # The resources that the command used, see the
+                    # resource_usage schema below.
+
+                    voluptuous.Optional("worker"): str,
+                    # If run-build was passed *--workers*, the address of the
+                    # `litani worker` that ran this job.
+
+                    voluptuous.Optional("cached_result"): voluptuous.Any({
+                    # If run-build was passed *--result-cache* and this job's
+                    # result was restored from the cache rather than running
+                    # the command, this dict describes the run that stored
+                    # it; otherwise null. The job's outcome, return codes,
+                    # output, *memory_trace* and *resource_usage* are those of
+                    # that run, while *start_time*, *end_time* and the
+                    # durations are those of restoring the result.
+
+                        "key": str,
+                        # The hash of the job's command, working directory,
+                        # environment, flags and inputs that the result was
+                        # stored under.
+
+                        "start_time": _time_str,
+                        # The time at which the command started running in
+                        # the run that stored the result.
+
+                        "duration_ms": voluptuous.Any(str, None),
+                        # How long the command ran for in the run that stored
+                        # the result, S.MS
+
+                    }, None),
+
+                    voluptuous.Optional("memory_budget"): {
+                    # If run-build was passed *--memory-budget* and this job
+                    # has an *expected_memory*, how long the job waited for
+                    # its expected memory to fit in the budget.
+
+                        "budget": int,
+                        # The budget in bytes.
+
+                        "wait_ms": int,
+                        # How long the job waited before starting, in
+                        # milliseconds.
+
+                    },
+
                     "memory_trace": {
                     # If *profile_memory* was set to true in the wrapper
                     # arguments for this job, this dict will contain samples of
@@ -427,6 +658,15 @@ def _run_schema():
                             "human_readable_vsz": str,
                             # Peak virtual memory size
 
+                            voluptuous.Optional("hwm"): int,
+                            # Peak of the summed resident set high-water marks
+                            # of the command's processes. Only recorded on
+                            # Linux. This can be larger than *rss*, since it
+                            # also counts usage that happened between samples.
+
+                            voluptuous.Optional("human_readable_hwm"): str,
+                            # Peak resident set high-water mark
+
                         },
 
                         voluptuous.Optional("trace"): [{
@@ -438,6 +678,9 @@ def _run_schema():
                             "vsz": int,
                             # Virtual memory
 
+                            voluptuous.Optional("hwm"): int,
+                            # Resident set high-water mark (Linux only)
+
                             "time": _time_str,
                             # The time at which the sample was taken
 
@@ -456,6 +699,7 @@ def _run_schema():
 def validate_outcome_table(table):
     try:
         import voluptuous
+        import voluptuous.humanize
     except ImportError:
         logging.debug("Skipping outcome table validation as voluptuous is not installed")
         return
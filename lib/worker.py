@@ -0,0 +1,441 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+"""Run jobs on other machines.
+
+`litani worker` listens on a TCP port or a Unix socket and runs the jobs that
+it is sent with lib.exec.run_job(), a given number at a time. `litani
+run-build --engine native --workers ADDR...` connects to each worker and,
+rather than running jobs itself, sends each job to a worker that has a free
+slot once the job's dependencies have completed.
+
+The protocol is a sequence of messages in each direction. A message is a line
+of JSON; if it has a *size* key, it is followed by that many bytes of payload.
+After both sides have sent a "hello" message, run-build sends "job" messages
+and the worker replies to each with a "result" message, whose payload is a tar
+archive of the job's outputs, --stdout-file, --stderr-file, logs and status
+(see lib.result_cache.pack()). run-build puts these in place, writes the
+job's status file, and copies the job's artifacts.
+
+Workers must be able to read each job's inputs at the same paths as run-build,
+for example through a shared file system. Outputs are always sent back, so
+that the artifacts and the inputs of later jobs are on run-build's machine
+even if they are not shared.
+"""
+
+
+import asyncio
+import contextlib
+import dataclasses
+import functools
+import json
+import logging
+import os
+import pathlib
+import shutil
+import sys
+import tarfile
+import tempfile
+
+import lib.exec
+import lib.litani
+import lib.result_cache
+import lib.scheduler
+import lib.util
+
+
+_CHUNK_SIZE = 1 << 20
+
+# Job messages hold the job's arguments, which can be long
+_LINE_LIMIT = 1 << 24
+
+
+def add_subparser(subparsers):
+    worker_pars = subparsers.add_parser(
+        "worker", help="Run jobs for `litani run-build --workers`")
+    worker_pars.set_defaults(func=run_worker)
+    for arg in [{
+            "flags": ["--listen"],
+            "metavar": "ADDR",
+            "required": True,
+            "help": "accept connections from run-build on ADDR, which is "
+                    "either HOST:PORT or unix:PATH",
+    }, {
+            "flags": ["--slots"],
+            "metavar": "N",
+            "type": int,
+            "default": lib.scheduler.get_default_parallelism(),
+            "help": "run at most N jobs at a time (default: %(default)s)",
+    }, {
+            "flags": ["--work-dir"],
+            "metavar": "D",
+            "help": "keep the logs and status files of running jobs in D "
+                    "(default: a new temporary directory)",
+    }]:
+        flags = arg.pop("flags")
+        worker_pars.add_argument(*flags, **arg)
+
+
+def _parse_address(address):
+    if address.startswith("unix:"):
+        return None, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    if not port.isdigit():
+        logging.error(
+            "Worker address '%s' is neither HOST:PORT nor unix:PATH", address)
+        sys.exit(1)
+    return host or "localhost", int(port)
+
+
+async def _open_connection(address):
+    host, port = _parse_address(address)
+    if host is None:
+        return await asyncio.open_unix_connection(port, limit=_LINE_LIMIT)
+    return await asyncio.open_connection(host, port, limit=_LINE_LIMIT)
+
+
+async def _start_server(address, callback):
+    host, port = _parse_address(address)
+    if host is None:
+        return await asyncio.start_unix_server(
+            callback, port, limit=_LINE_LIMIT)
+    return await asyncio.start_server(
+        callback, host, port, limit=_LINE_LIMIT)
+
+
+async def _send(writer, lock, message, payload=None):
+    """Send message, followed by the contents of the file payload"""
+
+    async with lock:
+        if payload:
+            message = {**message, "size": os.path.getsize(payload)}
+        writer.write(json.dumps(message).encode("utf-8") + b"\n")
+        if payload:
+            with open(payload, "rb") as handle:
+                for chunk in iter(lambda: handle.read(_CHUNK_SIZE), b""):
+                    writer.write(chunk)
+                    await writer.drain()
+        await writer.drain()
+
+
+async def _receive(reader):
+    """Return the next message and the path to a temporary file holding its
+    payload, or (None, None) if the connection was closed"""
+
+    line = await reader.readline()
+    if not line:
+        return None, None
+    message = json.loads(line)
+    if "size" not in message:
+        return message, None
+
+    remaining = message["size"]
+    fd, payload = tempfile.mkstemp(prefix="litani-payload-")
+    with os.fdopen(fd, "wb") as handle:
+        while remaining:
+            chunk = await reader.read(min(remaining, _CHUNK_SIZE))
+            if not chunk:
+                os.unlink(payload)
+                raise ConnectionError("connection closed during a message")
+            handle.write(chunk)
+            remaining -= len(chunk)
+    return message, payload
+
+
+def _check_version(message, address):
+    if message is None or message.get("type") != "hello":
+        logging.error("'%s' did not greet like a Litani worker", address)
+        sys.exit(1)
+    if message["version"] != lib.litani.VERSION:
+        logging.error(
+            "Worker '%s' runs Litani %s, but this is Litani %s", address,
+            message["version"], lib.litani.VERSION)
+        sys.exit(1)
+
+
+def _extract(archive, dest):
+    with tarfile.open(archive) as tar:
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(dest, filter="data")
+        else:
+            tar.extractall(dest)
+
+
+
+@dataclasses.dataclass
+class _Connection:
+    address: str
+    slots: int
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    lock: asyncio.Lock = dataclasses.field(default_factory=asyncio.Lock)
+    pending: dict = dataclasses.field(default_factory=dict)
+    next_id: int = 0
+    alive: bool = True
+
+
+
+@dataclasses.dataclass
+class WorkerPool:
+    """run-build's connections to its workers"""
+
+    connections: list = dataclasses.field(default_factory=list)
+    free_slots: asyncio.Queue = dataclasses.field(
+        default_factory=asyncio.Queue)
+    readers: list = dataclasses.field(default_factory=list)
+
+
+    @staticmethod
+    async def connect(addresses):
+        pool = WorkerPool()
+        for address in addresses:
+            try:
+                reader, writer = await _open_connection(address)
+                lock = asyncio.Lock()
+                await _send(writer, lock, {
+                    "type": "hello", "version": lib.litani.VERSION})
+                message, _ = await _receive(reader)
+            except (OSError, ValueError) as e:
+                logging.error(
+                    "Could not connect to worker '%s': %s", address, e)
+                sys.exit(1)
+            _check_version(message, address)
+            pool.connections.append(_Connection(
+                address, message["slots"], reader, writer, lock))
+
+        # Interleave the workers' slots, so that jobs are spread over
+        # workers while there are fewer jobs than slots
+        for idx in range(max((c.slots for c in pool.connections), default=0)):
+            for connection in pool.connections:
+                if idx < connection.slots:
+                    pool.free_slots.put_nowait(connection)
+        pool.readers = [
+            asyncio.create_task(pool._read_results(c))
+            for c in pool.connections]
+        return pool
+
+
+    def get_slots(self):
+        return sum(c.slots for c in self.connections)
+
+
+    async def _read_results(self, connection):
+        try:
+            while True:
+                message, payload = await _receive(connection.reader)
+                if message is None:
+                    break
+                future = connection.pending.pop(message["id"])
+                future.set_result((message, payload))
+        except (OSError, ValueError) as e:
+            logging.warning(
+                "Lost connection to worker '%s': %s", connection.address, e)
+
+        connection.alive = False
+        for future in connection.pending.values():
+            future.set_exception(ConnectionError(
+                f"worker '{connection.address}' disconnected"))
+        connection.pending.clear()
+        if not any(c.alive for c in self.connections):
+            # Wake up every job that is waiting for a slot
+            self.free_slots.put_nowait(None)
+
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Wait for a worker with a free slot, yielding None if there are no
+        workers left"""
+
+        while True:
+            connection = await self.free_slots.get()
+            if connection is None:
+                self.free_slots.put_nowait(None)
+                break
+            if connection.alive:
+                break
+        try:
+            yield connection
+        finally:
+            if connection and connection.alive:
+                self.free_slots.put_nowait(connection)
+
+
+    async def run_job(self, connection, job_args, exec_options):
+        """Run a job on the worker that connection leads to
+
+        job_args is the job's entry in cache.json, and exec_options are the
+        `litani exec` flags that run-build passes to every job. Returns the
+        job's wrapper return code.
+        """
+
+        description = job_args.get("description") or job_args["command"]
+        if connection is None:
+            logging.error(
+                "Could not run job '%s': no workers are left", description)
+            return 1
+
+        # Jobs would otherwise run in the worker's directory
+        job_args = {**job_args, "cwd": job_args.get("cwd") or os.getcwd()}
+        status = {"wrapper_arguments": job_args, "complete": False}
+        lib.util.timestamp("start_time", status)
+        with lib.litani.atomic_write(job_args["status_file"]) as handle:
+            print(json.dumps(status, indent=2), file=handle)
+
+        job_id = connection.next_id
+        connection.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        connection.pending[job_id] = future
+        try:
+            await _send(connection.writer, connection.lock, {
+                "type": "job", "id": job_id,
+                "job": {**job_args, **exec_options},
+            })
+            message, payload = await future
+        except (OSError, ConnectionError) as e:
+            connection.pending.pop(job_id, None)
+            if not future.cancel():
+                # Mark the worker's disconnection as handled
+                future.exception()
+            logging.warning(
+                "Running job '%s' on another worker: %s", description, e)
+            async with self.slot() as other:
+                return await self.run_job(other, job_args, exec_options)
+
+        if "error" in message:
+            logging.error(
+                "Worker '%s' could not run job '%s': %s", connection.address,
+                description, message["error"])
+            return 1
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(
+            self._finish_job, payload, job_args, connection.address))
+
+
+    @staticmethod
+    def _finish_job(payload, job_args, address):
+        try:
+            with tempfile.TemporaryDirectory(prefix="litani-result-") as tmp:
+                _extract(payload, tmp)
+                status = lib.result_cache.unpack(
+                    tmp, job_args, lib.litani.get_cache_dir())
+        finally:
+            os.unlink(payload)
+        status["worker"] = address
+        with lib.litani.atomic_write(job_args["status_file"]) as handle:
+            print(json.dumps(status, indent=2), file=handle)
+        lib.exec.copy_output_artifacts(status["wrapper_arguments"])
+        return status["wrapper_return_code"]
+
+
+    async def close(self):
+        for connection in self.connections:
+            connection.writer.close()
+        await asyncio.gather(*self.readers)
+
+
+
+@dataclasses.dataclass
+class _Worker:
+    work_dir: pathlib.Path
+    slots: asyncio.Semaphore
+    n_slots: int
+
+
+    async def serve(self, reader, writer):
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            message, _ = await _receive(reader)
+            if message is None or message.get("type") != "hello":
+                return
+            await _send(writer, lock, {
+                "type": "hello", "version": lib.litani.VERSION,
+                "slots": self.n_slots,
+            })
+            while True:
+                message, _ = await _receive(reader)
+                if message is None:
+                    break
+                task = asyncio.create_task(
+                    self._run_job(message, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (OSError, ValueError) as e:
+            logging.warning("Lost connection to run-build: %s", e)
+        # Let jobs that are already running finish, even though their
+        # results cannot be sent anywhere
+        await asyncio.gather(*tasks)
+        writer.close()
+
+
+    async def _run_job(self, message, writer, lock):
+        job_args = message["job"]
+        status_file = self.work_dir / "status" / f"{job_args['job_id']}.json"
+        tmp = pathlib.Path(tempfile.mkdtemp(
+            prefix="litani-result-", dir=self.work_dir))
+        logs = []
+        try:
+            args = lib.exec.get_exec_args({
+                **job_args, "status_file": str(status_file)})
+            async with self.slots:
+                await lib.exec.run_job(args, copy_artifacts=False)
+            with open(status_file) as handle:
+                status = json.load(handle)
+            status["wrapper_arguments"]["status_file"] = job_args[
+                "status_file"]
+            logs = [
+                self.work_dir / status[f"{stream}_log"]["path"]
+                for stream in ("stdout", "stderr")
+                if status[f"{stream}_log"]]
+
+            lib.result_cache.pack(
+                tmp / "result", job_args, status, self.work_dir)
+            with tarfile.open(tmp / "result.tar", "w") as tar:
+                tar.add(tmp / "result", arcname=".")
+            reply = {"type": "result", "id": message["id"]}
+            payload = tmp / "result.tar"
+        except Exception as e: # pylint: disable=broad-except
+            logging.error("Could not run job '%s': %s", job_args["job_id"], e)
+            reply = {"type": "result", "id": message["id"], "error": str(e)}
+            payload = None
+
+        try:
+            await _send(writer, lock, reply, payload)
+        except (OSError, ConnectionError) as e:
+            logging.warning(
+                "Could not send result of job '%s': %s",
+                job_args["job_id"], e)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+            for fyle in [status_file, *logs]:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(fyle)
+
+
+
+async def run_worker(args):
+    work_dir = pathlib.Path(
+        args.work_dir or tempfile.mkdtemp(prefix="litani-worker-")).resolve()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    # lib.exec.run_job() writes each job's status and logs into the cache dir
+    lib.litani.CacheDir.cache_dir_path = work_dir
+
+    worker = _Worker(work_dir, asyncio.Semaphore(args.slots), args.slots)
+    server = await _start_server(args.listen, worker.serve)
+    logging.info(
+        "Listening on %s with %d slots, working in %s", args.listen,
+        args.slots, work_dir)
+    async with server:
+        await server.serve_forever()
@@ -15,7 +15,7 @@
 
 $data << EOD
 {% for sample in trace -%}
-{{ sample["time"] }} {{ sample["running"] }} {{ n_proc }} {{ n_proc + 0.5 }} {% if loop.last %} "# cores: {{ n_proc}}" {% endif %}
+{{ sample["time"] }} {{ sample["running"] }} {{ n_proc }} {{ n_proc + 0.5 }} {% if adaptive %}{{ sample["limit"] }} {% endif %}{% if loop.last %} "# cores: {{ n_proc}}" {% endif %}
 {% endfor %}{# sample in trace #}
 EOD
 
@@ -33,6 +33,13 @@ set timefmt "%Y-%m-%dT%H:%M:%SZ"
 set format x "%H:%M:%S"
 unset key
 
+{% if adaptive -%}
+plot '$data' using 1:2 with lines lc "#ab47bc", \
+  '' using 1:3 with lines lc "#cc0000", \
+  '' using 1:5 with steps lc "#1e88e5", \
+  '' using 1:4:6 with labels tc "#cc0000"
+{%- else -%}
 plot '$data' using 1:2 with lines lc "#ab47bc", \
   '' using 1:3 with lines lc "#cc0000", \
   '' using 1:4:5 with labels tc "#cc0000"
+{%- endif %}
@@ -0,0 +1,88 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+SLOW = True
+
+def get_init_args():
+    return {
+        "kwargs": {
+            "project": "foo",
+            "pools": ["foo-pool:1"],
+        }
+    }
+
+
+def get_jobs():
+    return [{
+        "kwargs": {
+            "command": "sleep 1; echo first",
+            "description": "first",
+            "ci-stage": "build",
+            "pipeline": "foo",
+            "outputs": "native-engine-first",
+            "phony-outputs": "native-engine-first",
+        }
+    }, {
+        "kwargs": {
+            "command": "echo second",
+            "description": "second",
+            "ci-stage": "test",
+            "pipeline": "foo",
+            "inputs": "native-engine-first",
+        }
+    }, {
+        "kwargs": {
+            "command": "sleep 1",
+            "description": "pool-1",
+            "ci-stage": "build",
+            "pipeline": "bar",
+            "pool": "foo-pool",
+        }
+    }, {
+        "kwargs": {
+            "command": "sleep 1",
+            "description": "pool-2",
+            "ci-stage": "build",
+            "pipeline": "bar",
+            "pool": "foo-pool",
+        }
+    }]
+
+
+def get_run_build_args():
+    return {
+        "kwargs": {
+            "engine": "native",
+            "parallel": "4",
+        }
+    }
+
+
+def check_run(run):
+    jobs = {}
+    for pipe in run["pipelines"]:
+        for stage in pipe["ci_stages"]:
+            for job in stage["jobs"]:
+                jobs[job["wrapper_arguments"]["description"]] = job
+
+    return all((
+        all(job["complete"] for job in jobs.values()),
+        jobs["first"]["stdout"] == ["first"],
+        jobs["second"]["stdout"] == ["second"],
+        jobs["first"]["end_time"] <= jobs["second"]["start_time"],
+        any((
+            jobs["pool-1"]["end_time"] <= jobs["pool-2"]["start_time"],
+            jobs["pool-2"]["end_time"] <= jobs["pool-1"]["start_time"],
+        )),
+        run["parallelism"]["compact_trace"]["finished"][-1] == 4,
+    ))
@@ -0,0 +1,58 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+SLOW = False
+PHONY_ADD_JOBS = True
+
+def get_init_args():
+    return {
+        "kwargs": {
+            "project": "foo",
+            "job-store": "sqlite",
+        }
+    }
+
+
+def get_jobs():
+    return [{
+        "kwargs": {
+            "command": "echo foo",
+            "ci-stage": "build",
+            "pipeline": "foo",
+        }
+    }, {
+        "kwargs": {
+            "command": "echo baz",
+            "ci-stage": "test",
+            "pipeline": "foo",
+        }
+    }]
+
+
+def transform_jobs(jobs):
+    new_jobs = [j for j in jobs if j["command"] == "echo foo"]
+    new_jobs[0]["command"] = "echo bar"
+    return new_jobs
+
+
+def get_run_build_args():
+    return {}
+
+
+def check_run(run):
+    jobs = [
+        job
+        for stage in run["pipelines"][0]["ci_stages"]
+        for job in stage["jobs"]]
+    return len(jobs) == 1 and jobs[0]["stdout"][0].strip() == "bar"
@@ -0,0 +1,135 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import asyncio
+import datetime
+import pathlib
+import tempfile
+import unittest
+
+import lib.adaptive_parallelism
+
+
+Sample = lib.adaptive_parallelism.Sample
+
+
+def make_controller(**kwargs):
+    return lib.adaptive_parallelism.Controller(
+        **{"min_jobs": 1, "max_jobs": 8, "n_proc": 4, **kwargs})
+
+
+
+class TestSample(unittest.TestCase):
+    def test_read(self):
+        with tempfile.TemporaryDirectory(prefix="litani-test") as tmp:
+            proc = pathlib.Path(tmp)
+            (proc / "loadavg").write_text("3.50 2.00 1.00 4/300 1234\n")
+            (proc / "pressure").mkdir()
+            (proc / "pressure" / "cpu").write_text(
+                "some avg10=12.50 avg60=3.00 avg300=1.00 total=100\n"
+                "full avg10=0.00 avg60=0.00 avg300=0.00 total=0\n")
+            (proc / "meminfo").write_text(
+                "MemTotal:        1000 kB\n"
+                "MemFree:          100 kB\n"
+                "MemAvailable:     250 kB\n")
+            sample = Sample.read(proc)
+        self.assertEqual(sample, Sample(
+            load=3.5, cpu_pressure=12.5, memory_pressure=None,
+            mem_available=250 * 1024, mem_total=1000 * 1024))
+        self.assertEqual(sample.get_available_fraction(), 0.25)
+
+
+    def test_nothing_to_read(self):
+        with tempfile.TemporaryDirectory(prefix="litani-test") as tmp:
+            self.assertEqual(Sample.read(pathlib.Path(tmp)), Sample())
+
+
+
+class TestController(unittest.TestCase):
+    def test_initial_limit(self):
+        self.assertEqual(make_controller().limit, 4)
+        self.assertEqual(make_controller(max_jobs=2).limit, 2)
+        self.assertEqual(make_controller(min_jobs=6).limit, 6)
+
+
+    def test_memory_pressure_halves(self):
+        controller = make_controller(limit=6)
+        self.assertTrue(controller.adjust(Sample(
+            cpu_pressure=0.0, memory_pressure=25.0)))
+        self.assertEqual(controller.limit, 3)
+        self.assertTrue(controller.adjust(Sample(
+            mem_available=5, mem_total=100)))
+        self.assertEqual(controller.limit, 1)
+        # Never below the minimum
+        self.assertFalse(controller.adjust(Sample(memory_pressure=25.0)))
+        self.assertEqual(
+            [a["reason"] for a in controller.adjustments],
+            ["memory pressure", "low available memory"])
+
+
+    def test_cpu(self):
+        controller = make_controller()
+        self.assertTrue(controller.adjust(Sample(cpu_pressure=60.0)))
+        self.assertEqual(controller.limit, 3)
+
+        # Only add a slot if all of them are in use and jobs are waiting
+        self.assertFalse(controller.adjust(Sample(cpu_pressure=1.0)))
+        controller.running, controller.waiting = 3, 2
+        self.assertTrue(controller.adjust(Sample(cpu_pressure=1.0)))
+        self.assertEqual(controller.limit, 4)
+
+        # Without PSI, use the load average per processor
+        self.assertTrue(controller.adjust(Sample(load=8.0)))
+        self.assertEqual(controller.limit, 3)
+        self.assertEqual(
+            [a["reason"] for a in controller.adjustments],
+            ["CPU pressure", "spare CPU", "high load"])
+
+
+    def test_slots_follow_limit(self):
+        async def run():
+            controller = make_controller(limit=1)
+            started = []
+
+            async def job(idx):
+                async with controller:
+                    started.append(idx)
+                    await asyncio.sleep(0.05)
+
+            jobs = [asyncio.create_task(job(idx)) for idx in range(3)]
+            await asyncio.sleep(0.01)
+            self.assertEqual(started, [0])
+
+            controller.limit = 3
+            async with controller._condition:
+                controller._condition.notify_all()
+            await asyncio.sleep(0.01)
+            self.assertEqual(started, [0, 1, 2])
+            await asyncio.gather(*jobs)
+            self.assertEqual(controller.running, 0)
+
+        asyncio.run(run())
+
+
+    def test_get_limits(self):
+        controller = make_controller()
+        start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        controller.adjust(
+            Sample(cpu_pressure=60.0), start + datetime.timedelta(seconds=10))
+        controller.adjust(
+            Sample(memory_pressure=50.0),
+            start + datetime.timedelta(seconds=20))
+        times = [start.timestamp() + s for s in (0, 10, 15, 25)]
+        self.assertEqual(lib.adaptive_parallelism.get_limits(
+            controller.encode(), times), [4, 3, 3, 1])
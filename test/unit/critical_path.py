@@ -0,0 +1,95 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import unittest
+
+import lib.critical_path
+
+
+def make_job(name, seconds, inputs=None, outputs=None, pipeline="foo"):
+    return {
+        "complete": True,
+        "duration_ms": f"{seconds}.0",
+        "start_time": "2022-01-01T00:00:00Z",
+        "end_time": "2022-01-01T00:00:%02dZ" % seconds,
+        "wrapper_arguments": {
+            "job_id": name,
+            "description": name,
+            "pipeline_name": pipeline,
+            "ci_stage": "build",
+            "inputs": inputs,
+            "outputs": outputs,
+            "status_file": f"/status/{name}.json",
+        },
+    }
+
+
+def make_run(jobs):
+    return {"pipelines": [{"ci_stages": [{"jobs": jobs}]}]}
+
+
+
+class TestCriticalPath(unittest.TestCase):
+    def test_longest_path_and_slack(self):
+        #   a (5) -> b (10) -> d (1)
+        #   a (5) -> c (2)  -> d (1)
+        #   e (3)
+        analysis = lib.critical_path.analyze(make_run([
+            make_job("d", 1, inputs=["b.out", "c.out"]),
+            make_job("b", 10, inputs=["a.out"], outputs=["b.out"]),
+            make_job("c", 2, inputs=["a.out"], outputs=["c.out"]),
+            make_job("a", 5, outputs=["a.out"]),
+            make_job("e", 3),
+        ]), top=3)
+
+        self.assertEqual(analysis["critical_path_duration"], 16)
+        self.assertEqual(
+            [j["job_id"] for j in analysis["critical_path"]], ["a", "b", "d"])
+        self.assertEqual(
+            [j["job_id"] for j in analysis["top_jobs"]], ["b", "a", "d"])
+
+        slack = {j["job_id"]: j["slack"] for j in analysis["critical_path"]}
+        self.assertEqual(slack, {"a": 0, "b": 0, "d": 0})
+
+        everything = lib.critical_path.analyze(make_run([
+            make_job("b", 10, inputs=["a.out"], outputs=["b.out"]),
+            make_job("c", 2, inputs=["a.out"], outputs=["c.out"]),
+            make_job("a", 5, outputs=["a.out"]),
+            make_job("e", 3),
+        ]), top=10)
+        slack = {j["job_id"]: j["slack"] for j in everything["top_jobs"]}
+        self.assertEqual(slack["c"], 8)
+        self.assertEqual(slack["e"], 12)
+
+
+    def test_status_file_dependency(self):
+        analysis = lib.critical_path.analyze(make_run([
+            make_job("b", 2, inputs=["/status/a.json"]),
+            make_job("a", 3),
+        ]))
+        self.assertEqual(analysis["critical_path_duration"], 5)
+
+
+    def test_duration_ms_format(self):
+        job = make_job("a", 1)
+        job["duration_ms"] = "2.5000"
+        self.assertAlmostEqual(lib.critical_path.get_duration(job), 2.005)
+        job["complete"] = False
+        self.assertEqual(lib.critical_path.get_duration(job), 0)
+
+
+    def test_empty_run(self):
+        analysis = lib.critical_path.analyze(make_run([]))
+        self.assertEqual(analysis["critical_path"], [])
+        self.assertEqual(analysis["critical_path_duration"], 0)
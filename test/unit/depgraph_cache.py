@@ -0,0 +1,116 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import os
+import pathlib
+import tempfile
+import unittest
+import unittest.mock
+
+import lib.litani
+import lib.litani_report
+
+
+
+class TestDepgraphCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="litani-test")
+        self.cache_dir = pathlib.Path(self.temp_dir.name)
+        lib.litani.CacheDir.cache_dir_path = self.cache_dir
+
+        # A stand-in for Graphviz that 'renders' the DOT text as-is
+        bin_dir = self.cache_dir / "bin"
+        bin_dir.mkdir()
+        dot = bin_dir / "dot"
+        with open(dot, "w") as handle:
+            print("#!/bin/sh\ncat", file=handle)
+        os.chmod(dot, 0o755)
+        self.path = unittest.mock.patch.dict(os.environ, {
+            "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}"})
+        self.path.start()
+
+        self.pipes = [self.make_pipe(name) for name in ("foo", "bar", "baz")]
+        self.renderer = lib.litani_report.PipelineDepgraphRenderer()
+
+
+    def tearDown(self):
+        self.path.stop()
+        lib.litani.CacheDir.cache_dir_path = None
+        self.temp_dir.cleanup()
+
+
+    @staticmethod
+    def make_pipe(name):
+        return {
+            "name": name,
+            "ci_stages": [{
+                "jobs": [{
+                    "complete": False,
+                    "wrapper_arguments": {
+                        "pipeline_name": name,
+                        "description": f"{name} job",
+                        "command": f"make {name}",
+                        "inputs": [f"{name}.c"],
+                        "outputs": [f"{name}.o"],
+                    },
+                }],
+            }],
+        }
+
+
+    def prerender(self):
+        with unittest.mock.patch.object(
+                self.renderer, "render_to_file",
+                wraps=self.renderer.render_to_file) as render_to_file:
+            self.renderer.prerender(self.pipes)
+        return render_to_file.call_count
+
+
+    def cached_files(self):
+        return sorted(self.renderer.get_svg_cache_dir().iterdir())
+
+
+    def test_dot_only_runs_for_changed_graphs(self):
+        self.assertEqual(self.prerender(), 3)
+        self.assertEqual(len(self.cached_files()), 3)
+        self.assertEqual(self.prerender(), 0)
+
+        job = self.pipes[1]["ci_stages"][0]["jobs"][0]
+        job["complete"] = True
+        job["outcome"] = "success"
+        self.assertEqual(self.prerender(), 1)
+        self.assertEqual(self.prerender(), 0)
+
+
+    def test_stale_graphs_removed(self):
+        self.prerender()
+        before = self.cached_files()
+        job = self.pipes[0]["ci_stages"][0]["jobs"][0]
+        job["start_time"] = "2023-01-01T00:00:00Z"
+        self.prerender()
+        after = self.cached_files()
+        self.assertEqual(len(after), 3)
+        self.assertEqual(len(set(before) - set(after)), 1)
+
+
+    def test_render_links_cached_graph(self):
+        render_root = self.cache_dir / "html"
+        self.renderer.prerender(self.pipes)
+        for pipe in self.pipes:
+            self.renderer.render(
+                render_root, pathlib.Path("pipelines") / pipe["name"], pipe)
+            self.assertEqual(pipe["dependencies_url"], "dependencies.svg")
+            with open(render_root / "pipelines" / pipe["name"] /
+                    "dependencies.svg") as handle:
+                self.assertIn(f"make {pipe['name']}", handle.read())
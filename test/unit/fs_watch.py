@@ -0,0 +1,129 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import lib.fs_watch
+import lib.render
+
+
+
+class _WatcherTests:
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="litani-test")
+        self.root = pathlib.Path(self.temp_dir.name)
+        (self.root / "status").mkdir()
+        (self.root / "artifacts" / "job").mkdir(parents=True)
+        self.watcher = self.make_watcher(
+            [self.root / "status", self.root / "artifacts"])
+
+
+    def tearDown(self):
+        self.watcher.close()
+        self.temp_dir.cleanup()
+
+
+    def test_no_change(self):
+        self.assertFalse(self.watcher.wait(0.1))
+
+
+    def test_new_file(self):
+        (self.root / "status" / "job.json").write_text("{}")
+        self.assertTrue(self.watcher.wait(2))
+        self.assertFalse(self.watcher.wait(0.1))
+
+
+    def test_file_in_subdirectory(self):
+        (self.root / "artifacts" / "job" / "out.txt").write_text("hello")
+        self.assertTrue(self.watcher.wait(2))
+
+
+    def test_file_in_new_subdirectory(self):
+        new_dir = self.root / "artifacts" / "new"
+        new_dir.mkdir()
+        self.assertTrue(self.watcher.wait(2))
+        self.assertFalse(self.watcher.wait(0.1))
+
+        (new_dir / "out.txt").write_text("hello")
+        self.assertTrue(self.watcher.wait(2))
+
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux-only")
+class TestInotifyWatcher(_WatcherTests, unittest.TestCase):
+    @staticmethod
+    def make_watcher(dirs):
+        return lib.fs_watch.InotifyWatcher(dirs)
+
+
+
+class TestPollingWatcher(_WatcherTests, unittest.TestCase):
+    @staticmethod
+    def make_watcher(dirs):
+        return lib.fs_watch.PollingWatcher(dirs, interval=0.05)
+
+
+
+class TestWaitForChanges(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="litani-test")
+        self.root = pathlib.Path(self.temp_dir.name)
+        self.watcher = lib.fs_watch.make_watcher([self.root])
+        self.killer = threading.Event()
+
+
+    def tearDown(self):
+        self.watcher.close()
+        self.temp_dir.cleanup()
+
+
+    def test_returns_when_killed(self):
+        timer = threading.Timer(0.1, self.killer.set)
+        timer.start()
+        start = time.monotonic()
+        lib.render.wait_for_changes(
+            self.watcher, self.killer, lib.render.RenderSchedule(),
+            time.monotonic())
+        self.assertLess(time.monotonic() - start, 1)
+
+
+    def test_waits_for_min_interval(self):
+        schedule = lib.render.RenderSchedule(debounce=0, min_interval=0.5)
+        last_render = time.monotonic()
+        (self.root / "file").write_text("hello")
+        lib.render.wait_for_changes(
+            self.watcher, self.killer, schedule, last_render)
+        self.assertGreaterEqual(time.monotonic() - last_render, 0.5)
+
+
+    def test_coalesces_burst(self):
+        schedule = lib.render.RenderSchedule(debounce=0.3, min_interval=0)
+
+        def burst():
+            for idx in range(5):
+                (self.root / f"file-{idx}").write_text("hello")
+                time.sleep(0.02)
+
+        writer = threading.Thread(target=burst)
+        writer.start()
+        lib.render.wait_for_changes(
+            self.watcher, self.killer, schedule, time.monotonic())
+        writer.join()
+        # The whole burst was absorbed by the wait
+        self.assertFalse(self.watcher.wait(0.1))
@@ -0,0 +1,144 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import os
+import pathlib
+import tempfile
+import unittest
+
+import lib.job_history
+import lib.run_build
+
+
+def make_job(name, inputs=None, outputs=None, pool=None):
+    return {
+        "job_id": name,
+        "command": f"run {name}",
+        "description": name,
+        "pipeline_name": "foo",
+        "ci_stage": "build",
+        "inputs": inputs,
+        "outputs": outputs,
+        "pool": pool,
+        "status_file": f"/status/{name}.json",
+    }
+
+
+def make_status(job, seconds):
+    return {
+        "complete": True,
+        "duration_ms": f"{seconds}.0",
+        "wrapper_arguments": job,
+    }
+
+
+
+class TestJobHistory(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="litani-test")
+        self.path = pathlib.Path(self.temp_dir.name) / "history.json"
+
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+    def record(self, durations):
+        history = lib.job_history.JobHistory.load(self.path)
+        lib.job_history.record_jobs(history, [
+            make_status(job, seconds) for job, seconds in durations])
+        history.save()
+        return lib.job_history.JobHistory.load(self.path)
+
+
+    def test_identity_survives_new_job_ids(self):
+        history = self.record([(make_job("a"), 10)])
+        job = make_job("a")
+        job["job_id"] = "another-id"
+        self.assertEqual(history.get_duration(job), 10)
+        self.assertIsNone(history.get_duration(make_job("b")))
+
+        history = self.record([(make_job("a"), 20)])
+        self.assertEqual(history.get_duration(job), 15)
+
+
+    def test_expected_memory_from_peak(self):
+        history = lib.job_history.JobHistory.load(self.path)
+        traced = make_status(make_job("traced"), 1)
+        traced["memory_trace"] = {"peak": {"rss": 100, "vsz": 200}}
+        traced["resource_usage"] = {"max_rss": 150}
+        untraced = make_status(make_job("untraced"), 1)
+        untraced["resource_usage"] = {"max_rss": 300}
+        lib.job_history.record_jobs(history, [traced, untraced])
+
+        jobs = [
+            make_job("traced"), make_job("untraced"), make_job("new"),
+            {**make_job("given"), "expected_memory": 5}]
+        history.fill_expected_memory(jobs)
+        self.assertEqual(
+            [job["expected_memory"] for job in jobs], [100, 300, None, 5])
+
+
+    def test_longest_chains_first(self):
+        #   short (1) -> tail (50)
+        #   long (20)
+        #   new (never ran)
+        jobs = [
+            make_job("long"),
+            make_job("new"),
+            make_job("tail", inputs=["short.out"]),
+            make_job("short", outputs=["short.out"]),
+        ]
+        history = self.record([
+            (jobs[0], 20), (jobs[2], 50), (jobs[3], 1)])
+
+        ordered = history.order_jobs(jobs)
+        self.assertEqual(
+            [j["job_id"] for j in ordered], ["short", "tail", "long", "new"])
+        self.assertEqual(history.get_long_jobs(jobs, 2), {"tail", "long"})
+
+
+    def test_default_path_per_project(self):
+        paths = {
+            lib.job_history.get_default_path(project)
+            for project in ("foo", "bar", "foo/bar", "foo_bar")}
+        self.assertEqual(len(paths), 4)
+        for path in paths:
+            self.assertEqual(path.parent.name, "job-history")
+            self.assertEqual(
+                path.parent.parent.name, f"litani-{os.getuid()}")
+
+
+    def test_unreadable_history(self):
+        self.path.write_text("not json")
+        with self.assertLogs(level="WARNING"):
+            history = lib.job_history.JobHistory.load(self.path)
+        self.assertEqual(history.jobs, {})
+
+
+    def test_reserved_slots(self):
+        cache = {
+            "pools": {"mine": 1},
+            "jobs": [make_job("a"), make_job("b"), make_job("c", pool="mine")],
+        }
+        rules, builds, pools = [], [], {}
+        lib.run_build.fill_out_ninja(
+            cache, rules, builds, pools, {}, long_jobs={"a"}, parallelism=4)
+        self.assertEqual(pools[lib.job_history.UNRESERVED_POOL], 3)
+        job_pools = {rule["name"]: rule.get("pool") for rule in rules}
+        self.assertEqual(job_pools, {
+            "a": None,
+            "b": lib.job_history.UNRESERVED_POOL,
+            "c": "mine",
+        })
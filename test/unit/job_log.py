@@ -0,0 +1,103 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import asyncio
+import pathlib
+import tempfile
+import unittest
+
+import lib.job_log
+import lib.process
+import lib.snapshot
+
+
+
+class TestJobLog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="litani-test")
+        self.cache_dir = pathlib.Path(self.temp_dir.name)
+
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+    def run_job(self, command, compression, interleave=False):
+        paths = [
+            lib.job_log.log_path("job", stream, compression)
+            for stream in ("stdout", "stderr")]
+        run = lib.process.Runner(
+            command, interleave, None, None, False, 1, "job",
+            output_limit=100,
+            log_files=[self.cache_dir / p for p in paths],
+            log_compression=compression)
+        asyncio.run(run())
+        return run, paths
+
+
+    def test_round_trip(self):
+        for compression in lib.job_log.COMPRESSIONS:
+            run, paths = self.run_job(
+                "seq 1000; printf 'no newline' >&2", compression)
+
+            size, lines = run.get_output_stats(0)
+            reference = lib.job_log.log_reference(
+                paths[0], compression, size, lines)
+            expected = "".join("%d\n" % i for i in range(1, 1001))
+            self.assertEqual(
+                lib.job_log.read_log(reference, self.cache_dir), expected)
+            self.assertEqual((size, lines), (len(expected), 1000))
+
+            size, lines = run.get_output_stats(1)
+            reference = lib.job_log.log_reference(
+                paths[1], compression, size, lines)
+            self.assertEqual(
+                lib.job_log.read_log(reference, self.cache_dir), "no newline")
+            self.assertEqual((size, lines), (10, 1))
+
+            # Only the bounded capture is kept in memory
+            self.assertLess(len(run.get_stdout()), 1000)
+
+
+    def test_log_paths(self):
+        self.assertEqual(
+            lib.job_log.log_path("abc", "stdout", "none"), "logs/abc.stdout")
+        self.assertEqual(
+            lib.job_log.log_path("abc", "stderr", "gzip"),
+            "logs/abc.stderr.gz")
+        self.assertEqual(
+            lib.job_log.log_path("abc", "stdout", "lzma"),
+            "logs/abc.stdout.xz")
+
+
+    def test_excerpt(self):
+        lines = [str(i) for i in range(100)]
+        excerpt = lib.job_log.excerpt(lines)
+        self.assertEqual(len(excerpt), lib.job_log.EXCERPT_LINES)
+        self.assertEqual(excerpt[-1], "99")
+        self.assertEqual(lib.job_log.excerpt(["a"]), ["a"])
+
+
+    def test_snapshot_skips_partial_logs(self):
+        logs = self.cache_dir / "logs"
+        logs.mkdir()
+        (logs / "done.stdout").write_text("done")
+        (logs / "running.stdout~1234").write_text("partial")
+
+        snapshotter = lib.snapshot.Snapshotter(
+            exclude=lib.job_log.is_partial)
+        snapshotter.snapshot(logs, self.cache_dir / "report")
+        self.assertEqual(
+            [p.name for p in (self.cache_dir / "report").iterdir()],
+            ["done.stdout"])
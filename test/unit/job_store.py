@@ -0,0 +1,117 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import multiprocessing
+import pathlib
+import tempfile
+import unittest
+
+import lib.job_store
+
+
+def make_job(idx, pipeline_name="foo", ci_stage="build"):
+    return {
+        "job_id": f"job-{idx}",
+        "pipeline_name": pipeline_name,
+        "ci_stage": ci_stage,
+        "command": f"echo {idx}",
+    }
+
+
+def add_jobs(cache_dir, first, count):
+    store = lib.job_store.get_job_store(pathlib.Path(cache_dir))
+    for idx in range(first, first + count):
+        store.add(make_job(idx))
+
+
+
+class _JobStoreTests:
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="litani-test")
+        self.cache_dir = pathlib.Path(self.temp_dir.name)
+        lib.job_store.create_job_store(self.cache_dir, self.KIND)
+        self.store = lib.job_store.get_job_store(self.cache_dir)
+
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+    def test_empty(self):
+        self.assertFalse(self.store.exists())
+
+
+    def test_add_and_get(self):
+        jobs = [make_job(idx) for idx in range(10)]
+        self.store.add(jobs[0])
+        self.store.add_many(jobs[1:])
+        self.assertTrue(self.store.exists())
+        self.assertEqual(
+            sorted(self.store.get_all(), key=lambda j: j["job_id"]),
+            sorted(jobs, key=lambda j: j["job_id"]))
+
+
+    def test_delete_all(self):
+        self.store.add_many([make_job(idx) for idx in range(3)])
+        self.store.delete_all()
+        self.assertEqual(self.store.get_all(), [])
+        self.assertTrue(self.store.exists())
+
+
+
+class TestFileJobStore(_JobStoreTests, unittest.TestCase):
+    KIND = "files"
+
+
+
+class TestSqliteJobStore(_JobStoreTests, unittest.TestCase):
+    KIND = "sqlite"
+
+
+    def test_is_sqlite(self):
+        self.assertIsInstance(self.store, lib.job_store.SqliteJobStore)
+
+
+    def test_insertion_order_and_indexes(self):
+        self.store.add_many([
+            make_job(0, "foo", "build"), make_job(1, "bar", "build"),
+            make_job(2, "foo", "test"), make_job(3, "foo", "build")])
+        self.assertEqual(
+            [j["job_id"] for j in self.store.get_all()],
+            ["job-0", "job-1", "job-2", "job-3"])
+        self.assertEqual(
+            [j["job_id"] for j in self.store.get_all(pipeline_name="foo")],
+            ["job-0", "job-2", "job-3"])
+        self.assertEqual(
+            [j["job_id"] for j in self.store.get_all(
+                pipeline_name="foo", ci_stage="build")],
+            ["job-0", "job-3"])
+        self.assertEqual(self.store.get("job-1")["pipeline_name"], "bar")
+        self.assertIsNone(self.store.get("job-4"))
+
+
+    def test_concurrent_writers(self):
+        n_procs, per_proc = 8, 25
+        procs = [
+            multiprocessing.Process(
+                target=add_jobs, args=(self.cache_dir, i * per_proc, per_proc))
+            for i in range(n_procs)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+            self.assertEqual(proc.exitcode, 0)
+        self.assertEqual(
+            sorted(j["job_id"] for j in self.store.get_all()),
+            sorted(f"job-{i}" for i in range(n_procs * per_proc)))
@@ -0,0 +1,119 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import unittest
+
+import lib.jobs
+
+
+
+class TestJobValidator(unittest.TestCase):
+    def setUp(self):
+        self.validator = lib.jobs.JobValidator()
+
+
+    def test_same_as_add_job_parser(self):
+        for job in [{
+                "command": "true",
+                "pipeline_name": "foo",
+                "ci_stage": "build",
+            }, {
+                "command": "make",
+                "pipeline_name": "foo",
+                "ci_stage": "test",
+                "inputs": ["a.c", "b.c"],
+                "outputs": ["a.o"],
+                "timeout": 30,
+                "timeout_ok": True,
+                "ok_returns": ["1", "2"],
+                "description": "compile",
+                "profile_memory": True,
+                "profile_memory_interval": 2,
+                "phony_outputs": ["a.o"],
+                "tags": ["stats-group:x"],
+        }]:
+            self.assertEqual(self.validator(job), lib.jobs.fill_job(job))
+
+
+    def test_dashes_and_conversions(self):
+        job = self.validator({
+            "command": "true",
+            "pipeline-name": "foo",
+            "ci-stage": "build",
+            "timeout": "10",
+            "ignore-returns": [3, 4],
+        })
+        self.assertEqual(job["pipeline_name"], "foo")
+        self.assertEqual(job["timeout"], 10)
+        self.assertEqual(job["ignore_returns"], ["3", "4"])
+
+
+    def test_expected_memory(self):
+        base = {"command": "true", "pipeline_name": "foo", "ci_stage": "build"}
+        for value, expected in [("30G", 30 << 30), (1000, 1000)]:
+            job = self.validator({**base, "expected_memory": value})
+            self.assertEqual(job["expected_memory"], expected)
+            self.assertEqual(job, lib.jobs.fill_job(
+                {**base, "expected_memory": value}))
+
+
+    def test_errors(self):
+        base = {"command": "true", "pipeline_name": "foo", "ci_stage": "build"}
+        for job, message in [
+                ([], "JSON object"),
+                ({"command": "true", "ci_stage": "build"}, "pipeline_name"),
+                ({**base, "colour": "red"}, "unknown field 'colour'"),
+                ({**base, "timeout": "soon"}, "integer"),
+                ({**base, "expected_memory": "lots"}, "memory size"),
+                ({**base, "timeout_ok": 1}, "true or false"),
+                ({**base, "inputs": "a.c"}, "must be a list"),
+                ({**base, "outputs": []}, "must not be empty"),
+                ({**base, "description": {"a": 1}}, "string or number"),
+        ]:
+            with self.assertRaisesRegex(ValueError, message):
+                self.validator(job)
+
+
+
+class TestJobFiller(unittest.TestCase):
+    def test_same_as_fill_job(self):
+        filler = lib.jobs.JobFiller()
+        base = {"command": "true", "pipeline_name": "foo", "ci_stage": "build"}
+        for job in [base, {
+                **base,
+                "inputs": ["a.c", 3],
+                "outputs": "a.o",
+                "timeout": "30",
+                "timeout_ok": True,
+                "timeout_ignore": False,
+                "description": 12,
+                "profile_memory_interval": 2,
+                "phony_outputs": [],
+                "tags": None,
+            }, {
+                # Fields that get-jobs prints but that add-job does not take
+                **base, "verbose": False, "very_verbose": True, "aux": [1],
+            }, {
+                # Cases where parsing rules matter
+                **base, "note": "--timeout-ok",
+            }, {
+                **base, "pipeline": "bar", "ci-stage": "test",
+            }, {
+                **base, "timeout": -5, "cwd": ["a", "b"],
+            }, {
+                **base, "timeout_ok": "yes",
+        }]:
+            self.assertEqual(
+                list(filler(dict(job)).items()),
+                list(lib.jobs.fill_job(dict(job)).items()))
@@ -0,0 +1,100 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import argparse
+import json
+import pathlib
+import subprocess
+import tempfile
+import unittest
+import unittest.mock
+
+import lib.memory_budget
+import lib.util
+
+
+
+class TestLedger(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="litani-test")
+        self.ledger = lib.memory_budget.Ledger(
+            pathlib.Path(self.temp_dir.name) / "ledger.json")
+
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+    def test_jobs_fit_in_budget(self):
+        self.assertTrue(self.ledger.try_reserve("a", 6, 10))
+        self.assertTrue(self.ledger.try_reserve("b", 4, 10))
+        self.assertFalse(self.ledger.try_reserve("c", 1, 10))
+
+        self.ledger.release("a")
+        self.assertTrue(self.ledger.try_reserve("c", 1, 10))
+
+
+    def test_oversized_job_runs_alone(self):
+        self.assertTrue(self.ledger.try_reserve("small", 1, 10))
+        self.assertFalse(self.ledger.try_reserve("huge", 20, 10))
+        self.ledger.release("small")
+        self.assertTrue(self.ledger.try_reserve("huge", 20, 10))
+        self.assertFalse(self.ledger.try_reserve("small", 1, 10))
+
+
+    def test_older_waiter_is_not_starved(self):
+        self.assertTrue(self.ledger.try_reserve("a", 6, 10))
+        self.assertFalse(self.ledger.try_reserve("big", 8, 10))
+        # Fits alongside a, but would delay big
+        self.assertFalse(self.ledger.try_reserve("small", 3, 10))
+
+        self.ledger.release("a")
+        self.assertTrue(self.ledger.try_reserve("big", 8, 10))
+        self.assertFalse(self.ledger.try_reserve("small", 3, 10))
+
+
+    def test_fallback_to_user_ledger(self):
+        blocker = pathlib.Path(self.temp_dir.name) / "not-a-directory"
+        blocker.write_text("")
+        user_path = pathlib.Path(self.temp_dir.name) / "user" / "ledger.json"
+        ledger = lib.memory_budget.Ledger(blocker / "ledger.json")
+        with unittest.mock.patch(
+                "lib.memory_budget.get_user_path", return_value=user_path):
+            self.assertTrue(ledger.try_reserve("a", 1, 10))
+        self.assertEqual(ledger.path, user_path)
+        self.assertIn("a", json.loads(user_path.read_text()))
+
+
+    def test_dead_processes_are_dropped(self):
+        proc = subprocess.Popen(["true"])
+        proc.wait()
+        self.ledger.path.write_text(json.dumps({"dead": {
+            "pid": proc.pid, "size": 10, "since": 0, "reserved": True,
+        }}))
+        self.assertTrue(self.ledger.try_reserve("a", 10, 10))
+
+
+
+class TestMemorySize(unittest.TestCase):
+    def test_units(self):
+        self.assertEqual(lib.util.memory_size("1024"), 1024)
+        self.assertEqual(lib.util.memory_size("512M"), 512 << 20)
+        self.assertEqual(lib.util.memory_size("30GiB"), 30 << 30)
+        self.assertEqual(lib.util.memory_size("1.5k"), 1536)
+
+
+    def test_invalid(self):
+        for arg in ("", "lots", "5X", "-1G"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                lib.util.memory_size(arg)
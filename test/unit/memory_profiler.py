@@ -0,0 +1,66 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import asyncio
+import os
+import pathlib
+import tempfile
+import unittest
+
+import lib.process
+
+
+# pylint: disable=protected-access
+
+
+def write_process(proc_dir, pid, ppid, rss_kb, vsz_kb, hwm_kb, comm="sh"):
+    process_dir = proc_dir / str(pid)
+    process_dir.mkdir()
+    (process_dir / "stat").write_text(
+        f"{pid} ({comm}) S {ppid} {pid} {pid} 0 -1 4194560 100 0 0 0\n")
+    (process_dir / "status").write_text(
+        f"Name:\t{comm}\nPPid:\t{ppid}\nVmPeak:\t{vsz_kb * 2} kB\n"
+        f"VmSize:\t{vsz_kb} kB\nVmHWM:\t{hwm_kb} kB\nVmRSS:\t{rss_kb} kB\n")
+
+
+
+class TestLinuxMemoryProfiler(unittest.TestCase):
+    def test_sums_only_the_process_tree(self):
+        with tempfile.TemporaryDirectory(prefix="litani-test") as tmp:
+            proc_dir = pathlib.Path(tmp)
+            (proc_dir / "self").mkdir()
+            write_process(proc_dir, 10, 1, 100, 1000, 150)
+            write_process(proc_dir, 11, 10, 10, 100, 20, comm="a) S 1 (b")
+            write_process(proc_dir, 12, 11, 1, 10, 2)
+            write_process(proc_dir, 20, 1, 5000, 5000, 5000)
+            # Exited between listing /proc and reading its status
+            (proc_dir / "13").mkdir()
+
+            profiler = lib.process._LinuxMemoryProfiler(str(proc_dir))
+            sample = asyncio.run(profiler.snapshot(10))
+            self.assertEqual(sample["rss"], 111 * 1024)
+            self.assertEqual(sample["vsz"], 1110 * 1024)
+            self.assertEqual(sample["hwm"], 172 * 1024)
+
+            peak = profiler.compute_peak([sample])
+            self.assertEqual(peak["human_readable_hwm"], "172.0 KiB")
+
+
+    @unittest.skipUnless(
+        os.path.exists("/proc/self/status"), "needs a Linux /proc")
+    def test_live_process(self):
+        profiler = lib.process._LinuxMemoryProfiler()
+        sample = asyncio.run(profiler.snapshot(os.getpid()))
+        self.assertGreater(sample["rss"], 0)
+        self.assertGreaterEqual(sample["hwm"], sample["rss"])
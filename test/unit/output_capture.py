@@ -0,0 +1,133 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import asyncio
+import io
+import pathlib
+import tempfile
+import unittest
+
+import lib.process
+
+
+# pylint: disable=protected-access
+
+
+class TestOutputCapture(unittest.TestCase):
+    def capture(self, chunks, limit):
+        handle = io.BytesIO()
+        capture = lib.process._OutputCapture(limit, [handle])
+        for chunk in chunks:
+            capture.write(chunk)
+        self.assertEqual(handle.getvalue(), b"".join(chunks))
+        return capture
+
+
+    def test_small_output_kept_whole(self):
+        chunks = [b"one\ntw", b"o\nthree\n"]
+        for limit in (0, 9, 100):
+            capture = self.capture(chunks, limit)
+            self.assertEqual(capture.get_output(), b"one\ntwo\nthree\n")
+
+
+    def test_no_limit(self):
+        chunks = [b"x" * 1000 + b"\n"] * 100
+        capture = self.capture(chunks, 0)
+        self.assertEqual(capture.get_output(), b"".join(chunks))
+
+
+    def test_head_and_tail_at_line_boundaries(self):
+        lines = [b"line %d\n" % i for i in range(1000)]
+        capture = self.capture(lines, 100)
+        output = capture.get_output().decode("utf-8").splitlines()
+
+        self.assertEqual(output[0], "line 0")
+        self.assertEqual(output[-1], "line 999")
+        note = [l for l in output if l.startswith("[litani:")]
+        self.assertEqual(len(note), 1)
+
+        kept = [l for l in output if not l.startswith("[litani:")]
+        omitted = int(note[0].split()[1])
+        self.assertEqual(
+            omitted + sum(len(l) + 1 for l in kept), sum(map(len, lines)))
+        self.assertTrue(set(kept) <= {l.decode()[:-1] for l in lines})
+
+
+    def test_memory_is_bounded(self):
+        capture = lib.process._OutputCapture(1000)
+        for _ in range(10000):
+            capture.write(b"y" * 99 + b"\n")
+        self.assertEqual(capture.size, 1000000)
+        self.assertLessEqual(len(capture.head) + len(capture.tail), 3000)
+
+
+    def test_single_long_line(self):
+        capture = self.capture([b"z" * 10000], 100)
+        output = capture.get_output()
+        self.assertTrue(output.startswith(b"z" * 100 + b"\n[litani: 9800 "))
+        self.assertTrue(output.endswith(b"\n" + b"z" * 100))
+
+
+
+class TestStreamingRunner(unittest.TestCase):
+    def test_file_has_all_output(self):
+        with tempfile.TemporaryDirectory(prefix="litani-test") as tmp:
+            out_file = pathlib.Path(tmp) / "out"
+            err_file = pathlib.Path(tmp) / "err"
+            run = lib.process.Runner(
+                "seq 100000; echo bad >&2", False, None, None, False, 1,
+                "job", stdout_file=str(out_file), stderr_file=str(err_file),
+                output_limit=1000)
+            asyncio.run(run())
+
+            expected = "".join("%d\n" % i for i in range(1, 100001)) + "\n"
+            self.assertEqual(out_file.read_text(), expected)
+            self.assertEqual(err_file.read_text(), "bad\n\n")
+
+            stdout = run.get_stdout().splitlines()
+            self.assertEqual(stdout[0], "1")
+            self.assertEqual(stdout[-1], "100000")
+            self.assertLess(len(stdout), 1000)
+            self.assertEqual(run.get_stderr(), "bad\n")
+            self.assertEqual(run.get_return_code(), 0)
+
+
+    def test_timeout(self):
+        run = lib.process.Runner(
+            "echo start; sleep 10", False, None, 1, False, 1, "job")
+        asyncio.run(run())
+        self.assertTrue(run.reached_timeout())
+        self.assertEqual(run.get_stdout(), "start\n")
+
+
+    def test_resource_usage(self):
+        run = lib.process.Runner(
+            "head -c 1000000 /dev/zero | cat > /dev/null; "
+            "python3 -c 'x = bytearray(50 * 1024 * 1024)'",
+            False, None, None, False, 1, "job")
+        asyncio.run(run())
+        self.assertEqual(run.get_return_code(), 0)
+        usage = run.get_resource_usage()
+        self.assertGreater(usage["max_rss"], 50 * 1024 * 1024)
+        self.assertGreater(usage["user_time"] + usage["system_time"], 0)
+        if usage["read_chars"] is not None:
+            # Includes the reads of the shell's children
+            self.assertGreaterEqual(usage["read_chars"], 1000000)
+
+
+    def test_signal_return_code(self):
+        run = lib.process.Runner(
+            "kill -9 $$", False, None, None, False, 1, "job")
+        asyncio.run(run())
+        self.assertEqual(run.get_return_code(), -9)
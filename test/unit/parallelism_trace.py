@@ -0,0 +1,87 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import datetime
+import json
+import unittest
+
+import lib.litani_report
+import lib.parallelism_trace
+
+
+START = datetime.datetime(2022, 3, 4, 5, 6, 7, 890000, datetime.timezone.utc)
+
+
+def at(milliseconds):
+    return START + datetime.timedelta(milliseconds=milliseconds)
+
+
+
+class TestParallelismTrace(unittest.TestCase):
+    def test_round_trip(self):
+        trace = lib.parallelism_trace.Trace()
+        trace.record(1, 0, 3, at(0))
+        trace.record(2, 0, 3, at(5))
+        trace.record(1, 1, 3, at(1500))
+        encoded = json.loads(json.dumps(trace.encode()))
+        self.assertEqual(encoded["offsets_ms"], [0, 5, 1500])
+
+        self.assertEqual(lib.parallelism_trace.decode(encoded), [{
+            "time": "2022-03-04T05:06:07.890000Z",
+            "running": 1, "finished": 0, "total": 3,
+        }, {
+            "time": "2022-03-04T05:06:07.895000Z",
+            "running": 2, "finished": 0, "total": 3,
+        }, {
+            "time": "2022-03-04T05:06:09.390000Z",
+            "running": 1, "finished": 1, "total": 3,
+        }])
+
+
+    def test_identical_states_coalesced(self):
+        trace = lib.parallelism_trace.Trace()
+        for i in range(100):
+            trace.record(2, 5, 10, at(i))
+        trace.record(1, 6, 10, at(200))
+        self.assertEqual(len(trace), 2)
+        self.assertEqual(trace.encode()["offsets_ms"], [0, 200])
+
+
+    def test_resolution_keeps_peaks(self):
+        trace = lib.parallelism_trace.Trace(resolution_ms=1000)
+        trace.record(1, 0, 10, at(0))
+        trace.record(4, 0, 10, at(100))
+        trace.record(2, 2, 10, at(900))
+        trace.record(3, 2, 10, at(1100))
+        encoded = trace.encode()
+        self.assertEqual(encoded["offsets_ms"], [0, 1000])
+        self.assertEqual(encoded["running"], [4, 3])
+        self.assertEqual(encoded["finished"], [2, 2])
+        self.assertEqual(trace.max_running, 4)
+
+
+    def test_graph_samples_per_second(self):
+        trace = lib.parallelism_trace.Trace()
+        trace.record(1, 0, 3, at(0))
+        trace.record(3, 0, 3, at(50))
+        trace.record(2, 1, 3, at(2000))
+        samples = lib.litani_report.ParallelismGraphRenderer.process_trace(
+            trace.encode())
+        self.assertEqual(samples, [{
+            "time": "2022-03-04T05:06:07Z",
+            "running": 3, "finished": 0, "total": 3,
+        }, {
+            "time": "2022-03-04T05:06:09Z",
+            "running": 2, "finished": 1, "total": 3,
+        }])
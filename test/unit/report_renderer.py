@@ -0,0 +1,120 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import json
+import pathlib
+import tempfile
+import unittest
+import unittest.mock
+
+import lib.litani
+import lib.litani_report
+import lib.run_model
+
+
+
+class TestReportRenderer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="litani-test")
+        self.cache_dir = pathlib.Path(self.temp_dir.name)
+        lib.litani.CacheDir.cache_dir_path = self.cache_dir
+        lib.litani.get_status_dir().mkdir()
+        lib.litani.get_artifacts_dir().mkdir()
+
+        self.jobs = []
+        for pipe in ("foo", "bar", "baz"):
+            self.jobs.append({
+                "job_id": f"{pipe}-job",
+                "pipeline_name": pipe,
+                "ci_stage": "build",
+                "command": f"echo {pipe}",
+                "description": f"{pipe} job",
+                "inputs": None,
+                "outputs": None,
+                "tags": None,
+            })
+        with lib.litani.atomic_write(
+                self.cache_dir / lib.litani.CACHE_FILE) as handle:
+            print(json.dumps({
+                "run_id": "run",
+                "project": "test",
+                "start_time": "2023-01-01T00:00:00Z",
+                "stages": ["build", "test", "report"],
+                "status": "in_progress",
+                "parallelism": {},
+                "jobs": self.jobs,
+            }), file=handle)
+
+        self.model = lib.run_model.RunModel(self.cache_dir)
+        self.renderer = lib.litani_report.ReportRenderer(
+            lib.litani.get_report_dir(),
+            lib.litani_report.PipelineDepgraphRenderer(should_render=False))
+
+
+    def tearDown(self):
+        lib.litani.CacheDir.cache_dir_path = None
+        self.temp_dir.cleanup()
+
+
+    def finish_job(self, idx):
+        job = self.jobs[idx]
+        status_file = lib.litani.get_status_dir() / f"{job['job_id']}.json"
+        with lib.litani.atomic_write(status_file) as handle:
+            print(json.dumps({
+                "wrapper_arguments": job,
+                "complete": True,
+                "start_time": "2023-01-01T00:00:01Z",
+                "end_time": "2023-01-01T00:00:02Z",
+                "outcome": "success",
+                "stdout": [],
+                "stderr": [],
+                "memory_trace": {},
+                "loaded_outcome_dict": None,
+            }), file=handle)
+
+
+    def render(self):
+        with unittest.mock.patch.object(
+                self.renderer, "render_pipeline",
+                wraps=self.renderer.render_pipeline) as render_pipeline:
+            self.renderer(self.model.get_run())
+        return sorted(
+            call.args[1]["name"] for call in render_pipeline.call_args_list)
+
+
+    def read_pipeline_page(self, pipe):
+        with open(self.cache_dir / "html" / "pipelines" / pipe /
+                "index.html") as handle:
+            return handle.read()
+
+
+    def test_first_render_renders_all(self):
+        self.assertEqual(self.render(), ["bar", "baz", "foo"])
+
+
+    def test_unchanged_pipelines_carried_over(self):
+        self.render()
+        self.assertEqual(self.render(), [])
+        for pipe in ("foo", "bar", "baz"):
+            self.assertIn(f"{pipe} job", self.read_pipeline_page(pipe))
+
+
+    def test_only_changed_pipeline_rendered(self):
+        self.render()
+        self.finish_job(1)
+        self.assertEqual(self.render(), ["bar"])
+        self.assertEqual(self.render(), [])
+        self.assertIn("Pipeline status: success", self.read_pipeline_page("bar"))
+        self.assertIn(
+            "Pipeline status: in_progress", self.read_pipeline_page("foo"))
@@ -0,0 +1,133 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import os
+import pathlib
+import tempfile
+import unittest
+
+import lib.job_log
+import lib.result_cache
+
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="litani-test")
+        self.root = pathlib.Path(self.temp_dir.name)
+        self.cache_dir = self.root / "cache"
+        self.status_dir = self.cache_dir / "status"
+        self.status_dir.mkdir(parents=True)
+        self.store = lib.result_cache.get_store(str(self.root / "store"))
+
+        self.input = self.root / "in.c"
+        self.input.write_text("int main() {}\n")
+        self.output = self.root / "out" / "a.out"
+        self.job = {
+            "job_id": "first",
+            "command": "cc in.c -o out/a.out",
+            "cwd": str(self.root),
+            "inputs": [str(self.input)],
+            "outputs": [str(self.output)],
+        }
+
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+    def get_key(self, job=None, env_vars=None):
+        return lib.result_cache.get_key(
+            job or self.job, env_vars, {}, self.status_dir)
+
+
+    def test_key_depends_on_input_contents(self):
+        key = self.get_key()
+        self.assertEqual(key, self.get_key())
+
+        os.utime(self.input, (0, 0))
+        self.assertEqual(key, self.get_key())
+
+        self.input.write_text("int main() { return 1; }\n")
+        self.assertNotEqual(key, self.get_key())
+
+
+    def test_key_depends_on_command_and_environment(self):
+        key = self.get_key()
+        self.assertNotEqual(
+            key, self.get_key({**self.job, "command": "cc -O2 in.c"}))
+        self.assertEqual(
+            key, self.get_key({**self.job, "job_id": "other"}))
+
+        os.environ["LITANI_TEST_VAR"] = "1"
+        try:
+            with_var = self.get_key(env_vars=["LITANI_TEST_VAR"])
+            os.environ["LITANI_TEST_VAR"] = "2"
+            self.assertNotEqual(
+                with_var, self.get_key(env_vars=["LITANI_TEST_VAR"]))
+        finally:
+            del os.environ["LITANI_TEST_VAR"]
+
+
+    def test_status_files_are_not_hashed(self):
+        status = self.status_dir / "dep.json"
+        status.write_text("{}")
+        job = {**self.job, "inputs": [str(status)]}
+        key = self.get_key(job)
+        status.write_text('{"complete": true}')
+        self.assertEqual(key, self.get_key(job))
+
+
+    def test_round_trip(self):
+        key = self.get_key()
+        self.assertIsNone(lib.result_cache.restore(
+            self.store, key, self.job, self.cache_dir))
+
+        self.output.parent.mkdir()
+        self.output.write_bytes(b"\x7fELF")
+        log = lib.job_log.log_path("first", "stdout", "none")
+        (self.cache_dir / "logs").mkdir()
+        (self.cache_dir / log).write_text("compiled\n")
+        status = {
+            "outcome": "success",
+            "stdout_log": lib.job_log.log_reference(log, "none", 9, 1),
+            "stderr_log": None,
+            "wrapper_arguments": self.job,
+        }
+        lib.result_cache.save(
+            self.store, key, self.job, status, self.cache_dir)
+
+        self.output.unlink()
+        job = {**self.job, "job_id": "second"}
+        restored = lib.result_cache.restore(
+            self.store, key, job, self.cache_dir)
+
+        self.assertEqual(self.output.read_bytes(), b"\x7fELF")
+        self.assertEqual(restored["outcome"], "success")
+        self.assertNotIn("wrapper_arguments", restored)
+        self.assertEqual(
+            restored["stdout_log"]["path"],
+            lib.job_log.log_path("second", "stdout", "none"))
+        self.assertEqual(
+            lib.job_log.read_log(restored["stdout_log"], self.cache_dir),
+            "compiled\n")
+
+
+    def test_store_must_implement_interface(self):
+        class Incomplete(lib.result_cache.Store):
+            def get(self, key, dest):
+                return False
+
+        with self.assertRaises(TypeError):
+            Incomplete()
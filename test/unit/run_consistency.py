@@ -12,6 +12,9 @@
 # permissions and limitations under the License.
 
 
+import json
+import pathlib
+import tempfile
 import unittest
 
 import lib.run_printer
@@ -176,3 +179,79 @@ class TestRunConsistency(unittest.TestCase):
 
         with self.assertRaises(lib.run_printer.InconsistentRunError):
             lib.run_printer.run_consistent_to_job(self.run, "job 2")
+
+
+
+    def get_index(self):
+        jobs = [
+            job["wrapper_arguments"]
+            for job in self.run["pipelines"][0]["ci_stages"][0]["jobs"]]
+        with tempfile.TemporaryDirectory(prefix="litani-test") as tmp:
+            path = lib.run_printer.get_index_path(
+                pathlib.Path(tmp) / "dumped-run.json")
+            lib.run_printer.RunIndex.from_jobs(jobs).write(self.run, path)
+            with open(path) as handle:
+                return json.load(handle)
+
+
+    def test_indexed(self):
+        self.add_jobs({
+            "complete": True,
+            "wrapper_arguments": {
+                "job_id": "job 1",
+                "outputs": ["foo"],
+                "inputs": None,
+        }}, {
+            "complete": False,
+            "wrapper_arguments": {
+                "job_id": "job 2",
+                "outputs": None,
+                "inputs": ["foo", "bar"],
+        }}, {
+            "complete": False,
+            "wrapper_arguments": {
+                "job_id": "job 3",
+                "outputs": ["bar"],
+                "inputs": None,
+        }})
+        index = self.get_index()
+        self.assertEqual(index["outputs"], {"foo": "job 1", "bar": "job 3"})
+        self.assertEqual(index["jobs"]["job 2"], {
+            "position": [0, 0, 1], "dependencies": ["job 1", "job 3"]})
+
+        with self.assertRaises(lib.run_printer.InconsistentRunError):
+            lib.run_printer.run_consistent_to_job(self.run, "job 2", index)
+        self.assertTrue(
+            lib.run_printer.run_consistent_to_job(self.run, "job 3", index))
+
+        self.run["pipelines"][0]["ci_stages"][0]["jobs"][2]["complete"] = True
+        self.assertTrue(
+            lib.run_printer.run_consistent_to_job(self.run, "job 2", index))
+
+        with self.assertRaises(lib.run_printer.InconsistentRunError):
+            lib.run_printer.run_consistent_to_job(self.run, "job 4", index)
+
+
+    def test_index_of_other_dump(self):
+        self.add_jobs({
+            "complete": False,
+            "wrapper_arguments": {
+                "job_id": "job 1",
+                "outputs": ["foo"],
+                "inputs": None,
+        }}, {
+            "complete": False,
+            "wrapper_arguments": {
+                "job_id": "job 2",
+                "outputs": None,
+                "inputs": ["foo"],
+        }})
+        index = self.get_index()
+        # Jobs move around as their pipelines' statuses change
+        self.run["pipelines"][0]["ci_stages"][0]["jobs"].reverse()
+
+        with self.assertRaises(lib.run_printer.InconsistentRunError):
+            lib.run_printer.run_consistent_to_job(self.run, "job 2", index)
+        self.run["pipelines"][0]["ci_stages"][0]["jobs"][1]["complete"] = True
+        self.assertTrue(
+            lib.run_printer.run_consistent_to_job(self.run, "job 2", index))
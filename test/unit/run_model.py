@@ -0,0 +1,154 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import json
+import pathlib
+import tempfile
+import unittest
+import unittest.mock
+
+import lib.litani
+import lib.litani_report
+import lib.run_model
+
+
+
+class TestRunModel(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="litani-test")
+        self.cache_dir = pathlib.Path(self.temp_dir.name)
+        lib.litani.CacheDir.cache_dir_path = self.cache_dir
+        lib.litani.get_status_dir().mkdir()
+
+        self.jobs = []
+        for pipe in ("foo", "bar"):
+            for stage, n_jobs in (("build", 3), ("test", 2)):
+                for idx in range(n_jobs):
+                    self.jobs.append(self.make_job(pipe, stage, idx))
+        self.write_cache()
+
+
+    def tearDown(self):
+        lib.litani.CacheDir.cache_dir_path = None
+        self.temp_dir.cleanup()
+
+
+    @staticmethod
+    def make_job(pipe, stage, idx):
+        return {
+            "job_id": f"{pipe}-{stage}-{idx}",
+            "pipeline_name": pipe,
+            "ci_stage": stage,
+            "command": "true",
+            "inputs": None,
+            "outputs": None,
+        }
+
+
+    def write_cache(self, **extra):
+        with lib.litani.atomic_write(
+                self.cache_dir / lib.litani.CACHE_FILE) as handle:
+            print(json.dumps({
+                "run_id": "run",
+                "stages": ["build", "test", "report"],
+                "status": "in_progress",
+                "jobs": self.jobs,
+                **extra,
+            }), file=handle)
+
+
+    def write_status(self, job_idx, start, end=None, outcome="success"):
+        job = self.jobs[job_idx]
+        status = {
+            "wrapper_arguments": job,
+            "complete": end is not None,
+            "start_time": start,
+        }
+        if end is not None:
+            status["end_time"] = end
+            status["outcome"] = outcome
+        status_file = lib.litani.get_status_dir() / f"{job['job_id']}.json"
+        with lib.litani.atomic_write(status_file) as handle:
+            print(json.dumps(status), file=handle)
+
+
+    def assert_same_as_full_read(self, model):
+        expected = lib.litani_report.get_run_data(self.cache_dir)
+        self.assertEqual(
+            json.dumps(expected, indent=2),
+            json.dumps(model.get_run(), indent=2))
+
+
+    def test_no_statuses(self):
+        model = lib.run_model.RunModel(self.cache_dir)
+        self.assert_same_as_full_read(model)
+
+
+    def test_incremental_updates(self):
+        model = lib.run_model.RunModel(self.cache_dir)
+        self.assert_same_as_full_read(model)
+
+        self.write_status(1, "2023-01-01T00:00:05Z")
+        self.write_status(0, "2023-01-01T00:00:05Z")
+        self.assert_same_as_full_read(model)
+
+        self.write_status(1, "2023-01-01T00:00:05Z", "2023-01-01T00:00:09Z")
+        self.write_status(7, "2023-01-01T00:00:01Z", "2023-01-01T00:00:03Z",
+            outcome="fail")
+        self.assert_same_as_full_read(model)
+
+        for idx in range(len(self.jobs)):
+            self.write_status(
+                idx, "2023-01-01T00:00:0%dZ" % (idx % 10),
+                "2023-01-01T00:01:00Z")
+        self.assert_same_as_full_read(model)
+
+        self.write_cache(end_time="2023-01-01T00:02:00Z")
+        self.assert_same_as_full_read(model)
+
+
+    def test_only_changed_statuses_reread(self):
+        model = lib.run_model.RunModel(self.cache_dir)
+        self.write_status(0, "2023-01-01T00:00:05Z")
+        self.write_status(4, "2023-01-01T00:00:05Z")
+        model.get_run()
+
+        self.write_status(4, "2023-01-01T00:00:05Z", "2023-01-01T00:00:07Z")
+        with unittest.mock.patch(
+                "lib.run_model.json.load", wraps=json.load) as load:
+            model.get_run()
+        self.assertEqual(load.call_count, 1)
+
+
+    def test_renderer_changes_do_not_leak(self):
+        model = lib.run_model.RunModel(self.cache_dir)
+        self.write_status(0, "2023-01-01T00:00:05Z", "2023-01-01T00:00:07Z")
+        run = model.get_run()
+        for pipe in run["pipelines"]:
+            pipe["dependencies_url"] = "dependencies.svg"
+            for stage in pipe["ci_stages"]:
+                for job in stage["jobs"]:
+                    job["memory_trace_preview"] = []
+        self.assert_same_as_full_read(model)
+
+
+    def test_new_jobs(self):
+        model = lib.run_model.RunModel(self.cache_dir)
+        self.write_status(0, "2023-01-01T00:00:05Z")
+        self.assert_same_as_full_read(model)
+
+        self.jobs.append(self.make_job("baz", "report", 0))
+        self.write_cache()
+        self.write_status(len(self.jobs) - 1, "2023-01-01T00:00:05Z")
+        self.assert_same_as_full_read(model)
@@ -0,0 +1,267 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import asyncio
+import functools
+import io
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+import lib.adaptive_parallelism
+import lib.exec
+import lib.memory_budget
+import lib.scheduler
+
+
+LITANI = pathlib.Path(__file__).resolve().parent.parent.parent / "litani"
+
+
+def make_job(name, inputs=None, outputs=None, pool=None, pipeline="foo"):
+    return {
+        "job_id": name,
+        "command": f"run {name}",
+        "description": name,
+        "pipeline_name": pipeline,
+        "ci_stage": "build",
+        "inputs": inputs,
+        "outputs": outputs,
+        "pool": pool,
+        "status_file": f"/status/{name}.json",
+    }
+
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.started = []
+        self.running = 0
+        self.max_running = 0
+        self.pool_running = 0
+        self.max_pool_running = 0
+        self.return_codes = {}
+        self.memory_reservations = {}
+
+
+    async def fake_run_job(self, args, memory_reservation=None):
+        self.started.append(args["job_id"])
+        self.memory_reservations[args["job_id"]] = memory_reservation
+        self.running += 1
+        self.max_running = max(self.running, self.max_running)
+        in_pool = args["pool"] is not None
+        if in_pool:
+            self.pool_running += 1
+            self.max_pool_running = max(
+                self.pool_running, self.max_pool_running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        if in_pool:
+            self.pool_running -= 1
+        return self.return_codes.get(args["job_id"], 0)
+
+
+    def run_jobs(
+            self, jobs, pools=None, parallelism="0", pipelines=None,
+            exec_options=None):
+        runner = lib.scheduler.Runner(
+            jobs, pools or {}, False, parallelism, pipelines, None,
+            exec_options or {})
+        with unittest.mock.patch.object(
+                lib.exec, "get_exec_args", lambda job: job), \
+                unittest.mock.patch.object(
+                    lib.exec, "run_job", self.fake_run_job), \
+                unittest.mock.patch("sys.stdout", new=io.StringIO()):
+            asyncio.run(runner.run())
+        return runner
+
+
+    def test_dependencies_run_first(self):
+        runner = self.run_jobs([
+            make_job("c", inputs=["b.out"]),
+            make_job("b", inputs=["a.out"], outputs=["b.out"]),
+            make_job("a", outputs=["a.out"]),
+        ])
+        self.assertEqual(self.started, ["a", "b", "c"])
+        self.assertTrue(runner.was_successful())
+        graph = runner.get_parallelism_graph()
+        self.assertEqual(graph["max_parallelism"], 1)
+        self.assertEqual(graph["compact_trace"]["finished"][-1], 3)
+
+
+    def test_status_file_is_an_output(self):
+        self.run_jobs([
+            make_job("b", inputs=["/status/a.json"]),
+            make_job("a"),
+        ])
+        self.assertEqual(self.started, ["a", "b"])
+
+
+    def test_failure_skips_dependents(self):
+        self.return_codes["a"] = 1
+        runner = self.run_jobs([
+            make_job("a", outputs=["a.out"]),
+            make_job("b", inputs=["a.out"]),
+            make_job("c"),
+        ])
+        self.assertEqual(sorted(self.started), ["a", "c"])
+        self.assertFalse(runner.was_successful())
+
+
+    def test_parallelism_limit(self):
+        self.run_jobs([make_job(str(i)) for i in range(10)], parallelism="3")
+        self.assertEqual(self.max_running, 3)
+
+
+    def test_pool_limit(self):
+        jobs = [make_job(f"p{i}", pool="foo") for i in range(5)]
+        jobs.extend(make_job(f"q{i}") for i in range(5))
+        self.run_jobs(jobs, pools={"foo": 2})
+        self.assertEqual(self.max_pool_running, 2)
+        self.assertGreater(self.max_running, 2)
+
+
+    def test_jobs_waiting_for_memory_hold_no_slot(self):
+        jobs = [
+            {**make_job("big1"), "expected_memory": 6},
+            {**make_job("big2"), "expected_memory": 6},
+            make_job("small"),
+        ]
+        with tempfile.TemporaryDirectory(prefix="litani-test") as tmp, \
+                unittest.mock.patch.object(
+                    lib.memory_budget, "Ledger", functools.partial(
+                        lib.memory_budget.Ledger,
+                        pathlib.Path(tmp) / "ledger.json",
+                        poll_interval=0.001)):
+            self.run_jobs(
+                jobs, parallelism="2", exec_options={"memory_budget": 10})
+        self.assertEqual(self.started, ["big1", "small", "big2"])
+        self.assertEqual(self.max_running, 2)
+        self.assertEqual(self.memory_reservations["big1"]["budget"], 10)
+        self.assertIsNone(self.memory_reservations["small"])
+
+
+    def test_pools_with_adaptive_parallelism(self):
+        async def run():
+            controller = lib.adaptive_parallelism.Controller(
+                min_jobs=1, max_jobs=3, n_proc=3, interval=60)
+            jobs = [make_job(f"p{i}", pool="foo") for i in range(4)]
+            jobs.extend(make_job(f"q{i}") for i in range(4))
+            runner = lib.scheduler.Runner(
+                jobs, {"foo": 1}, False, None, None, None,
+                adaptive=controller)
+            with unittest.mock.patch.object(
+                    lib.exec, "get_exec_args", lambda job: job), \
+                    unittest.mock.patch.object(
+                        lib.exec, "run_job", self.fake_run_job), \
+                    unittest.mock.patch("sys.stdout", new=io.StringIO()):
+                await runner.run()
+            return runner
+
+        runner = asyncio.run(run())
+        self.assertTrue(runner.was_successful())
+        self.assertEqual(len(self.started), 8)
+        self.assertEqual(self.max_pool_running, 1)
+        self.assertEqual(self.max_running, 3)
+
+
+    def test_select_pipeline_with_dependencies(self):
+        self.run_jobs([
+            make_job("a", outputs=["a.out"], pipeline="bar"),
+            make_job("b", inputs=["a.out"]),
+            make_job("c", pipeline="bar"),
+        ], pipelines=["foo"])
+        self.assertEqual(self.started, ["a", "b"])
+
+
+    def test_cycle(self):
+        with self.assertRaises(SystemExit), self.assertLogs(level="ERROR"):
+            self.run_jobs([
+                make_job("a", inputs=["b.out"], outputs=["a.out"]),
+                make_job("b", inputs=["a.out"], outputs=["b.out"]),
+            ])
+
+
+    def test_missing_input(self):
+        with self.assertRaises(SystemExit), self.assertLogs(level="ERROR"):
+            self.run_jobs([make_job("a", inputs=["/does/not/exist"])])
+
+
+    def test_unknown_pool(self):
+        with self.assertRaises(SystemExit), self.assertLogs(level="ERROR"):
+            self.run_jobs([make_job("a", pool="foo")])
+
+
+    def test_job_that_cannot_start_fails(self):
+        async def reserve_memory(job, _):
+            if job.entry["job_id"] == "a":
+                raise OSError("no ledger")
+
+        with unittest.mock.patch.object(
+                lib.scheduler.Runner, "_reserve_memory",
+                side_effect=reserve_memory, autospec=False), \
+                self.assertLogs(level="ERROR"):
+            runner = self.run_jobs([
+                make_job("a", outputs=["a.out"]),
+                make_job("b", inputs=["a.out"]),
+                make_job("c"),
+            ])
+        self.assertEqual(self.started, ["c"])
+        self.assertFalse(runner.was_successful())
+
+
+
+class TestNativeEngine(unittest.TestCase):
+    def test_missing_input_exits(self):
+        with tempfile.TemporaryDirectory(prefix="litani-test") as tmp:
+            def litani(*args, **kwargs):
+                return subprocess.run(
+                    [sys.executable, str(LITANI), *args], cwd=tmp,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                    check=False, **kwargs)
+
+            litani(
+                "init", "--project", "test", "--no-print-out-dir",
+                "--output-directory", str(pathlib.Path(tmp) / "output"))
+            litani(
+                "add-job", "--command", "true", "--pipeline-name", "foo",
+                "--ci-stage", "build", "--inputs", "/does/not/exist")
+            proc = litani(
+                "run-build", "--engine", "native", "--no-job-history",
+                timeout=60)
+        self.assertEqual(proc.returncode, 1)
+
+
+
+class TestExecArgs(unittest.TestCase):
+    def test_same_as_litani_exec(self):
+        job = {
+            **make_job("a", inputs=["x y"], outputs=["z"]),
+            "timeout": 10,
+            "tags": ["one", "two"],
+            "timeout_ok": True,
+            "profile_memory": False,
+        }
+        args = vars(lib.exec.get_exec_args(job))
+        self.assertEqual(args["subcommand"], "exec")
+        self.assertEqual(args["command"], "run a")
+        self.assertEqual(args["inputs"], ["x y"])
+        self.assertEqual(args["timeout"], 10)
+        self.assertEqual(args["tags"], ["one", "two"])
+        self.assertTrue(args["timeout_ok"])
+        self.assertFalse(args["profile_memory"])
+        self.assertEqual(args["status_file"], "/status/a.json")
+        self.assertNotIn("func", args)
@@ -0,0 +1,102 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import os
+import pathlib
+import tempfile
+import unittest
+import unittest.mock
+
+import lib.snapshot
+
+
+
+class TestSnapshotter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="litani-test")
+        self.root = pathlib.Path(self.temp_dir.name)
+        self.src = self.root / "src"
+        (self.src / "pipe" / "build").mkdir(parents=True)
+        self.write("pipe/build/foo.txt", "foo")
+        self.write("pipe/build/bar.txt", "bar")
+        self.snapshotter = lib.snapshot.Snapshotter()
+
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+    def write(self, rel, contents, mtime=None):
+        # Write in place, as a job copying an artifact would
+        with open(self.src / rel, "w") as handle:
+            handle.write(contents)
+        if mtime is not None:
+            os.utime(self.src / rel, ns=(mtime, mtime))
+
+
+    @staticmethod
+    def read(path):
+        with open(path) as handle:
+            return handle.read()
+
+
+    def test_first_snapshot_copies(self):
+        dst = self.root / "snap-1"
+        self.snapshotter.snapshot(self.src, dst)
+        self.assertEqual(self.read(dst / "pipe/build/foo.txt"), "foo")
+        self.assertNotEqual(
+            os.stat(dst / "pipe/build/foo.txt").st_ino,
+            os.stat(self.src / "pipe/build/foo.txt").st_ino)
+
+
+    def test_unchanged_files_linked_to_previous_snapshot(self):
+        self.snapshotter.snapshot(self.src, self.root / "snap-1")
+        self.snapshotter.snapshot(self.src, self.root / "snap-2")
+        self.assertEqual(
+            os.stat(self.root / "snap-1/pipe/build/foo.txt").st_ino,
+            os.stat(self.root / "snap-2/pipe/build/foo.txt").st_ino)
+
+
+    def test_changed_and_new_files_copied(self):
+        self.snapshotter.snapshot(self.src, self.root / "snap-1")
+        self.write("pipe/build/foo.txt", "FOO", mtime=1)
+        self.write("pipe/build/baz.txt", "baz")
+        self.snapshotter.snapshot(self.src, self.root / "snap-2")
+
+        self.assertEqual(self.read(self.root / "snap-1/pipe/build/foo.txt"), "foo")
+        self.assertEqual(self.read(self.root / "snap-2/pipe/build/foo.txt"), "FOO")
+        self.assertEqual(self.read(self.root / "snap-2/pipe/build/baz.txt"), "baz")
+        self.assertFalse((self.root / "snap-1/pipe/build/baz.txt").exists())
+
+
+    def test_falls_back_to_copy(self):
+        self.snapshotter.snapshot(self.src, self.root / "snap-1")
+        with unittest.mock.patch("os.link", side_effect=OSError("EXDEV")):
+            self.snapshotter.snapshot(self.src, self.root / "snap-2")
+        self.assertEqual(self.read(self.root / "snap-2/pipe/build/bar.txt"), "bar")
+        self.assertNotEqual(
+            os.stat(self.root / "snap-1/pipe/build/bar.txt").st_ino,
+            os.stat(self.root / "snap-2/pipe/build/bar.txt").st_ino)
+
+
+    def test_previous_snapshot_deleted(self):
+        self.snapshotter.snapshot(self.src, self.root / "snap-1")
+        os.unlink(self.root / "snap-1/pipe/build/bar.txt")
+        self.snapshotter.snapshot(self.src, self.root / "snap-2")
+        self.assertEqual(self.read(self.root / "snap-2/pipe/build/bar.txt"), "bar")
+
+
+    def test_missing_source(self):
+        self.snapshotter.snapshot(self.root / "nonexistent", self.root / "snap")
+        self.assertEqual(list((self.root / "snap").iterdir()), [])
@@ -12,6 +12,7 @@
 # permissions and limitations under the License.
 
 
+import os
 import pathlib
 import tempfile
 import unittest
@@ -41,3 +42,38 @@ class TestNinjaStatusParser(unittest.TestCase):
                 "total": 91,
                 "message": "hello world"
             }, self.sp.parse_status("<ninja>:34/53/91 hello world"))
+
+
+
+class TestProgressLine(unittest.TestCase):
+    def test_updates_are_rate_limited(self):
+        printed = []
+        progress = lib.ninja.ProgressLine(interval=60)
+        with unittest.mock.patch.object(
+                lib.ninja, "print_progress",
+                lambda *args: printed.append(args)), \
+                unittest.mock.patch("builtins.print"):
+            for finished in range(1, 100):
+                progress.update(finished, 200, f"job {finished}")
+            self.assertEqual(printed, [(1, 200, "job 1")])
+
+            progress.finish()
+            self.assertEqual(printed[-1], (99, 200, "job 99"))
+
+            progress.update(200, 200, "last job")
+            self.assertEqual(printed[-1], (200, 200, "last job"))
+
+
+    def test_width_is_cached_while_watching(self):
+        width = lib.ninja._TerminalWidth(watching=True)
+        with unittest.mock.patch.dict("os.environ", {"TERM": "xterm"}), \
+                unittest.mock.patch(
+                    "shutil.get_terminal_size",
+                    return_value=os.terminal_size((123, 45))) as lookup:
+            self.assertEqual(width.get(), 123)
+            self.assertEqual(width.get(), 123)
+            self.assertEqual(lookup.call_count, 1)
+
+            width._on_resize()
+            width.get()
+            self.assertEqual(lookup.call_count, 2)
@@ -0,0 +1,91 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import argparse
+import importlib
+import importlib.machinery
+import importlib.util
+import pathlib
+import pkgutil
+import unittest
+
+import lib
+
+
+def load_litani_script():
+    path = pathlib.Path(__file__).resolve().parent.parent.parent / "litani"
+    loader = importlib.machinery.SourceFileLoader("litani_script", str(path))
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+
+class TestSubcommandTable(unittest.TestCase):
+    def setUp(self):
+        self.script = load_litani_script()
+
+
+    def registered_subcommands(self, module_name):
+        pars = argparse.ArgumentParser()
+        subs = pars.add_subparsers()
+        importlib.import_module(module_name).add_subparser(subs)
+        return set(subs.choices)
+
+
+    def test_table_matches_modules(self):
+        modules = {
+            module.name for module in pkgutil.iter_modules(
+                lib.__path__, prefix=f"{lib.__name__}.")
+            if hasattr(importlib.import_module(module.name), "add_subparser")
+        }
+        self.assertEqual(modules, set(self.script.SUBCOMMANDS.values()))
+
+        for module_name in modules:
+            expected = {
+                name for name, mod in self.script.SUBCOMMANDS.items()
+                if mod == module_name}
+            self.assertEqual(
+                self.registered_subcommands(module_name), expected,
+                module_name)
+
+
+    def test_get_subcommand(self):
+        for argv, expected in [
+                ([], None),
+                (["-v"], None),
+                (["--help"], None),
+                (["exec", "--command", "true"], "exec"),
+                (["-v", "-w", "run-build", "-j", "2"], "run-build"),
+                (["-v", "--", "exec"], None),
+                (["add-job", "--", "true"], "add-job"),
+                (["no-such-subcommand"], "no-such-subcommand"),
+        ]:
+            self.assertEqual(self.script.get_subcommand(argv), expected, argv)
+
+
+    def test_unknown_subcommand_registers_all(self):
+        pars = argparse.ArgumentParser()
+        subs = pars.add_subparsers()
+        self.script.add_subparsers(subs, ["--help"])
+        self.assertEqual(set(subs.choices), set(self.script.SUBCOMMANDS))
+
+
+    def test_known_subcommand_registers_one_module(self):
+        pars = argparse.ArgumentParser()
+        subs = pars.add_subparsers()
+        self.script.add_subparsers(subs, ["get-jobs"])
+        self.assertEqual(
+            set(subs.choices), self.registered_subcommands("lib.jobs"))
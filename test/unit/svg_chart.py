@@ -0,0 +1,107 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import datetime
+import unittest
+import xml.etree.ElementTree
+
+import lib.litani_report
+import lib.svg_chart
+
+
+SVG_NS = "{http://www.w3.org/2000/svg}"
+
+
+
+class TestSvgChart(unittest.TestCase):
+    def parse(self, lines):
+        root = xml.etree.ElementTree.fromstring("\n".join(lines))
+        self.assertEqual(root.tag, f"{SVG_NS}svg")
+        return root
+
+
+    def texts(self, root):
+        return [e.text for e in root.iter(f"{SVG_NS}text")]
+
+
+    def test_parse_times(self):
+        stamps = [
+            "2023-01-01T00:00:05Z", "2023-01-01T00:01:00.250000Z",
+            "2023-06-15T12:30:00Z"]
+        expected = [
+            datetime.datetime.strptime(
+                s, "%Y-%m-%dT%H:%M:%S.%fZ" if "." in s
+                else "%Y-%m-%dT%H:%M:%SZ").replace(
+                    tzinfo=datetime.timezone.utc).timestamp()
+            for s in stamps]
+        self.assertEqual(lib.svg_chart.parse_times(stamps), expected)
+
+
+    def test_si_bytes(self):
+        self.assertEqual(lib.svg_chart.si_bytes(0), "0.0B")
+        self.assertEqual(lib.svg_chart.si_bytes(512), "512.0B")
+        self.assertEqual(lib.svg_chart.si_bytes(1500000), "1.5MB")
+        self.assertEqual(lib.svg_chart.si_bytes(2 * 10 ** 9), "2.0GB")
+
+
+    def test_nice_ticks_cover_range(self):
+        for lo, hi in ((0, 7), (3, 3), (0.2, 0.9), (120, 4700)):
+            ticks = lib.svg_chart.nice_ticks(lo, hi)
+            self.assertLessEqual(ticks[0], lo)
+            self.assertGreaterEqual(ticks[-1], hi)
+            self.assertLessEqual(len(ticks), 12)
+
+
+    def test_box_plot(self):
+        root = self.parse(lib.svg_chart.box_plot(
+            [10, 12, 11, 13, 100], ["a", "b", "c", "d", "<e>"],
+            title="Runtime for proofs", ylabel="seconds"))
+        texts = self.texts(root)
+        for label in ("Runtime for proofs", "seconds", "a", "<e>"):
+            self.assertIn(label, texts)
+        # 100 is beyond the whiskers
+        self.assertEqual(len(list(root.iter(f"{SVG_NS}circle"))), 1)
+
+
+    def test_plotter_draws_every_template(self):
+        trace = [{
+            "time": "2023-01-01T00:00:0%dZ" % i,
+            "rss": 1000 * (i + 1),
+            "vsz": 5000 * (i + 1),
+        } for i in range(5)]
+        jobs = [{
+            "duration": i,
+            "memory_trace": {"peak": {"rss": 1000 * i}, "trace": trace},
+            "wrapper_arguments": {"pipeline_name": f"pipe-{i}"},
+        } for i in range(3)]
+        plotter = lib.litani_report.SvgPlotter()
+
+        root = self.parse(plotter.plot(
+            None, "memory-trace.jinja.gnu", job=jobs[0]))
+        self.assertEqual(len(list(root.iter(f"{SVG_NS}polyline"))), 2)
+
+        root = self.parse(plotter.plot(
+            None, "runtime-box.jinja.gnu", group_name="g", jobs=jobs))
+        self.assertIn("Runtime for g", self.texts(root))
+
+        root = self.parse(plotter.plot(
+            None, "memory-peak-box.jinja.gnu", group_name="g", jobs=jobs))
+        self.assertIn("Peak resident memory for g", self.texts(root))
+
+        root = self.parse(plotter.plot(
+            None, "run-parallelism.jinja.gnu", n_proc=4, max_parallelism=3,
+            trace=[{
+                "time": "2023-01-01T00:00:0%dZ" % i, "running": i % 3,
+            } for i in range(6)]))
+        self.assertIn("# cores: 4", self.texts(root))
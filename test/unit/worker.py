@@ -0,0 +1,153 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+
+import asyncio
+import json
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+import lib.litani
+import lib.worker
+
+
+LITANI = pathlib.Path(__file__).resolve().parent.parent.parent / "litani"
+
+
+
+class TestWorker(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="litani-test")
+        self.root = pathlib.Path(self.temp_dir.name)
+        self.cache_dir = self.root / "cache"
+        self.cache_dir.mkdir()
+        lib.litani.CacheDir.cache_dir_path = self.cache_dir
+
+        self.workers = []
+        self.addresses = []
+        for idx, slots in enumerate((2, 1)):
+            address = f"unix:{self.root / f'worker-{idx}.sock'}"
+            self.workers.append(subprocess.Popen([
+                sys.executable, str(LITANI), "worker", "--listen", address,
+                "--slots", str(slots),
+                "--work-dir", str(self.root / f"worker-{idx}"),
+            ], stderr=subprocess.DEVNULL))
+            self.addresses.append(address)
+        for address in self.addresses:
+            sock = pathlib.Path(address[len("unix:"):])
+            for _ in range(100):
+                if sock.exists():
+                    break
+                time.sleep(0.05)
+
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.kill()
+            worker.wait()
+        lib.litani.CacheDir.cache_dir_path = None
+        self.temp_dir.cleanup()
+
+
+    def make_job(self, idx, command):
+        return {
+            "job_id": f"job-{idx}",
+            "command": command,
+            "pipeline_name": "pipe",
+            "ci_stage": "build",
+            "description": f"job {idx}",
+            "cwd": str(self.root),
+            "inputs": None,
+            "outputs": [str(self.root / f"out-{idx}")],
+            "phony_outputs": None,
+            "ignore_returns": None,
+            "ok_returns": None,
+            "timeout": None,
+            "timeout_ok": False,
+            "timeout_ignore": False,
+            "outcome_table": None,
+            "interleave_stdout_stderr": False,
+            "stdout_file": None,
+            "stderr_file": None,
+            "pool": None,
+            "tags": None,
+            "profile_memory": False,
+            "profile_memory_interval": 10,
+            "max_captured_output": None,
+            "status_file": str(self.cache_dir / "status" / f"job-{idx}.json"),
+        }
+
+
+    def run_jobs(self, jobs, lose_worker=False):
+        async def run():
+            pool = await lib.worker.WorkerPool.connect(self.addresses)
+            self.assertEqual(pool.get_slots(), 3)
+            if lose_worker:
+                self.workers[0].kill()
+                self.workers[0].wait()
+
+            async def run_one(job):
+                async with pool.slot() as worker:
+                    return await pool.run_job(
+                        worker, job, {"log_compression": "gzip"})
+
+            ret = await asyncio.gather(*[run_one(job) for job in jobs])
+            await pool.close()
+            return ret
+
+        return asyncio.run(run())
+
+
+    def test_jobs_run_on_workers(self):
+        jobs = [
+            self.make_job(idx, f"echo {idx} > out-{idx}; echo done {idx}")
+            for idx in range(6)]
+        jobs.append({**self.make_job(6, "exit 3"), "phony_outputs": []})
+        self.assertEqual(self.run_jobs(jobs), [0] * 6 + [1])
+
+        workers = set()
+        for idx, job in enumerate(jobs):
+            with open(job["status_file"]) as handle:
+                status = json.load(handle)
+            self.assertTrue(status["complete"])
+            self.assertEqual(
+                status["wrapper_arguments"]["status_file"],
+                job["status_file"])
+            workers.add(status["worker"])
+            if idx == 6:
+                self.assertEqual(status["command_return_code"], 3)
+                continue
+
+            self.assertEqual(status["stdout"], [f"done {idx}"])
+            self.assertEqual(
+                (self.root / f"out-{idx}").read_text(), f"{idx}\n")
+            self.assertTrue(
+                (self.cache_dir / status["stdout_log"]["path"]).exists())
+            self.assertTrue((
+                self.cache_dir / "artifacts" / "pipe" / "build" /
+                f"out-{idx}").exists())
+        self.assertEqual(workers, set(self.addresses))
+
+
+    def test_lost_worker(self):
+        jobs = [
+            self.make_job(idx, f"echo {idx} > out-{idx}") for idx in range(3)]
+        self.assertEqual(self.run_jobs(jobs, lose_worker=True), [0, 0, 0])
+        for job in jobs:
+            with open(job["status_file"]) as handle:
+                self.assertEqual(
+                    json.load(handle)["worker"], self.addresses[1])